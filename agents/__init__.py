@@ -3,7 +3,11 @@ Agents module for AI Operations Assistant
 """
 from .planner import PlannerAgent, ExecutionPlan, ExecutionStep
 from .executor import ExecutorAgent, StepResult
-from .verifier import VerifierAgent, FinalOutput
+from .verifier import VerifierAgent, FinalOutput, IncrementalVerification
+from .optimizer import PlanOptimizer
+from .speculative import SpeculativePrefetcher
+from .popularity import PopularityPrefetcher, SpaceSaving
+from .bulkhead import Bulkhead, BulkheadFull, BulkheadTimeout
 
 __all__ = [
     "PlannerAgent",
@@ -12,5 +16,13 @@ __all__ = [
     "ExecutionPlan",
     "ExecutionStep",
     "StepResult",
-    "FinalOutput"
+    "FinalOutput",
+    "IncrementalVerification",
+    "PlanOptimizer",
+    "SpeculativePrefetcher",
+    "PopularityPrefetcher",
+    "SpaceSaving",
+    "Bulkhead",
+    "BulkheadFull",
+    "BulkheadTimeout"
 ]
@@ -0,0 +1,137 @@
+"""
+Bulkheads - one small thread pool per tool
+A slow upstream only fills up its own pool and queue; steps for other tools keep moving,
+and once a pool's queue is full new calls fail fast instead of piling up
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Optional
+
+
+class BulkheadFull(Exception):
+    """Tool's pool and queue are both full, or the call waited too long for a thread"""
+
+
+class BulkheadTimeout(BulkheadFull):
+    """The call got a thread but didn't finish in time - the caller stops waiting for it"""
+
+
+def _per_tool(env_var: str) -> Dict[str, str]:
+    """'get_news:2,github_search:6' -> {'get_news': '2', 'github_search': '6'}"""
+    values = {}
+    for item in os.getenv(env_var, "").split(","):
+        if ":" in item:
+            tool_name, value = item.rsplit(":", 1)
+            values[tool_name.strip()] = value.strip()
+    return values
+
+
+class Bulkhead:
+    """
+    Bounded pool for one tool: max_workers calls run at once, up to max_queue more wait,
+    anything past that is rejected straight away. A queued call that doesn't get a thread
+    within queue_timeout seconds is dropped too, and the caller gives up on a running call
+    after call_timeout() seconds (the call itself finishes in the pool in the background)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int = 4,
+        max_queue: int = 16,
+        queue_timeout: float = 10.0,
+        call_timeout: Optional[Callable[[], float]] = None
+    ):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.call_timeout = call_timeout
+
+        self.active = 0
+        self.queued = 0
+        self.peak = 0
+        self.stats = {"completed": 0, "failed": 0, "rejected": 0, "timed_out": 0, "abandoned": 0}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_tool(cls, tool) -> "Bulkhead":
+        """
+        Sizes come from the tool's pool_size/pool_queue, overridable per tool from the env
+        A call may make a few upstream requests (pages, key retries), so the caller waits up to
+        TOOL_CALL_TIMEOUT_FACTOR x the tool's current request timeout
+        """
+        sizes = _per_tool("TOOL_POOL_SIZES")
+        queues = _per_tool("TOOL_QUEUE_LIMITS")
+        factor = float(os.getenv("TOOL_CALL_TIMEOUT_FACTOR", 3))
+        return cls(
+            tool.name,
+            max_workers=int(sizes.get(tool.name, tool.pool_size)),
+            max_queue=int(queues.get(tool.name, tool.pool_queue)),
+            queue_timeout=float(os.getenv("TOOL_QUEUE_TIMEOUT", 10)),
+            call_timeout=(lambda: tool.latency.timeout() * factor) if factor > 0 else None
+        )
+
+    def call(self, fn: Callable[..., Any], **kwargs) -> Any:
+        """Runs fn(**kwargs) in this pool and waits for it - raises BulkheadFull if there's no room"""
+        with self._lock:
+            if self.active + self.queued >= self.max_workers + self.max_queue:
+                self.stats["rejected"] += 1
+                raise BulkheadFull(f"{self.name} is overloaded ({self.max_workers} running, {self.queued} queued)")
+            self.queued += 1
+            if self._pool is None:
+                # Created on first use so nothing is started at import time
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"tool-{self.name}")
+
+        started = threading.Event()
+
+        def run():
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+            started.set()
+            try:
+                return fn(**kwargs)
+            finally:
+                with self._lock:
+                    self.active -= 1
+
+        future = self._pool.submit(run)
+        if not started.wait(self.queue_timeout) and future.cancel():
+            with self._lock:
+                self.queued -= 1
+                self.stats["timed_out"] += 1
+            raise BulkheadFull(f"{self.name} call waited more than {self.queue_timeout:.0f}s for a free thread")
+
+        timeout = self.call_timeout() if self.call_timeout else None
+        try:
+            result = future.result(timeout)
+        except FutureTimeout:
+            # Can't stop the thread - it keeps its slot until it's done, but this request moves on
+            self._count("abandoned")
+            raise BulkheadTimeout(f"{self.name} call took more than {timeout:.1f}s")
+        except Exception:
+            self._count("failed")
+            raise
+        self._count("completed")
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": self.active,
+                "queued": self.queued,
+                "peak_active": self.peak,
+                "saturation": round(self.active / self.max_workers, 2) if self.max_workers else 1.0,
+                **self.stats
+            }
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
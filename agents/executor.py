@@ -2,19 +2,28 @@
 Executor Agent - actually runs the steps and calls the APIs
 Handles retries if something fails
 """
-from typing import Any, Dict, List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional
 from tools.base import BaseTool
+from tools.result_cache import ResultCache
+from tools.schema import InvalidParameters
 from agents.planner import ExecutionPlan, ExecutionStep
+from agents.optimizer import PlanOptimizer, fan_out
+from agents.bulkhead import Bulkhead, BulkheadFull
+from agents.references import UnresolvedReference, has_references, resolve_references
 
 
+@dataclass(slots=True)
 class StepResult:
-    """Stores what happened when we ran a step"""
-    
-    def __init__(self, step: ExecutionStep, success: bool, data: Any = None, error: str = None):
-        self.step = step
-        self.success = success
-        self.data = data
-        self.error = error
+    """Stores what happened when we ran a step - data is the tool's record(s), not a copy"""
+    step: ExecutionStep
+    success: bool
+    data: Any = None
+    error: Optional[str] = None
+    stale: bool = False  # served from the result cache past its max age
+    age: Optional[float] = None  # seconds since the data was fetched, if it came from the cache
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -23,7 +32,9 @@ class StepResult:
             "description": self.step.description,
             "success": self.success,
             "data": self.data,
-            "error": self.error
+            "error": self.error,
+            "stale": self.stale,
+            "age_seconds": round(self.age, 1) if self.age is not None else None
         }
 
 
@@ -33,28 +44,108 @@ class ExecutorAgent:
     Calls the right tools with the right parameters
     """
     
-    def __init__(self, available_tools: List[BaseTool]):
+    def __init__(
+        self,
+        available_tools: List[BaseTool],
+        result_cache: Optional[ResultCache] = None,
+        tracker=None
+    ):
         self.tools = {tool.name: tool for tool in available_tools}
+        self.optimizer = PlanOptimizer(self.tools)
         self.max_retries = 2  # Try twice if something fails
+        
+        # Every tool runs in its own bounded pool, so one slow API can't starve the others
+        self.bulkheads = {tool.name: Bulkhead.for_tool(tool) for tool in available_tools}
+        
+        # Heavy-hitter sketch (agents.popularity.SpaceSaving) fed with every cacheable call
+        self.tracker = tracker
+        
+        # Stale-while-revalidate: recent results are served right away and refreshed in the background
+        self.result_cache = result_cache
+        self._refresh_pool: Optional[ThreadPoolExecutor] = None
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
     
-    def execute_plan(self, plan: ExecutionPlan) -> List[StepResult]:
+    def execute_plan(
+        self,
+        plan: ExecutionPlan,
+        speculation=None,
+        on_result: Optional[Callable[[StepResult], None]] = None
+    ) -> List[StepResult]:
         """
         Goes through each step in the plan and executes it
         Keeps going even if some steps fail (so we can see partial results)
+        If a Speculation is passed in, matching calls reuse its results
+        on_result gets each StepResult as soon as it's ready (incremental verification)
         """
         results = []
+        shared: Dict[int, StepResult] = {}
+        done: Dict[int, StepResult] = {}
         
         for step in plan.steps:
-            result = self._execute_step(step)
+            group = plan.call_group(step.step_number)
+            rejection = plan.rejection(step.step_number)
+            if rejection:
+                # Failed the planner's schema check - no point spending an upstream call on it
+                result = StepResult(step=step, success=False, error=f"Invalid parameters: {rejection}")
+            elif has_references(step.parameters):
+                result = self._execute_dependent_step(step, done, speculation)
+            elif group is None:
+                result = self._execute_step(step, speculation=speculation)
+            else:
+                # The optimizer merged this step with others - only the leader calls the API
+                if group.leader not in shared:
+                    shared[group.leader] = self._execute_step(step, group.parameters, speculation)
+                result = self._share_result(shared[group.leader], step)
             results.append(result)
+            done[step.step_number] = result
+            if on_result is not None:
+                on_result(result)
         
         return results
     
-    def _execute_step(self, step: ExecutionStep) -> StepResult:
+    def _execute_dependent_step(self, step: ExecutionStep, done: Dict[int, StepResult], speculation=None) -> StepResult:
+        """Fills in {{steps[N]...}} references from earlier results, then runs the step as usual"""
+        tool = self.tools.get(step.tool_name)
+        try:
+            parameters = resolve_references(step.parameters, done)
+        except UnresolvedReference as e:
+            return StepResult(step=step, success=False, error=f"Couldn't resolve step reference: {e}")
+        
+        if tool is not None:
+            try:
+                parameters = self.optimizer.normalize_parameters(tool, parameters)
+            except InvalidParameters as e:
+                return StepResult(step=step, success=False, error=f"Invalid parameters after resolving references: {e}")
+        print(f"[EXECUTOR] Step {step.step_number} resolved references: {parameters}")
+        return self._execute_step(step, parameters, speculation)
+    
+    def _share_result(self, leader_result: StepResult, step: ExecutionStep) -> StepResult:
+        """Hands a shared call's result to one of its steps, sliced to that step's limit"""
+        if not leader_result.success:
+            return StepResult(step=step, success=False, error=leader_result.error)
+        
+        data = fan_out(self.tools.get(step.tool_name), leader_result.data, step.parameters)
+        return StepResult(
+            step=step,
+            success=True,
+            data=data,
+            error=leader_result.error,
+            stale=leader_result.stale,
+            age=leader_result.age
+        )
+    
+    def _execute_step(
+        self,
+        step: ExecutionStep,
+        parameters: Optional[Dict[str, Any]] = None,
+        speculation=None
+    ) -> StepResult:
         """
         Runs a single step - calls the tool with parameters
         Has retry logic in case of transient failures
         """
+        parameters = step.parameters if parameters is None else parameters
         tool = self.tools.get(step.tool_name)
         
         if not tool:
@@ -64,29 +155,155 @@ class ExecutorAgent:
                 error=f"Tool '{step.tool_name}' not found"
             )
         
-        # Try a couple times in case it's a network hiccup
+        # Every cacheable call counts towards popularity, however it ends up being served
+        cache_key = self._cache_key(tool, parameters)
+        if cache_key is not None and self.tracker is not None:
+            self.tracker.offer(cache_key, (tool.name, parameters))
+        
+        cached = None
+        if cache_key is not None:
+            cached = self.result_cache.get(
+                cache_key, tool.cache_policy, parameters.get("limit"), tool.result_list_key
+            )
+        
+        # Already fetched while the planner was running? Beats anything but a fresh cached copy;
+        # failed guesses fall through to a normal call
+        if speculation is not None and (cached is None or cached.state != "fresh"):
+            prefetched = speculation.take(step.tool_name, parameters)
+            if prefetched and prefetched.get("success"):
+                self._remember(tool, parameters, prefetched.get("data"))
+                return StepResult(step=step, success=True, data=prefetched.get("data"))
+        
+        if cached is not None and cached.state != "expired":
+            if cached.state == "stale":
+                self._refresh(tool, cache_key, parameters)
+            return StepResult(
+                step=step,
+                success=True,
+                data=fan_out(tool, cached.data, parameters),
+                stale=cached.state == "stale",
+                age=cached.age
+            )
+        
+        # With an old copy to fall back on, one failed attempt is enough
+        attempts = 1 if cached is not None else self.max_retries
+        result = self._call_tool(tool, parameters, attempts)
+        if result.get("success"):
+            self._remember(tool, parameters, result.get("data"))
+            return StepResult(step=step, success=True, data=result.get("data"))
+        
+        last_error = result.get("error")
+        if cached is not None and "not found" not in last_error.lower():
+            # Upstream is having a bad time - old data beats no data (stale-if-error)
+            print(f"[EXECUTOR] {tool.name} failed ({last_error}), serving {cached.age:.0f}s old result")
+            self.result_cache.record("stale_if_error")
+            return StepResult(
+                step=step,
+                success=True,
+                data=fan_out(tool, cached.data, parameters),
+                error=last_error,
+                stale=True,
+                age=cached.age
+            )
+        
+        return StepResult(step=step, success=False, error=last_error)
+    
+    def prefetch(self, tool_name: str, parameters: Dict[str, Any]) -> bool:
+        """Fetches a call into the result cache ahead of demand (popularity prefetcher)"""
+        tool = self.tools.get(tool_name)
+        if tool is None or self._cache_key(tool, parameters) is None:
+            return False
+        result = self._call_tool(tool, parameters, 1)
+        if result.get("success"):
+            self._remember(tool, parameters, result.get("data"), prefetched=True)
+        return bool(result.get("success"))
+    
+    def call(self, tool_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """One attempt through the tool's bulkhead, bypassing the cache (speculative prefetch)"""
+        return self._call_tool(self.tools[tool_name], parameters, 1)
+    
+    def is_fresh(self, tool_name: str, parameters: Dict[str, Any]) -> bool:
+        """Whether a call would be answered from the result cache without going upstream"""
+        age = self.cached_age(tool_name, parameters)
+        return age is not None and age <= self.tools[tool_name].cache_policy.max_age
+    
+    def cached_age(self, tool_name: str, parameters: Dict[str, Any]) -> Optional[float]:
+        """Age of the cached result for a call, None if there isn't one"""
+        tool = self.tools.get(tool_name)
+        cache_key = self._cache_key(tool, parameters) if tool else None
+        return self.result_cache.age(cache_key) if cache_key is not None else None
+    
+    def _call_tool(self, tool: BaseTool, parameters: Dict[str, Any], attempts: int) -> Dict[str, Any]:
+        """Calls the tool, retrying in case it's a network hiccup"""
         last_error = None
-        for attempt in range(self.max_retries):
+        for attempt in range(attempts):
             try:
-                result = tool.execute(**step.parameters)
+                result = self.bulkheads[tool.name].call(tool.execute, **parameters)
                 
                 if result.get("success"):
-                    return StepResult(
-                        step=step,
-                        success=True,
-                        data=result.get("data")
-                    )
+                    return result
                 else:
                     last_error = result.get("error", "Unknown error")
                     # Don't retry if it's a client error (like invalid city name)
                     if "not found" in last_error.lower():
                         break
+            except BulkheadFull as e:
+                # Retrying straight away would just add to the pile
+                last_error = str(e)
+                break
             except Exception as e:
                 last_error = str(e)
         
-        return StepResult(
-            step=step,
-            success=False,
-            error=last_error or "Execution failed after retries"
-        )
+        return {"success": False, "error": last_error or "Execution failed after retries"}
+    
+    def pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Saturation and rejection counts for each tool's pool"""
+        return {name: bulkhead.snapshot() for name, bulkhead in self.bulkheads.items()}
+    
+    def _cache_key(self, tool: BaseTool, parameters: Dict[str, Any]) -> Optional[Hashable]:
+        """Same call identity the optimizer uses - limit is left out for list tools"""
+        if self.result_cache is None or not tool.cacheable(parameters):
+            return None
+        ignore = ("limit",) if tool.result_list_key else ()
+        return PlanOptimizer.call_key(tool.name, tool.canonicalize(parameters), ignore=ignore)
+    
+    def _remember(self, tool: BaseTool, parameters: Dict[str, Any], data: Any, prefetched: bool = False) -> None:
+        # Key is worked out again - a call can teach canonicalize() something (e.g. a city's ID)
+        cache_key = self._cache_key(tool, parameters)
+        if cache_key is None:
+            return
+        limit = parameters.get("limit")
+        if isinstance(data, dict) and data.get("incomplete_results"):
+            # Cut short upstream (rate limit) - only good for as many items as it actually has,
+            # and never worth replacing a fuller answer we already hold
+            items = data.get(tool.result_list_key) if tool.result_list_key else None
+            if not isinstance(items, list) or not items:
+                return
+            previous = self.result_cache.get_limit(cache_key)
+            if previous is not None and previous >= len(items) and self.is_fresh(tool.name, parameters):
+                return
+            limit = len(items)
+        self.result_cache.put(cache_key, data, limit, prefetched)
+    
+    def _refresh(self, tool: BaseTool, cache_key: Hashable, parameters: Dict[str, Any]) -> None:
+        """Re-fetches a stale entry in the background - at most one refresh per key at a time"""
+        with self._refresh_lock:
+            if cache_key in self._refreshing:
+                return
+            self._refreshing.add(cache_key)
+            if self._refresh_pool is None:
+                # Created on first use so nothing is started at import time
+                self._refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="refresh")
+        
+        def refresh():
+            try:
+                result = self._call_tool(tool, parameters, 1)
+                if result.get("success"):
+                    self._remember(tool, parameters, result.get("data"))
+                    self.result_cache.record("refreshes")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(cache_key)
+        
+        self._refresh_pool.submit(refresh)
 
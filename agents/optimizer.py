@@ -0,0 +1,113 @@
+"""
+Plan Optimizer - cleans up LLM plans before the executor runs them
+Drops duplicate calls and merges calls that only differ by limit
+(parameter normalization itself lives in each tool's compiled schema, tools/schema.py)
+"""
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from tools.base import BaseTool
+from agents.references import has_references
+
+
+@dataclass
+class CallGroup:
+    """A set of plan steps that are answered by a single upstream call"""
+    leader: int  # step_number that actually makes the call
+    parameters: Dict[str, Any]  # parameters sent upstream (merged across members)
+    members: List[int] = field(default_factory=list)
+
+
+class PlanOptimizer:
+    """
+    Runs between planning and execution
+    Every step stays in the plan (so results still line up with step numbers),
+    but steps that ask for the same thing share one upstream call
+    """
+
+    def __init__(self, available_tools: Dict[str, BaseTool]):
+        self.tools = available_tools
+
+    def optimize(self, plan):
+        """Groups the steps that can share a call - parameters were already normalized by the planner"""
+        groups: Dict[Tuple, CallGroup] = {}
+
+        for step in plan.steps:
+            tool = self.tools.get(step.tool_name)
+            if not tool or plan.rejection(step.step_number):
+                continue
+
+            if has_references(step.parameters):
+                # Depends on an earlier result - we can't know what it'll call until then
+                continue
+
+            # Steps that only differ by limit can be merged - fetch the max once and slice
+            ignore = ("limit",) if tool.result_list_key else ()
+            key = self.call_key(step.tool_name, tool.canonicalize(step.parameters), ignore=ignore)
+
+            group = groups.get(key)
+            if group is None:
+                groups[key] = CallGroup(
+                    leader=step.step_number,
+                    parameters=dict(step.parameters),
+                    members=[step.step_number]
+                )
+                continue
+
+            group.members.append(step.step_number)
+            if "limit" in ignore:
+                group.parameters["limit"] = max(
+                    group.parameters.get("limit", 0),
+                    step.parameters.get("limit", 0)
+                )
+
+        shared = [group for group in groups.values() if len(group.members) > 1]
+        plan.set_call_groups(shared, {
+            "original_steps": len(plan.steps),
+            "upstream_calls": len(plan.steps) - sum(len(g.members) - 1 for g in shared),
+            "shared_steps": [g.members for g in shared]
+        })
+        return plan
+
+    def normalize_parameters(self, tool: BaseTool, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Lines parameters up with the tool's compiled schema so equivalent steps look the same
+        Raises InvalidParameters if they can't be repaired
+        """
+        normalized, _ = tool.parameter_schema.apply(parameters, skip=has_references)
+        return normalized
+
+    @staticmethod
+    def call_key(tool_name: str, parameters: Dict[str, Any], ignore=()) -> Tuple:
+        """
+        Hashable identity of an upstream call
+        Strings are case-folded since none of our upstream APIs care about case
+        """
+        items = []
+        for name in sorted(parameters):
+            if name in ignore:
+                continue
+            value = parameters[name]
+            if isinstance(value, str):
+                value = value.casefold()
+            elif isinstance(value, (dict, list)):
+                value = json.dumps(value, sort_keys=True)
+            items.append((name, value))
+        return (tool_name, tuple(items))
+
+
+def fan_out(tool: Optional[BaseTool], data: Any, parameters: Dict[str, Any]) -> Any:
+    """Cuts a merged result back down to what one step asked for"""
+    if tool is None or not tool.result_list_key or not isinstance(data, dict):
+        return data
+
+    items = data.get(tool.result_list_key)
+    limit = parameters.get("limit")
+    if not isinstance(items, list) or not isinstance(limit, int) or len(items) < limit:
+        return data
+
+    trimmed = {**data, tool.result_list_key: items[:limit]}
+    # Cut short upstream, but still holds everything this step asked for
+    trimmed.pop("incomplete_results", None)
+    return trimmed
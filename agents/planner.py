@@ -2,10 +2,19 @@
 Planner Agent - figures out what steps to take for a given task
 Uses LLM to break down user requests into actionable steps
 """
-from typing import Any, Dict, List
-from pydantic import BaseModel, Field
+import os
+import re
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field, PrivateAttr
 from llm.client import LLMClient
 from tools.base import BaseTool
+from tools.schema import InvalidParameters
+from agents.optimizer import PlanOptimizer
+from agents.tool_index import ToolIndex, estimate_tokens
+from agents.references import has_references, referenced_steps
+
+# Rough signals that a task will need several tools/steps
+_STEP_SEPARATORS = re.compile(r"\b(and|then|also|after that|compare)\b|[;,]", re.IGNORECASE)
 
 
 class ExecutionStep(BaseModel):
@@ -19,6 +28,50 @@ class ExecutionPlan(BaseModel):
     task_summary: str = Field(description="Summary of the user's task")
     steps: List[ExecutionStep] = Field(description="Ordered list of execution steps")
     expected_output: str = Field(description="Description of expected final output")
+    
+    # Filled in by the PlanOptimizer - private so it stays out of the LLM schema
+    _call_groups: Dict[int, Any] = PrivateAttr(default_factory=dict)
+    _optimization: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    _tool_selection: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    _rejected: Dict[int, str] = PrivateAttr(default_factory=dict)
+    _validation: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    
+    def set_call_groups(self, groups: List[Any], stats: Dict[str, Any]) -> None:
+        """Records which steps share an upstream call (keyed by every member step)"""
+        self._call_groups = {member: group for group in groups for member in group.members}
+        self._optimization = stats
+    
+    def call_group(self, step_number: int) -> Optional[Any]:
+        """Shared call for a step, or None if the step runs on its own"""
+        return self._call_groups.get(step_number)
+    
+    @property
+    def optimization(self) -> Dict[str, Any]:
+        return self._optimization
+    
+    def set_tool_selection(self, stats: Dict[str, Any]) -> None:
+        """Which tools the planner prompt offered, and how many prompt tokens that saved"""
+        self._tool_selection = stats
+    
+    @property
+    def tool_selection(self) -> Dict[str, Any]:
+        return self._tool_selection
+    
+    def set_validation(self, repairs: Dict[int, List[str]], rejected: Dict[int, str]) -> None:
+        """Parameter fixes and rejected steps from the planner's schema check"""
+        self._rejected = rejected
+        self._validation = {
+            "repaired": [{"step": number, "changes": changes} for number, changes in repairs.items()],
+            "rejected": [{"step": number, "error": error} for number, error in rejected.items()]
+        }
+    
+    def rejection(self, step_number: int) -> Optional[str]:
+        """Why a step's parameters were rejected, or None if it's fine to run"""
+        return self._rejected.get(step_number)
+    
+    @property
+    def validation(self) -> Dict[str, Any]:
+        return self._validation
 
 
 class PlannerAgent:
@@ -31,38 +84,101 @@ class PlannerAgent:
         self.llm = llm_client
         self.tools = {tool.name: tool for tool in available_tools}
         self.tool_schemas = [tool.to_schema() for tool in available_tools]
+        self.optimizer = PlanOptimizer(self.tools)
+        
+        # Only the top-K relevant tools go into the prompt - matters once there are dozens
+        self.tool_index = ToolIndex(available_tools)
+        self.top_k_tools = int(os.getenv("PLANNER_TOP_K_TOOLS", 5))
+        self.select_tools = os.getenv("PLANNER_TOOL_SELECTION", "true").lower() == "true"
+        
+        # Each tool's own keywords, matched at word starts ("repo" also catches "repos")
+        self.keyword_patterns = {
+            tool.name: re.compile(r"\b(?:" + "|".join(map(re.escape, tool.keywords)) + ")", re.IGNORECASE)
+            for tool in available_tools if tool.keywords
+        }
+        self.full_prompt_tokens = estimate_tokens(self._build_system_prompt())
     
     def create_plan(self, user_task: str) -> ExecutionPlan:
         """
         Main method - takes user's task and creates a plan
         Returns structured plan with steps and tool selections
         """
-        system_prompt = self._build_system_prompt()
+        selected = self._select_tools(user_task)
         user_prompt = self._build_user_prompt(user_task)
         
         try:
             # Ask the LLM to create a structured plan
             # Using low temperature (0.3) so we get consistent, logical plans
-            result = self.llm.generate_structured_output(
-                prompt=user_prompt,
-                system_prompt=system_prompt,
-                response_format=ExecutionPlan,
-                temperature=0.3
-            )
+            # Simple tasks go to the fast model, multi-tool ones to the stronger one
+            stage = "planner_complex" if self._is_complex(user_task) else "planner_simple"
+            plan = self._generate_plan(user_prompt, selected, stage)
+            fallback = None
+            if selected is not None and not plan.steps:
+                # Trimmed tool list left the planner stuck - try again with everything
+                fallback = "empty_plan"
+                plan = self._generate_plan(user_prompt, None, stage)
+            elif selected is None and self.select_tools and len(self.tools) > self.top_k_tools:
+                fallback = "no_match"
             
             # Make sure the plan is valid
-            plan = ExecutionPlan(**result)
             self._validate_plan(plan)
+            plan.set_tool_selection(self._selection_stats(selected if fallback is None else None, fallback))
             
-            return plan
+            # Collapse duplicate/mergeable steps so we don't make the same call twice
+            return self.optimizer.optimize(plan)
         except Exception as e:
             raise Exception(f"Planning failed: {str(e)}")
     
-    def _build_system_prompt(self) -> str:
-        """Creates the system prompt with all available tools"""
+    def _generate_plan(self, user_prompt: str, tool_names: Optional[List[str]], stage: str) -> ExecutionPlan:
+        result = self.llm.generate_structured_output(
+            prompt=user_prompt,
+            system_prompt=self._build_system_prompt(tool_names),
+            response_format=ExecutionPlan,
+            temperature=0.3,
+            stage=stage
+        )
+        return ExecutionPlan(**result)
+    
+    def _select_tools(self, user_task: str) -> Optional[List[str]]:
+        """
+        Top-K tools by BM25 relevance to the task, padded with unmatched tools up to K
+        None means "offer every tool" - selection is off, every tool fits, or nothing matched at all
+        """
+        if not self.select_tools or len(self.tools) <= self.top_k_tools:
+            return None
+        if not self.tool_index.search(user_task):
+            return None
+        return self.tool_index.top(user_task, self.top_k_tools)
+    
+    def _selection_stats(self, tool_names: Optional[List[str]], fallback: Optional[str]) -> Dict[str, Any]:
+        """Estimated prompt tokens with the selected tools vs. with all of them"""
+        full = self.full_prompt_tokens
+        used = estimate_tokens(self._build_system_prompt(tool_names)) if tool_names is not None else full
+        return {
+            "tools_offered": tool_names if tool_names is not None else list(self.tools),
+            "total_tools": len(self.tools),
+            "fallback": fallback,
+            "prompt_tokens_estimate": used,
+            "full_prompt_tokens_estimate": full,
+            "prompt_tokens_saved": full - used
+        }
+    
+    def _is_complex(self, user_task: str) -> bool:
+        """
+        Cheap guess at plan complexity before we have a plan
+        More than one tool mentioned, or lots of clauses, counts as complex
+        """
+        text = user_task.lower()
+        tools_mentioned = sum(1 for pattern in self.keyword_patterns.values() if pattern.search(text))
+        clauses = len(_STEP_SEPARATORS.findall(text)) + 1
+        return tools_mentioned > 1 or clauses > 2
+    
+    def _build_system_prompt(self, tool_names: Optional[List[str]] = None) -> str:
+        """Creates the system prompt with the given tools (all of them by default)"""
         tools_description = "\n".join([
-            f"- {tool['name']}: {tool['description']}\n  Parameters: {tool['parameters']}"
+            self._describe_tool(tool)
             for tool in self.tool_schemas
+            if tool_names is None or tool['name'] in tool_names
         ])
         
         return f"""You are a Planner Agent in an AI Operations Assistant system.
@@ -79,9 +195,21 @@ Instructions:
 4. Ensure steps are in logical order
 5. Each step should have a clear purpose
 6. The plan should be complete and executable
+7. If a step needs a value from an earlier step's result, don't guess it - reference it with
+   {{{{steps[N].data.<path>}}}} where N is the earlier step_number, e.g.
+   {{"city": "{{{{steps[1].data.city}}}}"}} or {{"query": "{{{{steps[1].data.repositories[0].language}}}}"}}
+   The executor fills these in when the step runs, so the whole task fits in one plan
 
 Output a structured JSON plan following the ExecutionPlan schema."""
     
+    def _describe_tool(self, schema: Dict[str, Any]) -> str:
+        """One tool's entry in the prompt - what it does, what it takes, what comes back"""
+        text = f"- {schema['name']}: {schema['description']}\n  Parameters: {schema['parameters']}"
+        output = self.tools[schema['name']].output_description
+        if output:
+            text += f"\n  Returns data: {output}"
+        return text
+    
     def _build_user_prompt(self, user_task: str) -> str:
         """Simple prompt with the user's task"""
         return f"""User Task: {user_task}
@@ -90,8 +218,32 @@ Create a detailed execution plan to accomplish this task using the available too
 Break down the task into clear, sequential steps."""
     
     def _validate_plan(self, plan: ExecutionPlan) -> None:
-        """Quick check to make sure we're not trying to use tools that don't exist"""
+        """
+        Makes sure the plan only uses real tools, then checks every step against its tool's
+        compiled schema - fixable parameters are repaired in place, the rest mark the step
+        rejected so the executor fails it without calling the API
+        """
+        earlier = set()
+        repairs: Dict[int, List[str]] = {}
+        rejected: Dict[int, str] = {}
         for step in plan.steps:
-            if step.tool_name not in self.tools:
+            tool = self.tools.get(step.tool_name)
+            if tool is None:
                 raise ValueError(f"Invalid tool in plan: {step.tool_name}")
+            # References can only look backwards - otherwise the step could never run
+            missing = referenced_steps(step.parameters) - earlier
+            if missing:
+                raise ValueError(f"Step {step.step_number} references steps that don't run before it: {sorted(missing)}")
+            earlier.add(step.step_number)
+            
+            # Templated values are checked again once the executor has resolved them
+            try:
+                step.parameters, changes = tool.parameter_schema.apply(step.parameters, skip=has_references)
+            except InvalidParameters as e:
+                rejected[step.step_number] = str(e)
+                continue
+            if changes:
+                repairs[step.step_number] = changes
+        
+        plan.set_validation(repairs, rejected)
 
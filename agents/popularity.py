@@ -0,0 +1,194 @@
+"""
+Popularity-driven prefetching
+Traffic is skewed towards a handful of cities, repo topics and news categories, so we track
+the heavy hitters with a Space-Saving sketch and keep their tool results warm in the cache
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitter sketch (Metwally et al.) - fixed number of counters
+    When full, a new item takes over the smallest counter and inherits its count as error,
+    so counts are over-estimates by at most `error`. Any item with more than N/capacity
+    occurrences is guaranteed to be in here.
+    """
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.counts: Dict[Hashable, float] = {}
+        self.errors: Dict[Hashable, float] = {}
+        self.items: Dict[Hashable, Any] = {}  # whatever the caller wants back for each key
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def offer(self, key: Hashable, item: Any = None) -> None:
+        with self._lock:
+            self.total += 1
+            if key in self.counts:
+                self.counts[key] += 1
+            else:
+                error = 0.0
+                if len(self.counts) >= self.capacity:
+                    smallest = min(self.counts, key=self.counts.get)
+                    error = self.counts.pop(smallest)
+                    self.errors.pop(smallest, None)
+                    self.items.pop(smallest, None)
+                self.counts[key] = error + 1
+                self.errors[key] = error
+            self.items[key] = item
+
+    def top(self, k: int) -> List[Tuple[Hashable, Any, float, float]]:
+        """(key, item, count, error) for the k biggest counters"""
+        with self._lock:
+            ranked = sorted(self.counts, key=self.counts.get, reverse=True)[:k]
+            return [(key, self.items[key], self.counts[key], self.errors[key]) for key in ranked]
+
+    def decay(self, factor: float = 0.5) -> None:
+        """Scales every counter down so yesterday's favourites eventually drop out"""
+        with self._lock:
+            for key in self.counts:
+                self.counts[key] *= factor
+                self.errors[key] *= factor
+            self.total *= factor
+
+
+class PopularityPrefetcher:
+    """
+    Background thread that refreshes the top-K calls before their cache entries go stale
+    Each tool gets a budget of prefetch calls per hour so warming never eats the quota
+    that real requests need
+    """
+
+    def __init__(
+        self,
+        executor,
+        tracker: SpaceSaving,
+        top_k: int = 20,
+        interval: float = 60.0,
+        budgets: Optional[Dict[str, int]] = None,
+        decay_every: int = 60
+    ):
+        self.executor = executor
+        self.tracker = tracker
+        self.top_k = top_k
+        self.interval = interval
+        self.budgets = budgets or {}
+        self.decay_every = decay_every  # cycles between halvings of the counters
+
+        self.spent: Dict[str, List[float]] = {}  # tool -> timestamps of prefetch calls in the last hour
+        self.stats = {"cycles": 0, "prefetches": 0, "failures": 0, "skipped_budget": 0}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, executor, tracker: SpaceSaving) -> "PopularityPrefetcher":
+        budgets = {}
+        for item in os.getenv("PREFETCH_BUDGETS", "").split(","):
+            if ":" in item:
+                tool_name, budget = item.rsplit(":", 1)
+                budgets[tool_name.strip()] = int(budget)
+        return cls(
+            executor,
+            tracker,
+            top_k=int(os.getenv("PREFETCH_TOP_K", 20)),
+            interval=float(os.getenv("PREFETCH_INTERVAL", 60)),
+            budgets=budgets
+        )
+
+    def start(self) -> None:
+        """Started from the app's startup hook, not at import, so forked workers each get their own"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="popularity-prefetch", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run_once(self) -> int:
+        """One warming pass - returns how many calls were made"""
+        self.stats["cycles"] += 1
+        if self.decay_every and self.stats["cycles"] % self.decay_every == 0:
+            self.tracker.decay()
+
+        made = 0
+        for _, (tool_name, parameters), _, _ in self.tracker.top(self.top_k):
+            tool = self.executor.tools.get(tool_name)
+            if tool is None or tool.cache_policy is None:
+                continue
+
+            # Only refresh what would go stale before we come around again
+            age = self.executor.cached_age(tool_name, parameters)
+            if age is not None and age + self.interval < tool.cache_policy.max_age:
+                continue
+
+            if not self._spend(tool_name):
+                self.stats["skipped_budget"] += 1
+                continue
+
+            made += 1
+            self.stats["prefetches"] += 1
+            if not self.executor.prefetch(tool_name, parameters):
+                self.stats["failures"] += 1
+        return made
+
+    def snapshot(self) -> Dict[str, Any]:
+        cache = self.executor.result_cache.snapshot() if self.executor.result_cache else {}
+        prefetched = cache.get("prefetched", 0)
+        return {
+            "top_k": [
+                {
+                    "tool": tool_name,
+                    "parameters": parameters,
+                    "count": round(count, 1),
+                    "error": round(error, 1)
+                }
+                for _, (tool_name, parameters), count, error in self.tracker.top(self.top_k)
+            ],
+            "tracked_requests": round(self.tracker.total, 1),
+            "budgets_per_hour": self._budget_snapshot(),
+            "prefetch_hit_rate": round(cache.get("prefetch_used", 0) / prefetched, 3) if prefetched else None,
+            "running": self._thread is not None and self._thread.is_alive(),
+            **self.stats
+        }
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                made = self.run_once()
+                if made:
+                    print(f"[PREFETCH] Warmed {made} popular tool calls")
+            except Exception as e:
+                # Never let the warmer die - next cycle might be fine
+                print(f"[PREFETCH] Cycle failed: {e}")
+
+    def _budget(self, tool_name: str) -> int:
+        if tool_name in self.budgets:
+            return self.budgets[tool_name]
+        return getattr(self.executor.tools.get(tool_name), "prefetch_budget", 0)
+
+    def _spend(self, tool_name: str) -> bool:
+        """Takes one call from the tool's hourly budget"""
+        now = time.time()
+        calls = [t for t in self.spent.get(tool_name, []) if now - t < 3600]
+        if len(calls) >= self._budget(tool_name):
+            self.spent[tool_name] = calls
+            return False
+        calls.append(now)
+        self.spent[tool_name] = calls
+        return True
+
+    def _budget_snapshot(self) -> Dict[str, Dict[str, int]]:
+        now = time.time()
+        return {
+            tool_name: {
+                "budget": self._budget(tool_name),
+                "used": sum(1 for t in self.spent.get(tool_name, []) if now - t < 3600)
+            }
+            for tool_name in self.executor.tools
+        }
@@ -0,0 +1,78 @@
+"""
+Step output references - lets a step's parameters use an earlier step's result
+e.g. {"city": "{{steps[1].data.city}}"} - resolved by the executor right before the step runs,
+so dependent work fits in one plan instead of two separate tasks
+"""
+import re
+from typing import Any, Dict, Set
+
+REFERENCE = re.compile(r"\{\{\s*steps\[(\d+)\]((?:\.\w+|\[-?\d+\])*)\s*\}\}")
+_PATH_PART = re.compile(r"\.(\w+)|\[(-?\d+)\]")
+
+
+class UnresolvedReference(Exception):
+    """Reference points at a step that failed, hasn't run, or doesn't have that field"""
+
+
+def has_references(value: Any) -> bool:
+    if isinstance(value, str):
+        return REFERENCE.search(value) is not None
+    if isinstance(value, dict):
+        return any(has_references(v) for v in value.values())
+    if isinstance(value, list):
+        return any(has_references(v) for v in value)
+    return False
+
+
+def referenced_steps(value: Any) -> Set[int]:
+    """Step numbers a parameter value depends on"""
+    if isinstance(value, str):
+        return {int(match.group(1)) for match in REFERENCE.finditer(value)}
+    if isinstance(value, dict):
+        return set().union(*(referenced_steps(v) for v in value.values()))
+    if isinstance(value, list):
+        return set().union(*(referenced_steps(v) for v in value))
+    return set()
+
+
+def resolve_references(value: Any, results: Dict[int, Any]) -> Any:
+    """
+    Swaps references for real values - `results` maps step_number -> StepResult
+    A string that is exactly one reference keeps the referenced value's type (ints stay ints);
+    references inside longer strings are formatted in
+    """
+    if isinstance(value, dict):
+        return {k: resolve_references(v, results) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve_references(v, results) for v in value]
+    if not isinstance(value, str):
+        return value
+
+    whole = REFERENCE.fullmatch(value.strip())
+    if whole:
+        return _lookup(whole, results)
+    return REFERENCE.sub(lambda match: str(_lookup(match, results)), value)
+
+
+def _lookup(match: "re.Match", results: Dict[int, Any]) -> Any:
+    step_number = int(match.group(1))
+    result = results.get(step_number)
+    if result is None:
+        raise UnresolvedReference(f"step {step_number} hasn't run before this step")
+    if not result.success:
+        raise UnresolvedReference(f"step {step_number} failed, so {match.group(0)} has no value")
+
+    current: Any = result
+    for name, index in _PATH_PART.findall(match.group(2)):
+        try:
+            if name:
+                # Records and StepResult are slotted dataclasses - plain dicts use keys
+                current = current[name] if isinstance(current, dict) else getattr(current, name)
+            else:
+                current = current[int(index)]
+        except (KeyError, IndexError, TypeError, AttributeError):
+            raise UnresolvedReference(f"{match.group(0)} doesn't exist in step {step_number}'s result")
+
+    if current is None:
+        raise UnresolvedReference(f"{match.group(0)} is empty in step {step_number}'s result")
+    return current
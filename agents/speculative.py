@@ -0,0 +1,149 @@
+"""
+Speculative prefetch - starts obvious tool calls while the planner is still thinking
+If the task says "weather in Tokyo", we don't need the LLM to tell us to fetch it
+"""
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from tools.base import BaseTool
+from tools.schema import InvalidParameters
+from agents.optimizer import PlanOptimizer, fan_out
+
+
+# Only patterns we're confident about - a wrong guess is a wasted upstream call
+_CITY = r"[A-Z][\w.'-]*(?: [A-Z][\w.'-]*)*"
+WEATHER_PATTERN = re.compile(
+    rf"\bweather\s+(?:in|for|at)\s+({_CITY}(?:(?:\s*,\s*|\s+and\s+){_CITY})*)"
+)
+NEWS_CATEGORY_PATTERN = re.compile(
+    r"\b(business|technology|tech|sports|entertainment|health|science)\s+news\b",
+    re.IGNORECASE
+)
+_CITY_SPLIT = re.compile(r"\s*,\s*|\s+and\s+")
+
+
+class Speculation:
+    """The speculative calls made for one task"""
+
+    def __init__(self, optimizer: PlanOptimizer, tools: Dict[str, BaseTool]):
+        self.optimizer = optimizer
+        self.tools = tools
+        self.calls: Dict[Tuple, Tuple[Dict[str, Any], Future]] = {}
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def add(self, tool_name: str, parameters: Dict[str, Any], future: Future) -> None:
+        key = self._key(tool_name, parameters)
+        self.calls[key] = (parameters, future)
+
+    def has(self, tool_name: str, parameters: Dict[str, Any]) -> bool:
+        return self._key(tool_name, parameters) in self.calls
+
+    def take(self, tool_name: str, parameters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Returns the speculative result for this call, or None if we didn't guess it
+        Each speculative call can only be claimed once
+        """
+        key = self._key(tool_name, parameters)
+        with self._lock:
+            entry = self.calls.get(key)
+            if entry is None:
+                return None
+            spec_params, future = entry
+            # A speculative list call only helps if it fetched at least as many items
+            if spec_params.get("limit", 0) < parameters.get("limit", 0):
+                return None
+            del self.calls[key]
+            self.used += 1
+
+        try:
+            result = future.result()
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+        if result.get("success"):
+            result = {**result, "data": fan_out(self.tools.get(tool_name), result.get("data"), parameters)}
+        return result
+
+    def finish(self) -> Dict[str, int]:
+        """Drops whatever the plan didn't use - those calls count as waste"""
+        with self._lock:
+            leftovers = list(self.calls.values())
+            self.calls.clear()
+
+        wasted = 0
+        for _, future in leftovers:
+            future.cancel()  # no-op if it's already running, we just ignore the result
+            wasted += 1
+
+        return {"started": self.used + wasted, "used": self.used, "wasted": wasted}
+
+    def _key(self, tool_name: str, parameters: Dict[str, Any]) -> Tuple:
+        tool = self.tools.get(tool_name)
+        if tool is None:
+            return self.optimizer.call_key(tool_name, parameters)
+        ignore = ("limit",) if tool.result_list_key else ()
+        return self.optimizer.call_key(tool_name, tool.canonicalize(parameters), ignore=ignore)
+
+
+class SpeculativePrefetcher:
+    """
+    Pulls high-confidence entities out of the raw task text
+    and kicks off the matching tool calls in the background
+    """
+
+    def __init__(self, available_tools: List[BaseTool], executor, max_workers: int = 4):
+        self.tools = {tool.name: tool for tool in available_tools}
+        # Calls go through the executor, so they respect the result cache and the tools' bulkheads
+        self.executor = executor
+        self.optimizer = PlanOptimizer(self.tools)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative")
+        self.totals = {"started": 0, "used": 0, "wasted": 0}
+        self._lock = threading.Lock()
+
+    def extract(self, task: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """Guesses tool calls from the task text - only the obvious ones"""
+        calls = []
+
+        if "get_weather" in self.tools:
+            for match in WEATHER_PATTERN.finditer(task):
+                for city in _CITY_SPLIT.split(match.group(1)):
+                    if city:
+                        calls.append(("get_weather", {"city": city}))
+
+        if "get_news" in self.tools:
+            for match in NEWS_CATEGORY_PATTERN.finditer(task):
+                category = match.group(1).lower()
+                if category == "tech":
+                    category = "technology"
+                # Grab the max so any limit the planner picks can be served from it
+                calls.append(("get_news", {"category": category, "limit": 10}))
+
+        return calls
+
+    def start(self, task: str) -> Speculation:
+        """Submits the guessed calls - returns right away"""
+        speculation = Speculation(self.optimizer, self.tools)
+
+        for tool_name, parameters in self.extract(task):
+            tool = self.tools[tool_name]
+            try:
+                parameters = self.optimizer.normalize_parameters(tool, parameters)
+            except InvalidParameters:
+                continue
+            if speculation.has(tool_name, parameters):
+                continue  # same guess twice
+            if self.executor.is_fresh(tool_name, parameters):
+                continue  # the step will be served from the cache anyway
+            future = self.pool.submit(self.executor.call, tool_name, parameters)
+            speculation.add(tool_name, parameters, future)
+
+        return speculation
+
+    def record(self, stats: Dict[str, int]) -> None:
+        """Adds one task's speculation stats to the running totals"""
+        with self._lock:
+            for key, value in stats.items():
+                self.totals[key] = self.totals.get(key, 0) + value
@@ -0,0 +1,98 @@
+"""
+Lexical tool index - BM25 over tool names, descriptions, keywords and parameter docs
+Lets the planner prompt carry only the tools that look relevant to the task instead of
+every registered schema
+"""
+import math
+import re
+from collections import Counter
+from typing import List, Tuple
+
+from tools.base import BaseTool
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Too common to tell tools apart
+_STOPWORDS = {
+    "a", "an", "and", "are", "by", "can", "do", "for", "from", "get", "how", "i", "in", "is", "it",
+    "me", "my", "of", "on", "or", "show", "the", "to", "what", "with", "find", "give", "tell", "about"
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words with a very light plural/suffix strip ("repositories" -> "repository")"""
+    tokens = []
+    for word in _TOKEN.findall(text.lower()):
+        if word in _STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 4 and word.endswith("ing"):
+            word = word[:-3]
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token - good enough to compare prompt sizes"""
+    return (len(text) + 3) // 4
+
+
+class ToolIndex:
+    """
+    Okapi BM25 with one document per tool
+    Name and keywords are counted twice - they're the strongest signal we have
+    """
+
+    def __init__(self, tools: List[BaseTool], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.names = [tool.name for tool in tools]
+        self.docs = [Counter(tokenize(self._document(tool))) for tool in tools]
+        self.lengths = [sum(doc.values()) for doc in self.docs]
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+
+        document_frequency = Counter(term for doc in self.docs for term in doc)
+        n = len(self.docs)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    def search(self, query: str) -> List[Tuple[str, float]]:
+        """(tool name, score) for every tool that matches at least one query term, best first"""
+        terms = tokenize(query)
+        scores = []
+        for name, doc, length in zip(self.names, self.docs, self.lengths):
+            score = 0.0
+            for term in terms:
+                tf = doc.get(term, 0)
+                if not tf:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * length / self.avg_length)
+                score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scores.append((name, score))
+        return sorted(scores, key=lambda item: item[1], reverse=True)
+
+    def top(self, query: str, k: int) -> List[str]:
+        """
+        The k best tools for the query, padded with unmatched tools (in registration order)
+        A tool whose words the task doesn't use is still better offered than hidden
+        """
+        names = [name for name, _ in self.search(query)][:k]
+        names += [name for name in self.names if name not in names][:k - len(names)]
+        return names
+
+    @staticmethod
+    def _document(tool: BaseTool) -> str:
+        parts = [tool.name.replace("_", " ")] * 2
+        parts += list(getattr(tool, "keywords", ())) * 2
+        parts.append(tool.description)
+        for name, spec in tool.parameters.get("properties", {}).items():
+            parts.append(name.replace("_", " "))
+            parts.append(spec.get("description", ""))
+            parts += [str(value) for value in spec.get("enum", [])]
+        return " ".join(parts)
@@ -1,7 +1,10 @@
 """
 Verifier Agent - Validates results and ensures output quality
 """
-from typing import Any, Dict, List
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Any, Dict, List, Optional, Union
 from pydantic import BaseModel, Field
 from llm.client import LLMClient
 from agents.planner import ExecutionPlan
@@ -17,6 +20,13 @@ class VerificationResult(BaseModel):
     suggestions: List[str] = Field(description="Suggestions for improvement")
 
 
+class StepVerification(BaseModel):
+    """Result of checking a single step (incremental mode)"""
+    is_valid: bool = Field(description="Whether the step's data is valid and useful for the task")
+    quality_score: int = Field(description="Quality score from 1-10 for this step")
+    issue: Optional[str] = Field(default=None, description="What is wrong or missing, if anything")
+
+
 class FinalOutput(BaseModel):
     """Final structured output"""
     task_summary: str = Field(description="Summary of the completed task")
@@ -32,6 +42,25 @@ class VerifierAgent:
     
     def __init__(self, llm_client: LLMClient):
         self.llm = llm_client
+        
+        # Incremental mode checks each step as the executor finishes it, instead of one LLM call at the end
+        self.incremental = os.getenv("INCREMENTAL_VERIFICATION", "false").lower() == "true"
+        # Per-step LLM checks (fast model) on top of the heuristics - off means heuristics only
+        self.step_llm = os.getenv("VERIFY_STEP_LLM", "false").lower() == "true"
+        self.step_workers = int(os.getenv("VERIFY_STEP_WORKERS", 4))
+        self._step_pool: Optional[ThreadPoolExecutor] = None
+    
+    def start(self, plan: ExecutionPlan) -> Optional["IncrementalVerification"]:
+        """
+        Begins verifying a plan step by step - pass .add as the executor's on_result callback
+        None when incremental mode is off
+        """
+        if not self.incremental:
+            return None
+        if self.step_llm and self._step_pool is None:
+            # Created on first use so nothing is started at import time
+            self._step_pool = ThreadPoolExecutor(max_workers=self.step_workers, thread_name_prefix="verify")
+        return IncrementalVerification(self, plan)
     
     def verify_and_format(
         self,
@@ -48,6 +77,15 @@ class VerifierAgent:
         Returns:
             Final formatted output
         """
+        return self._build_output(plan, step_results, self._verify_quality(plan, step_results))
+    
+    def _build_output(
+        self,
+        plan: ExecutionPlan,
+        step_results: List[StepResult],
+        verification: VerificationResult
+    ) -> FinalOutput:
+        """Status, results and metadata around a verification - the same for both modes"""
         # Check completion status
         successful_steps = [r for r in step_results if r.success]
         failed_steps = [r for r in step_results if not r.success]
@@ -60,9 +98,6 @@ class VerifierAgent:
         else:
             status = "failed"
         
-        # Verify quality using LLM
-        verification = self._verify_quality(plan, step_results)
-        
         # Format results
         results = self._format_results(step_results)
         
@@ -91,6 +126,19 @@ class VerifierAgent:
                 for r in failed_steps
             ]
         
+        # Steps answered from the result cache because upstream was slow or failing
+        stale_steps = [r for r in step_results if r.stale]
+        if stale_steps:
+            metadata["stale_results"] = [
+                {
+                    "step": r.step.step_number,
+                    "tool": r.step.tool_name,
+                    "age_seconds": round(r.age, 1),
+                    "reason": "upstream_error" if r.error else "revalidating"
+                }
+                for r in stale_steps
+            ]
+        
         return FinalOutput(
             task_summary=plan.task_summary,
             status=status,
@@ -122,6 +170,7 @@ Provide constructive feedback and suggestions."""
                 "step": result.step.description,
                 "success": result.success,
                 "has_data": result.data is not None,
+                "stale": result.stale,
                 "error": result.error
             })
         
@@ -138,7 +187,8 @@ Verify the quality and completeness of these results."""
                 prompt=user_prompt,
                 system_prompt=system_prompt,
                 response_format=VerificationResult,
-                temperature=0.3
+                temperature=0.3,
+                stage="verifier"
             )
             return VerificationResult(**verification_data)
         except Exception:
@@ -168,3 +218,117 @@ Verify the quality and completeness of these results."""
                 formatted[tool_name].append(result.data)
             
         return formatted
+    
+    def _check_step(self, plan: ExecutionPlan, result: StepResult) -> StepVerification:
+        """Heuristic verdict for one step, refined by the LLM when per-step LLM checks are on"""
+        check = self._step_heuristics(result)
+        if not self.step_llm or not result.success:
+            # A failed step needs no second opinion
+            return check
+        
+        system_prompt = """You are a Verifier Agent in an AI Operations Assistant system.
+
+Check one step of a larger task: is its data valid and useful for the task?
+Be brief - score it 1-10 and name the problem if there is one."""
+        
+        user_prompt = f"""Task: {plan.task_summary}
+Step: {result.step.description}
+Stale: {result.stale}
+Data: {str(result.data)[:1000]}"""
+        
+        try:
+            verification_data = self.llm.generate_structured_output(
+                prompt=user_prompt,
+                system_prompt=system_prompt,
+                response_format=StepVerification,
+                temperature=0.3,
+                stage="verifier"
+            )
+            return StepVerification(**verification_data)
+        except Exception:
+            return check
+    
+    @staticmethod
+    def _step_heuristics(result: StepResult) -> StepVerification:
+        """
+        10 for fresh data, less for stale or empty results, 0 for a failed step -
+        averaged over all steps this matches the batch fallback (successful / total * 10)
+        """
+        if not result.success:
+            return StepVerification(is_valid=False, quality_score=0, issue=result.error or "Step failed")
+        if _is_empty(result.data):
+            return StepVerification(is_valid=False, quality_score=4, issue="No results returned")
+        if result.stale:
+            reason = "upstream error" if result.error else "refresh pending"
+            return StepVerification(
+                is_valid=True,
+                quality_score=6 if result.error else 8,
+                issue=f"Served {round(result.age or 0)}s old data ({reason})"
+            )
+        return StepVerification(is_valid=True, quality_score=10)
+    
+    @staticmethod
+    def _aggregate(step_results: List[StepResult], checks: List[StepVerification]) -> VerificationResult:
+        """Folds the per-step verdicts into the same VerificationResult the batch check returns"""
+        total = len(checks)
+        issues = [
+            f"Step {result.step.step_number}: {check.issue}"
+            for result, check in zip(step_results, checks) if check.issue
+        ]
+        return VerificationResult(
+            is_complete=all(check.is_valid for check in checks),
+            is_valid=any(check.is_valid for check in checks),
+            missing_data=[
+                result.step.description
+                for result, check in zip(step_results, checks) if not check.is_valid
+            ],
+            quality_score=round(sum(check.quality_score for check in checks) / total) if total else 0,
+            suggestions=issues
+        )
+
+
+class IncrementalVerification:
+    """
+    One plan's step checks - add() runs as each StepResult arrives, so checking
+    overlaps with the steps still executing; finish() only aggregates
+    """
+    
+    def __init__(self, verifier: VerifierAgent, plan: ExecutionPlan):
+        self.verifier = verifier
+        self.plan = plan
+        self._checks: Dict[int, Union[StepVerification, Future]] = {}
+    
+    def add(self, result: StepResult) -> None:
+        pool = self.verifier._step_pool
+        if pool is None or not result.success:
+            # Heuristics are cheap enough to run right here on the executor's thread
+            self._checks[result.step.step_number] = self.verifier._check_step(self.plan, result)
+        else:
+            # copy_context keeps the request's LLM trace, so metadata.models still shows the verifier
+            self._checks[result.step.step_number] = pool.submit(
+                copy_context().run, self.verifier._check_step, self.plan, result
+            )
+    
+    def finish(self, step_results: List[StepResult]) -> FinalOutput:
+        checks = []
+        for result in step_results:
+            check = self._checks.get(result.step.step_number)
+            if check is None:
+                check = self.verifier._check_step(self.plan, result)
+            elif isinstance(check, Future):
+                check = check.result()
+            checks.append(check)
+        verification = self.verifier._aggregate(step_results, checks)
+        return self.verifier._build_output(self.plan, step_results, verification)
+
+
+def _is_empty(data: Any) -> bool:
+    """No data, or a result whose lists (repositories, articles...) are all empty"""
+    if data is None:
+        return True
+    if isinstance(data, (list, tuple)):
+        return len(data) == 0
+    if isinstance(data, dict):
+        lists = [value for value in data.values() if isinstance(value, list)]
+        return not data or (bool(lists) and all(not value for value in lists))
+    return False
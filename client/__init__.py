@@ -0,0 +1,15 @@
+"""
+Python client for the AI Operations Assistant API - sync and asyncio flavours
+"""
+from .async_client import AsyncAssistantClient
+from .common import AssistantError, BatchItem, JobFailed, RetryPolicy
+from .sync_client import AssistantClient
+
+__all__ = [
+    "AssistantClient",
+    "AsyncAssistantClient",
+    "AssistantError",
+    "BatchItem",
+    "JobFailed",
+    "RetryPolicy"
+]
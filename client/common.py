@@ -0,0 +1,118 @@
+"""
+Bits shared by the sync and async clients - retry policy, errors, batch items
+Neither client imports anything from the server, so this package can be copied out on its own
+"""
+import json
+import random
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import httpx
+
+# Worth retrying: rate limited, overloaded/queue full, or a proxy in front of us hiccuped
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class AssistantError(Exception):
+    """Request failed for good (after retries) - carries the HTTP status and the server's detail"""
+
+    def __init__(self, status_code: int, detail: Any, retry_after: Optional[float] = None):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class JobFailed(AssistantError):
+    """A background job finished with an error"""
+
+
+@dataclass(slots=True)
+class BatchItem:
+    """One task's outcome from /execute/batch - `result` is the same body /execute returns"""
+    index: int
+    task: str
+    status_code: int
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[Any] = None
+    retry_after: Optional[float] = None
+    replayed: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code == 200
+
+    def raise_for_error(self) -> Dict[str, Any]:
+        if not self.ok:
+            raise AssistantError(self.status_code, self.error, self.retry_after)
+        return self.result
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with full jitter - a server-sent Retry-After always wins"""
+    max_retries: int = 3
+    backoff: float = 0.5
+    max_backoff: float = 30.0
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+
+def new_idempotency_key() -> str:
+    return uuid.uuid4().hex
+
+
+def retry_after(response: httpx.Response) -> Optional[float]:
+    """Retry-After in seconds (we never send the HTTP-date form)"""
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def error_from(response: httpx.Response) -> AssistantError:
+    try:
+        detail = response.json().get("detail", response.text)
+    except ValueError:
+        detail = response.text
+    return AssistantError(response.status_code, detail, retry_after(response))
+
+
+def task_body(task: str, speculative: Optional[bool]) -> Dict[str, Any]:
+    body: Dict[str, Any] = {"task": task}
+    if speculative is not None:
+        body["speculative"] = speculative
+    return body
+
+
+def fields_param(fields: Optional[Iterable[str]]) -> Dict[str, str]:
+    return {"fields": ",".join(fields)} if fields else {}
+
+
+def chunks(items: List[Any], size: int) -> Iterator[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def parse_line(line: str) -> Optional[Dict[str, Any]]:
+    line = line.strip()
+    return json.loads(line) if line else None
+
+
+def batch_item(line: Dict[str, Any], tasks: List[str], indexes: List[int]) -> BatchItem:
+    """Maps a streamed line back to the caller's task - `indexes` is chunk position -> original position"""
+    index = indexes[line["index"]]
+    return BatchItem(
+        index=index,
+        task=tasks[index],
+        status_code=line["status_code"],
+        result=line.get("result"),
+        error=line.get("error"),
+        retry_after=line.get("retry_after"),
+        replayed=line.get("replayed", False)
+    )
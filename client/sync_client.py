@@ -0,0 +1,269 @@
+"""
+Blocking client - one pooled keep-alive connection set for the life of the client
+"""
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import httpx
+
+from .common import (
+    RETRY_STATUSES,
+    AssistantError,
+    BatchItem,
+    JobFailed,
+    RetryPolicy,
+    batch_item,
+    chunks,
+    error_from,
+    fields_param,
+    new_idempotency_key,
+    parse_line,
+    retry_after,
+    task_body,
+)
+
+
+class AssistantClient:
+    """
+    with AssistantClient("http://localhost:8000") as client:
+        client.execute("Get the weather in Tokyo")
+        for item in client.iter_batch(tasks): ...
+
+    Every execute/submit gets an Idempotency-Key that is reused on retries, so a retry after a
+    timeout picks up the original run instead of starting a second one
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8000",
+        api_key: Optional[str] = None,
+        client_id: Optional[str] = None,
+        priority: Optional[str] = None,
+        timeout: float = 120.0,
+        max_connections: int = 10,
+        retry: Optional[RetryPolicy] = None,
+        batch_size: int = 20,
+        use_jobs: bool = False,
+        poll_interval: float = 1.0,
+        transport: Optional[httpx.BaseTransport] = None
+    ):
+        headers = {}
+        if api_key:
+            headers["X-API-Key"] = api_key
+        if client_id:
+            headers["X-Client-Id"] = client_id
+        if priority:
+            headers["X-Priority"] = priority
+
+        self.retry = retry or RetryPolicy()
+        self.batch_size = batch_size
+        self.use_jobs = use_jobs
+        self.poll_interval = poll_interval
+        self._http = httpx.Client(
+            base_url=base_url,
+            headers=headers,
+            timeout=httpx.Timeout(timeout, connect=5.0),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport
+        )
+
+    def close(self) -> None:
+        self._http.close()
+
+    def __enter__(self) -> "AssistantClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def health(self) -> Dict[str, Any]:
+        return self._request("GET", "/health").json()
+
+    def tools(self) -> List[Dict[str, Any]]:
+        return self._request("GET", "/tools").json()["tools"]
+
+    def execute(
+        self,
+        task: str,
+        fields: Optional[Iterable[str]] = None,
+        speculative: Optional[bool] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Runs one task and returns the /execute body (goes through /jobs when use_jobs is on)"""
+        if self.use_jobs:
+            job = self.submit(task, speculative=speculative, idempotency_key=idempotency_key)
+            return self.wait(job["job_id"])
+        response = self._request(
+            "POST",
+            "/execute",
+            idempotency_key=idempotency_key or new_idempotency_key(),
+            json=task_body(task, speculative),
+            params=fields_param(fields)
+        )
+        return response.json()
+
+    def execute_many(
+        self,
+        tasks: Iterable[str],
+        fields: Optional[Iterable[str]] = None,
+        speculative: Optional[bool] = None
+    ) -> List[BatchItem]:
+        """Every task's BatchItem, in the order the tasks were given"""
+        items = list(self.iter_batch(tasks, fields=fields, speculative=speculative))
+        return sorted(items, key=lambda item: item.index)
+
+    def iter_batch(
+        self,
+        tasks: Iterable[str],
+        fields: Optional[Iterable[str]] = None,
+        speculative: Optional[bool] = None
+    ) -> Iterator[BatchItem]:
+        """
+        Yields BatchItems as tasks finish (completion order, not input order)
+        Sent as /execute/batch requests of up to batch_size tasks. Rate limited items and items lost
+        to a dropped stream are resent with their original idempotency keys
+        """
+        tasks = list(tasks)
+        keys = [new_idempotency_key() for _ in tasks]
+
+        for remaining in chunks(list(range(len(tasks))), self.batch_size):
+            attempt = 0
+            while remaining:
+                done, waits = set(), []
+                try:
+                    for item in self._stream_batch(tasks, keys, remaining, fields, speculative):
+                        if item.status_code in RETRY_STATUSES and attempt < self.retry.max_retries:
+                            waits.append(item.retry_after)
+                            continue
+                        done.add(item.index)
+                        yield item
+                except httpx.TransportError:
+                    if attempt >= self.retry.max_retries:
+                        raise
+                except AssistantError as e:
+                    if e.status_code == 404:
+                        # Server without /execute/batch - one request per task instead
+                        for index in remaining:
+                            if index not in done:
+                                yield self._execute_item(index, tasks[index], keys[index], fields, speculative)
+                        break
+                    if e.status_code not in RETRY_STATUSES or attempt >= self.retry.max_retries:
+                        raise
+                    waits.append(e.retry_after)
+
+                remaining = [index for index in remaining if index not in done]
+                if not remaining:
+                    break
+                if attempt >= self.retry.max_retries:
+                    raise AssistantError(502, f"batch stream ended without results for tasks {remaining}")
+                time.sleep(self.retry.delay(attempt, max((w for w in waits if w is not None), default=None)))
+                attempt += 1
+
+    def submit(
+        self,
+        task: str,
+        speculative: Optional[bool] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Queues a background job - returns {"job_id", "status", ...} right away"""
+        response = self._request(
+            "POST",
+            "/jobs",
+            idempotency_key=idempotency_key or new_idempotency_key(),
+            json=task_body(task, speculative)
+        )
+        return response.json()
+
+    def job(self, job_id: str) -> Dict[str, Any]:
+        return self._request("GET", f"/jobs/{job_id}").json()
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Polls a job until it's done and returns its result - raises JobFailed or TimeoutError"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            response = self._request("GET", f"/jobs/{job_id}")
+            job = response.json()
+            if job["status"] == "succeeded":
+                return job["result"]
+            if job["status"] == "failed":
+                raise JobFailed(job["status_code"] or 500, job["error"])
+
+            delay = retry_after(response) or self.poll_interval
+            if deadline is not None and time.monotonic() + delay > deadline:
+                raise TimeoutError(f"job {job_id} still {job['status']} after {timeout}s")
+            time.sleep(delay)
+
+    def iter_github(self, query: str, sort: str = "stars", limit: int = 100) -> Iterator[Dict[str, Any]]:
+        """Streams repositories one at a time from /tools/github_search/stream"""
+        params = {"query": query, "sort": sort, "limit": limit}
+        with self._http.stream("GET", "/tools/github_search/stream", params=params) as response:
+            if response.status_code >= 400:
+                response.read()
+                raise error_from(response)
+            for line in response.iter_lines():
+                repo = parse_line(line)
+                if repo is None:
+                    continue
+                if "error" in repo:
+                    raise AssistantError(502, repo["error"])
+                yield repo
+
+    def _request(self, method: str, path: str, idempotency_key: Optional[str] = None, **kwargs) -> httpx.Response:
+        """Sends with retries - only safe because POSTs always carry an idempotency key"""
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+        attempt = 0
+        while True:
+            try:
+                response = self._http.request(method, path, headers=headers, **kwargs)
+            except httpx.TransportError:
+                if attempt >= self.retry.max_retries:
+                    raise
+                time.sleep(self.retry.delay(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt < self.retry.max_retries:
+                time.sleep(self.retry.delay(attempt, retry_after(response)))
+                attempt += 1
+                continue
+            if response.status_code >= 400:
+                raise error_from(response)
+            return response
+
+    def _stream_batch(
+        self,
+        tasks: List[str],
+        keys: List[str],
+        indexes: List[int],
+        fields: Optional[Iterable[str]],
+        speculative: Optional[bool]
+    ) -> Iterator[BatchItem]:
+        body: Dict[str, Any] = {
+            "tasks": [tasks[i] for i in indexes],
+            "idempotency_keys": [keys[i] for i in indexes]
+        }
+        if speculative is not None:
+            body["speculative"] = speculative
+
+        with self._http.stream("POST", "/execute/batch", json=body, params=fields_param(fields)) as response:
+            if response.status_code >= 400:
+                response.read()
+                raise error_from(response)
+            for line in response.iter_lines():
+                parsed = parse_line(line)
+                if parsed is not None:
+                    yield batch_item(parsed, tasks, indexes)
+
+    def _execute_item(
+        self,
+        index: int,
+        task: str,
+        key: str,
+        fields: Optional[Iterable[str]],
+        speculative: Optional[bool]
+    ) -> BatchItem:
+        try:
+            result = self.execute(task, fields=fields, speculative=speculative, idempotency_key=key)
+        except AssistantError as e:
+            return BatchItem(index, task, e.status_code, error=e.detail, retry_after=e.retry_after)
+        return BatchItem(index, task, 200, result=result)
@@ -1,9 +1,12 @@
 """
 Example client script to demonstrate AI Operations Assistant usage
+Uses the SDK in client/ - pooled connections, retries, batching and streaming
 """
-import requests
 import json
-import time
+
+import httpx
+
+from client import AssistantClient, AssistantError
 
 # API endpoint
 BASE_URL = "http://localhost:8000"
@@ -16,33 +19,36 @@ def print_response(response_data):
     print(json.dumps(response_data, indent=2))
     print("=" * 80 + "\n")
 
-def execute_task(task: str):
+def print_summary(data):
+    print(f"\n✅ Status: {data['status']}")
+    print(f"📊 Quality Score: {data['metadata']['quality_score']}/10")
+    print(f"📈 Steps: {data['metadata']['successful_steps']}/{data['metadata']['total_steps']} successful")
+
+def execute_task(client: AssistantClient, task: str):
     """Execute a task and print the response"""
     print(f"\n📝 Task: {task}")
     print("⏳ Processing...")
     
     try:
-        response = requests.post(
-            f"{BASE_URL}/execute",
-            json={"task": task},
-            timeout=60
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            print(f"\n✅ Status: {data['status']}")
-            print(f"📊 Quality Score: {data['metadata']['quality_score']}/10")
-            print(f"📈 Steps: {data['metadata']['successful_steps']}/{data['metadata']['total_steps']} successful")
-            print_response(data)
-        else:
-            print(f"\n❌ Error: {response.status_code}")
-            print(response.text)
-    
-    except requests.exceptions.ConnectionError:
+        data = client.execute(task)
+        print_summary(data)
+        print_response(data)
+    except AssistantError as e:
+        print(f"\n❌ Error: {e.status_code}")
+        print(e.detail)
+    except httpx.ConnectError:
         print("\n❌ Error: Could not connect to server")
         print("Make sure the server is running: uvicorn main:app --reload")
-    except Exception as e:
-        print(f"\n❌ Error: {str(e)}")
+
+def execute_batch(client: AssistantClient, tasks):
+    """Run several tasks in one /execute/batch call - results print as each one finishes"""
+    print(f"\n📦 Running {len(tasks)} tasks as a batch...")
+    for item in client.iter_batch(tasks, fields=["status", "metadata"]):
+        print(f"\n📝 Task {item.index + 1}: {item.task}")
+        if item.ok:
+            print_summary(item.result)
+        else:
+            print(f"❌ Error: {item.status_code} - {item.error}")
 
 def main():
     """Run example tasks"""
@@ -50,15 +56,16 @@ def main():
     print("AI Operations Assistant - Example Client")
     print("=" * 80)
     
+    client = AssistantClient(BASE_URL)
+    
     # Check if server is running
     try:
-        response = requests.get(f"{BASE_URL}/health", timeout=5)
-        if response.status_code == 200:
-            print("✅ Server is running")
-        else:
-            print("❌ Server returned unexpected status")
-            return
-    except:
+        client.health()
+        print("✅ Server is running")
+    except AssistantError:
+        print("❌ Server returned unexpected status")
+        return
+    except httpx.TransportError:
         print("❌ Server is not running. Please start it first:")
         print("   uvicorn main:app --reload")
         return
@@ -80,11 +87,15 @@ def main():
     
     # Run first example
     print("\n🚀 Running Example 1...")
-    execute_task(examples[0])
+    execute_task(client, examples[0])
+    
+    # The next two share one batch request (and the same pooled connection)
+    execute_batch(client, examples[1:3])
+    client.close()
     
     # Ask user if they want to run more
     print("\n" + "-" * 80)
-    print("\nTo run other examples, modify this script or use curl:")
+    print("\nTo run other examples, modify this script, use the client package or curl:")
     print("\ncurl -X POST http://localhost:8000/execute \\")
     print('  -H "Content-Type: application/json" \\')
     print('  -d \'{"task": "Your task here"}\'')
@@ -2,5 +2,6 @@
 LLM module for AI Operations Assistant
 """
 from .client import LLMClient
+from .router import ModelRouter
 
-__all__ = ["LLMClient"]
+__all__ = ["LLMClient", "ModelRouter"]
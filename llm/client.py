@@ -4,11 +4,18 @@ Supports structured JSON outputs using Pydantic models
 """
 import os
 import json
+import time
+from contextvars import ContextVar
 from typing import Any, Dict, List, Optional
 from google import genai
 from google.genai import types
 from pydantic import BaseModel
 
+from .router import ModelRouter, is_retryable
+
+# Which model served each stage of the current request - see LLMClient.start_trace
+_trace: ContextVar[Optional[Dict[str, str]]] = ContextVar("llm_trace", default=None)
+
 
 class LLMClient:
     """Wraps the Gemini API - makes it easy to get structured JSON responses"""
@@ -19,18 +26,84 @@ class LLMClient:
             raise ValueError("GEMINI_API_KEY environment variable is required")
         
         self.client = genai.Client(api_key=api_key)
-        self.model_name = "models/gemini-flash-latest"  # Using the free tier model
+        self.model_name = os.getenv("LLM_MODEL", "models/gemini-flash-latest")  # Using the free tier model
+        self.router = ModelRouter.from_env(self.model_name)
+    
+    def start_trace(self) -> Dict[str, str]:
+        """
+        Starts recording which model serves each stage for the current request
+        The returned dict fills in as calls are made (stage -> model)
+        """
+        trace: Dict[str, str] = {}
+        _trace.set(trace)
+        return trace
+    
+    def _generate(self, contents: str, temperature: float, stage: str):
+        """
+        Calls Gemini through the router - tries the stage's models in order and
+        falls back to the next one on quota/latency errors
+        """
+        candidates = self.router.candidates(stage, time.time())
+        timeout = self.router.timeout_for(stage)
+        last_error: Optional[Exception] = None
+        
+        for i, model in enumerate(candidates):
+            is_last = i == len(candidates) - 1
+            config = types.GenerateContentConfig(
+                temperature=temperature,
+                top_p=0.95,
+                top_k=40,
+                max_output_tokens=8192,
+                # The last candidate gets all the time it needs - nothing left to fall back to
+                http_options=types.HttpOptions(timeout=int(timeout * 1000)) if timeout and not is_last else None,
+            )
+            
+            start = time.perf_counter()
+            try:
+                response = self.client.models.generate_content(
+                    model=model,
+                    contents=contents,
+                    config=config
+                )
+            except Exception as e:
+                retryable = is_retryable(e)
+                # A timeout tells us the model is at least this slow - feed it into the average
+                text = f"{type(e).__name__} {e}".lower()
+                timed_out = "timeout" in text or "timed out" in text
+                elapsed = time.perf_counter() - start
+                self.router.record_failure(model, time.time(), retryable, elapsed if timed_out else None)
+                last_error = e
+                if not retryable:
+                    raise
+                print(f"[LLM] {model} failed for {stage} ({type(e).__name__}), falling back")
+                continue
+            
+            usage = getattr(response, "usage_metadata", None)
+            self.router.record_success(
+                model,
+                time.perf_counter() - start,
+                getattr(usage, "total_token_count", None),
+                time.time()
+            )
+            trace = _trace.get()
+            if trace is not None:
+                trace[stage] = model
+            return response
+        
+        raise last_error or Exception("No LLM model available")
     
     def generate_structured_output(
         self,
         prompt: str,
         system_prompt: str,
         response_format: Optional[type[BaseModel]] = None,
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        stage: str = "default"
     ) -> Dict[str, Any]:
         """
         Main method for getting structured JSON from the LLM
         Pass in a Pydantic model and it'll return data matching that schema
+        `stage` picks the model route (e.g. "verifier", "planner_complex")
         """
         try:
             full_prompt = f"{system_prompt}\n\n{prompt}"
@@ -42,16 +115,7 @@ class LLMClient:
                 full_prompt += "\n\nRespond ONLY with the JSON object, no additional text."
             
             # Call Gemini
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=full_prompt,
-                config=types.GenerateContentConfig(
-                    temperature=temperature,
-                    top_p=0.95,
-                    top_k=40,
-                    max_output_tokens=8192,
-                )
-            )
+            response = self._generate(full_prompt, temperature, stage)
             
             response_text = response.text.strip()
             
@@ -93,22 +157,14 @@ class LLMClient:
         self,
         prompt: str,
         system_prompt: str = "You are a helpful AI assistant.",
-        temperature: float = 0.7
+        temperature: float = 0.7,
+        stage: str = "default"
     ) -> str:
         """Simple text generation - no structured output"""
         try:
             full_prompt = f"{system_prompt}\n\n{prompt}"
             
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=full_prompt,
-                config=types.GenerateContentConfig(
-                    temperature=temperature,
-                    top_p=0.95,
-                    top_k=40,
-                    max_output_tokens=8192,
-                )
-            )
+            response = self._generate(full_prompt, temperature, stage)
             
             return response.text
         except Exception as e:
@@ -0,0 +1,181 @@
+"""
+Model router - picks which Gemini model serves each LLM call
+Light model for verification and simple plans, stronger one for complex plans,
+with fallback on quota/latency errors and adaptive choices from observed latency and tokens
+"""
+import os
+import threading
+from typing import Dict, List, Optional
+
+
+# Error codes worth trying another model for: quota, overload, timeouts
+RETRYABLE_CODES = {408, 429, 500, 503, 504}
+
+
+def is_retryable(error: Exception) -> bool:
+    """Quota/latency style failures - a different model may well succeed"""
+    if getattr(error, "code", None) in RETRYABLE_CODES:
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in ("timeout", "timed out", "resource_exhausted", "quota", "unavailable"))
+
+
+class ModelStats:
+    """Running stats for one model - EWMA so recent calls count more"""
+
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        self.calls = 0
+        self.failures = 0
+        self.latency: Optional[float] = None  # seconds
+        self.tokens: Optional[float] = None
+        self.cooldown_until = 0.0
+        self.updated_at = 0.0
+
+    def record(self, latency: float, tokens: Optional[int], now: float) -> None:
+        self.calls += 1
+        self.record_latency(latency, now)
+        if tokens:
+            self.tokens = tokens if self.tokens is None else self.alpha * tokens + (1 - self.alpha) * self.tokens
+
+    def record_latency(self, latency: float, now: float) -> None:
+        self.latency = latency if self.latency is None else self.alpha * latency + (1 - self.alpha) * self.latency
+        self.updated_at = now
+
+    def expire(self, now: float, max_age: float) -> None:
+        """
+        Forgets averages nobody has refreshed in max_age seconds - a demoted model gets no
+        new samples, so without this one slow spell would keep it demoted for good
+        """
+        if self.latency is not None and now - self.updated_at > max_age:
+            self.latency = None
+            self.tokens = None
+
+    def to_dict(self) -> Dict[str, Optional[float]]:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "avg_latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "avg_tokens": round(self.tokens, 1) if self.tokens is not None else None
+        }
+
+
+def _models(env_var: str, default: List[str]) -> List[str]:
+    value = os.getenv(env_var)
+    if not value:
+        return default
+    return [model.strip() for model in value.split(",") if model.strip()]
+
+
+class ModelRouter:
+    """
+    Each stage has an ordered list of candidate models (first = preferred)
+    The preferred model is used unless it's cooling down after a quota error or its
+    observed latency is over the stage's budget - then the healthy candidates within budget
+    are tried cheapest (fewest tokens per call) first, and the fastest if none are
+    A call only times out at budget x timeout_factor, so "slow but working" shows up in
+    the averages; averages older than stats_max_age are dropped so a demoted model is retried
+    """
+
+    def __init__(
+        self,
+        routes: Dict[str, List[str]],
+        fallbacks: List[str],
+        latency_budgets: Optional[Dict[str, float]] = None,
+        cooldown: float = 60.0,
+        timeout_factor: float = 2.0,
+        stats_max_age: float = 300.0
+    ):
+        self.routes = routes
+        self.fallbacks = fallbacks
+        self.latency_budgets = latency_budgets or {}
+        self.cooldown = cooldown
+        self.timeout_factor = timeout_factor
+        self.stats_max_age = stats_max_age
+        self.stats: Dict[str, ModelStats] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, default_model: str) -> "ModelRouter":
+        fast = os.getenv("LLM_MODEL_FAST", "models/gemini-flash-lite-latest")
+        strong = os.getenv("LLM_MODEL_STRONG", "models/gemini-pro-latest")
+
+        routes = {
+            "default": _models("LLM_MODELS_DEFAULT", [default_model]),
+            "planner_simple": _models("LLM_MODELS_PLANNER_SIMPLE", [fast, default_model]),
+            "planner_complex": _models("LLM_MODELS_PLANNER_COMPLEX", [strong, default_model]),
+            "verifier": _models("LLM_MODELS_VERIFIER", [fast, default_model]),
+        }
+        budgets = {
+            "planner_simple": float(os.getenv("LLM_LATENCY_BUDGET_PLANNER_SIMPLE", 8)),
+            "planner_complex": float(os.getenv("LLM_LATENCY_BUDGET_PLANNER_COMPLEX", 20)),
+            "verifier": float(os.getenv("LLM_LATENCY_BUDGET_VERIFIER", 6)),
+            "default": float(os.getenv("LLM_LATENCY_BUDGET_DEFAULT", 15)),
+        }
+        return cls(
+            routes=routes,
+            fallbacks=_models("LLM_FALLBACK_MODELS", [default_model]),
+            latency_budgets=budgets,
+            cooldown=float(os.getenv("LLM_MODEL_COOLDOWN", 60)),
+            timeout_factor=float(os.getenv("LLM_TIMEOUT_FACTOR", 2)),
+            stats_max_age=float(os.getenv("LLM_STATS_MAX_AGE", 300))
+        )
+
+    def candidates(self, stage: str, now: float) -> List[str]:
+        """Models to try for a stage, in order"""
+        preferred = self.routes.get(stage) or self.routes["default"]
+        ordered = list(dict.fromkeys(preferred + self.fallbacks))
+        budget = self.latency_budgets.get(stage)
+
+        with self._lock:
+            for model in ordered:
+                self._stats(model).expire(now, self.stats_max_age)
+            healthy = [m for m in ordered if self._stats(m).cooldown_until <= now]
+            cooling = [m for m in ordered if m not in healthy]
+
+            if healthy and budget is not None:
+                first = self._stats(healthy[0])
+                if first.latency is not None and first.latency > budget:
+                    # Preferred model is running slow - within-budget models first, cheapest of
+                    # those first, unknown ones after them (in configured order), slow ones last
+                    def rank(model: str):
+                        stats = self._stats(model)
+                        if stats.latency is None:
+                            return (1, 0.0, 0.0)
+                        if stats.latency > budget:
+                            return (2, stats.latency, 0.0)
+                        return (0, stats.tokens if stats.tokens is not None else float("inf"), stats.latency)
+
+                    healthy.sort(key=rank)
+
+        # Cooling-down models go last - better than failing outright
+        return healthy + cooling
+
+    def timeout_for(self, stage: str) -> Optional[float]:
+        """Seconds before we give up on a model and fall back - well past the budget"""
+        budget = self.latency_budgets.get(stage)
+        return budget * self.timeout_factor if budget is not None else None
+
+    def record_success(self, model: str, latency: float, tokens: Optional[int], now: float) -> None:
+        with self._lock:
+            self._stats(model).record(latency, tokens, now)
+
+    def record_failure(self, model: str, now: float, retryable: bool, latency: Optional[float] = None) -> None:
+        """`latency` is set for timeouts - the time we waited counts as a (lower bound) sample"""
+        with self._lock:
+            stats = self._stats(model)
+            stats.failures += 1
+            if latency is not None:
+                stats.record_latency(latency, now)
+            if retryable:
+                stats.cooldown_until = now + self.cooldown
+
+    def snapshot(self) -> Dict[str, Dict[str, Optional[float]]]:
+        with self._lock:
+            return {model: stats.to_dict() for model, stats in self.stats.items()}
+
+    def _stats(self, model: str) -> ModelStats:
+        stats = self.stats.get(model)
+        if stats is None:
+            stats = self.stats[model] = ModelStats()
+        return stats
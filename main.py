@@ -2,19 +2,63 @@
 Main FastAPI app - handles the multi-agent workflow
 Built this to orchestrate between planner, executor, and verifier agents
 """
+import asyncio
 import os
-from typing import Dict, Any
+import time
+from typing import Dict, Any, List, Optional, Tuple
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
 from llm.client import LLMClient
-from tools import GitHubTool, WeatherTool, NewsTool
-from agents import PlannerAgent, ExecutorAgent, VerifierAgent
+from tools import GitHubTool, WeatherTool, NewsTool, ResultCache
+from agents import (
+    PlannerAgent,
+    ExecutorAgent,
+    VerifierAgent,
+    SpeculativePrefetcher,
+    PopularityPrefetcher,
+    SpaceSaving,
+)
+from server import (
+    AdmissionController,
+    AdmissionRejected,
+    IdempotencyConflict,
+    IdempotencyStore,
+    ResponseCache,
+    body_etag,
+    build_task_payload,
+    default_history_store,
+    default_job_store,
+    default_profilers,
+    dumps,
+    fingerprint,
+    identify_client,
+    in_prefork,
+    parse_fields,
+    project_fields,
+    require_admin,
+    serve,
+    worker_stats,
+    SharedState,
+    WorkerLoadMiddleware,
+)
 
 load_dotenv()
 
+# Fast mode skips the response_model validation pass and encodes the dict directly
+FAST_SERIALIZATION = os.getenv("FAST_SERIALIZATION", "true").lower() == "true"
+
+# Opt-in: start obvious tool calls (e.g. "weather in Tokyo") while the planner is running
+SPECULATIVE_PREFETCH = os.getenv("SPECULATIVE_PREFETCH", "false").lower() == "true"
+
+# Bigger batches should be split client-side (the SDK in client/ does this)
+BATCH_MAX_TASKS = int(os.getenv("BATCH_MAX_TASKS", 20))
+
 app = FastAPI(
     title="AI Operations Assistant",
     description="Multi-agent AI system for task automation with Google Gemini LLM and API integrations",
@@ -30,22 +74,68 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress big GitHub/news payloads - small responses aren't worth the CPU
+app.add_middleware(GZipMiddleware, minimum_size=int(os.getenv("GZIP_MIN_SIZE", 1024)))
+
+# Per-worker request counters for /admin/workers (does nothing in single-process mode)
+app.add_middleware(WorkerLoadMiddleware)
+
+# Recent tool results are reused, and served stale while upstream is slow or down
+TOOL_RESULT_CACHE = os.getenv("TOOL_RESULT_CACHE", "true").lower() == "true"
+
+# Keeps the most requested cities/topics/categories warm in that cache (needs TOOL_RESULT_CACHE)
+POPULARITY_PREFETCH = os.getenv("POPULARITY_PREFETCH", "true").lower() == "true"
+
 # Set up all the components - LLM client, tools, and agents
 try:
     llm_client = LLMClient()
     tools = [GitHubTool(), WeatherTool(), NewsTool()]
     
     planner = PlannerAgent(llm_client, tools)
-    executor = ExecutorAgent(tools)
+    result_cache = ResultCache(max_entries=int(os.getenv("TOOL_CACHE_MAX_ENTRIES", 2000))) if TOOL_RESULT_CACHE else None
+    popularity = SpaceSaving(capacity=int(os.getenv("POPULARITY_CAPACITY", 256)))
+    executor = ExecutorAgent(tools, result_cache=result_cache, tracker=popularity)
     verifier = VerifierAgent(llm_client)
+    prefetcher = SpeculativePrefetcher(tools, executor)
+    popular_prefetcher = PopularityPrefetcher.from_env(executor, popularity)
+    admission = AdmissionController.from_env()
+    response_cache = ResponseCache(ttl=float(os.getenv("RESPONSE_CACHE_TTL", 0)))
+    history = default_history_store()
+    jobs = default_job_store()
+    # Idempotency keys (and, with several workers, client limits) live next to the jobs
+    shared_state = SharedState(jobs.path) if jobs is not None else None
+    idempotency = IdempotencyStore(ttl=float(os.getenv("IDEMPOTENCY_TTL", 86400)), shared=shared_state)
+    cpu_profiler, memory_profiler = default_profilers()
 except Exception as e:
     print(f"Error initializing components: {e}")
     print("Make sure all required environment variables are set in .env file")
     raise
 
 
+@app.on_event("startup")
+async def start_background_work():
+    if POPULARITY_PREFETCH and result_cache is not None:
+        popular_prefetcher.start()
+    if history is not None:
+        history.start()
+    if shared_state is not None and in_prefork():
+        admission.share(shared_state)
+    if jobs is not None:
+        orphaned = await run_in_threadpool(jobs.fail_orphaned)
+        if orphaned:
+            print(f"[JOBS] Failed {orphaned} job(s) left unfinished by workers that exited")
+
+
+@app.on_event("shutdown")
+async def stop_background_work():
+    popular_prefetcher.stop()
+    if history is not None:
+        history.stop()
+
+
 class TaskRequest(BaseModel):
     task: str
+    speculative: Optional[bool] = None  # overrides SPECULATIVE_PREFETCH for this request
     
     class Config:
         json_schema_extra = {
@@ -55,6 +145,12 @@ class TaskRequest(BaseModel):
         }
 
 
+class BatchRequest(BaseModel):
+    tasks: List[str]
+    idempotency_keys: Optional[List[Optional[str]]] = None  # one per task, same order
+    speculative: Optional[bool] = None
+
+
 class TaskResponse(BaseModel):
     task_summary: str
     status: str
@@ -72,8 +168,17 @@ async def root():
         "description": "Multi-agent AI system with Planner, Executor, and Verifier agents",
         "endpoints": {
             "/execute": "POST - Execute a natural language task",
+            "/execute/batch": "POST - Execute several tasks, results streamed back as NDJSON",
+            "/jobs": "POST - Queue a task in the background and poll GET /jobs/{job_id}",
             "/health": "GET - Health check",
-            "/tools": "GET - List available tools"
+            "/tools": "GET - List available tools",
+            "/tools/github_search/stream": "GET - Stream GitHub search results as NDJSON",
+            "/admin/prefetch": "GET - Popular tool calls and prefetch hit rate (admin only)",
+            "/history": "GET - Past executions, newest first (admin only)",
+            "/admin/workers": "GET - Per-worker load when running with WORKERS > 1 (admin only)",
+            "/admin/keys": "GET - Per-key API quota usage for each tool (admin only)",
+            "/admin/profile/cpu/start": "POST - Start the sampling CPU profiler (admin only)",
+            "/admin/profile/memory/diff": "GET - tracemalloc growth by allocation site (admin only)"
         },
         "example_tasks": [
             "Find the top 5 Python repositories on GitHub",
@@ -92,7 +197,17 @@ async def health_check():
         "status": "healthy",
         "agents": ["planner", "executor", "verifier"],
         "tools": [tool.name for tool in tools],
-        "llm_model": llm_client.model_name
+        "llm_model": llm_client.model_name,
+        "llm_models": llm_client.router.snapshot(),
+        "admission": admission.stats(),
+        "tool_cache": result_cache.snapshot() if result_cache else None,
+        "tool_pools": executor.pool_stats(),
+        "tool_latency": {tool.name: tool.latency.snapshot() for tool in tools},
+        "history": history.snapshot() if history else None,
+        "github_index": {
+            tool.name: tool.repo_index.snapshot()
+            for tool in tools if getattr(tool, "repo_index", None) is not None
+        }
     }
 
 
@@ -111,21 +226,178 @@ async def list_tools():
     }
 
 
-@app.post("/execute", response_model=TaskResponse)
-async def execute_task(request: TaskRequest):
+@app.get("/tools/github_search/stream")
+async def stream_github_search(query: str, sort: str = "stars", limit: int = 100):
     """
-    Main endpoint - this is where the magic happens
-    Takes a natural language task and runs it through our agent pipeline
+    Streams matching repositories as NDJSON (one repo per line) - good for big limits
+    Pages are fetched in parallel behind the scenes, but only a few are kept in memory
+    """
+    github = next((tool for tool in tools if tool.name == "github_search"), None)
+    if github is None:
+        raise HTTPException(status_code=404, detail="github_search tool is not available")
+    
+    def lines():
+        try:
+            for repo in github.iter_repositories(query, sort=sort, limit=limit):
+                yield dumps(repo) + b"\n"
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            yield dumps({"error": f"GitHub API request failed: {str(e)}"}) + b"\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.get("/admin/prefetch", dependencies=[Depends(require_admin)])
+async def prefetch_stats():
+    """Current top-K tool calls, per-tool prefetch budgets and how often warmed results got used"""
+    return popular_prefetcher.snapshot()
+
+
+@app.get("/admin/keys", dependencies=[Depends(require_admin)])
+async def key_usage():
+    """Per-tool API key pools - calls, remaining quota and state of each key (shown by last 4 chars)"""
+    return {tool.name: tool.key_pool.snapshot() for tool in tools if tool.key_pool is not None}
+
+
+@app.post("/admin/profile/cpu/start", dependencies=[Depends(require_admin)])
+async def start_cpu_profile(interval_ms: Optional[float] = None, duration: float = 60):
+    """
+    Starts the sampling profiler on this worker - it stops by itself after `duration` seconds
+    (at most PROFILE_MAX_SECONDS) so a forgotten profile can't run forever
+    """
+    duration = min(duration, float(os.getenv("PROFILE_MAX_SECONDS", 600)))
+    try:
+        cpu_profiler.start(interval=interval_ms / 1000 if interval_ms else None, duration=duration)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"pid": os.getpid(), "interval_ms": cpu_profiler.interval * 1000, "duration_s": duration}
+
+
+@app.post("/admin/profile/cpu/stop", dependencies=[Depends(require_admin)])
+async def stop_cpu_profile(format: str = "summary", limit: int = 30, include_idle: bool = False):
+    """Stops the profiler and returns top functions, or ?format=collapsed for flamegraph input"""
+    cpu_profiler.stop()
+    return _cpu_profile(format, limit, include_idle)
+
+
+@app.get("/admin/profile/cpu", dependencies=[Depends(require_admin)])
+async def get_cpu_profile(format: str = "summary", limit: int = 30, include_idle: bool = False):
+    """Results so far - works while the profiler is still running"""
+    return _cpu_profile(format, limit, include_idle)
+
+
+def _cpu_profile(format: str, limit: int, include_idle: bool):
+    if format == "collapsed":
+        return PlainTextResponse(cpu_profiler.collapsed(include_idle=include_idle))
+    return cpu_profiler.summary(limit=max(1, min(limit, 500)), include_idle=include_idle)
+
+
+@app.post("/admin/profile/memory/snapshot", dependencies=[Depends(require_admin)])
+def take_memory_snapshot():
+    """Turns tracemalloc on (first call) and records a snapshot to diff against later"""
+    return memory_profiler.snapshot()
+
+
+@app.get("/admin/profile/memory/diff", dependencies=[Depends(require_admin)])
+def diff_memory(
+    base: Optional[int] = None,
+    limit: int = 25,
+    group_by: str = "lineno",
+    app_only: bool = False
+):
+    """
+    Takes a new snapshot and shows what grew since `base` (default: the previous snapshot),
+    grouped by allocation site - app_only=true keeps allocations made from our own code
     """
     try:
+        return memory_profiler.diff(base=base, limit=max(1, min(limit, 500)), group_by=group_by, app_only=app_only)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+
+
+@app.post("/admin/profile/memory/stop", dependencies=[Depends(require_admin)])
+def stop_memory_tracing():
+    """Turns tracemalloc off again - it makes every allocation noticeably slower"""
+    return memory_profiler.stop()
+
+
+@app.get("/admin/workers", dependencies=[Depends(require_admin)])
+async def list_workers():
+    """Per-worker pid, uptime, request count and in-flight requests (pre-fork mode)"""
+    return worker_stats()
+
+
+@app.get("/history", dependencies=[Depends(require_admin)])
+def list_history(
+    limit: int = 50,
+    before: Optional[int] = None,
+    status: Optional[str] = None,
+    tool: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None
+):
+    """
+    Past executions, newest first - pass next_cursor back as ?before= for the next page
+    Filter by status, tool, or a since/until unix time range
+    """
+    if history is None:
+        raise HTTPException(status_code=404, detail="Execution history is disabled")
+    return history.query(
+        limit=max(1, min(limit, 500)), before=before, status=status, tool=tool, since=since, until=until
+    )
+
+
+@app.get("/history/{execution_id}", dependencies=[Depends(require_admin)])
+def get_history_entry(execution_id: int):
+    """One past execution with its plan, step results and metadata"""
+    entry = history.get(execution_id) if history is not None else None
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Execution not found")
+    return entry
+
+
+def run_pipeline(task: str, speculative: bool) -> Dict[str, Any]:
+    """
+    Runs one task through planner -> executor -> verifier and returns the response body
+    Blocking - the endpoint runs it in the threadpool so the event loop stays free
+    """
+    speculation = None
+    plan = None
+    step_results = None
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    try:
+        models_used = llm_client.start_trace()
+        if speculative:
+            speculation = prefetcher.start(task)
+        
         # First, let the planner figure out what to do
-        print(f"\n[PLANNER] Creating execution plan for: {request.task}")
-        plan = planner.create_plan(request.task)
-        print(f"[PLANNER] Created plan with {len(plan.steps)} steps")
+        print(f"\n[PLANNER] Creating execution plan for: {task}")
+        stage_started = time.perf_counter()
+        plan = planner.create_plan(task)
+        timings["planning"] = _elapsed_ms(stage_started)
+        print(f"[PLANNER] Created plan with {len(plan.steps)} steps ({plan.optimization.get('upstream_calls')} upstream calls)")
         
         # Now execute each step
         print(f"\n[EXECUTOR] Executing {len(plan.steps)} steps...")
-        step_results = executor.execute_plan(plan)
+        stage_started = time.perf_counter()
+        # Incremental mode checks each step while the rest are still running
+        verification = verifier.start(plan)
+        step_results = executor.execute_plan(
+            plan,
+            speculation=speculation,
+            on_result=verification.add if verification is not None else None
+        )
+        timings["execution"] = _elapsed_ms(stage_started)
+        
+        speculation_stats = None
+        if speculation is not None:
+            speculation_stats = speculation.finish()
+            speculation = None
+            prefetcher.record(speculation_stats)
+            print(f"[EXECUTOR] Speculative calls: {speculation_stats['used']} used, {speculation_stats['wasted']} wasted")
         
         # Log each step result
         for i, result in enumerate(step_results, 1):
@@ -134,47 +406,249 @@ async def execute_task(request: TaskRequest):
         
         # Finally, verify and format the output
         print(f"\n[VERIFIER] Verifying results and formatting output...")
-        final_output = verifier.verify_and_format(plan, step_results)
+        stage_started = time.perf_counter()
+        if verification is not None:
+            final_output = verification.finish(step_results)
+        else:
+            final_output = verifier.verify_and_format(plan, step_results)
+        timings["verification"] = _elapsed_ms(stage_started)
         print(f"[VERIFIER] Status: {final_output.status}, Quality: {final_output.metadata['quality_score']}/10")
+        final_output.metadata["plan_optimization"] = plan.optimization
+        final_output.metadata["tool_selection"] = plan.tool_selection
+        final_output.metadata["plan_validation"] = plan.validation
+        final_output.metadata["models"] = models_used
+        if speculation_stats is not None:
+            final_output.metadata["speculation"] = speculation_stats
+        timings["total"] = _elapsed_ms(started)
+        final_output.metadata["timings_ms"] = timings
         
-        # Build the response
-        response = TaskResponse(
-            task_summary=final_output.task_summary,
-            status=final_output.status,
-            results=final_output.results,
-            metadata=final_output.metadata,
-            execution_plan={
-                "steps": [
-                    {
-                        "step_number": step.step_number,
-                        "tool": step.tool_name,
-                        "description": step.description,
-                        "parameters": step.parameters
-                    }
-                    for step in plan.steps
-                ],
-                "expected_output": plan.expected_output
-            }
-        )
+        if history is not None:
+            history.record(task, plan, step_results, final_output, timings)
         
         print(f"\n[COMPLETE] Task finished with status: {final_output.status}\n")
-        return response
-        
+        return build_task_payload(plan, final_output)
     except Exception as e:
-        print(f"\n[ERROR] Task execution failed: {str(e)}\n")
-        raise HTTPException(status_code=500, detail=str(e))
+        if history is not None:
+            timings["total"] = _elapsed_ms(started)
+            history.record(task, plan, step_results, timings=timings, error=str(e))
+        raise
+    finally:
+        # Planning failed before we got to use them - everything is waste
+        if speculation is not None:
+            prefetcher.record(speculation.finish())
 
 
-if __name__ == "__main__":
-    import uvicorn
+def _elapsed_ms(since: float) -> float:
+    return round((time.perf_counter() - since) * 1000, 1)
+
+
+async def _admit_and_run(task: str, client_id: str, lane: str, speculative: bool) -> Dict[str, Any]:
+    """Waits for an admission slot, then runs the pipeline in the threadpool"""
+    try:
+        async with admission.slot(client_id, lane) as ticket:
+            try:
+                payload = await run_in_threadpool(run_pipeline, task, speculative)
+            except Exception as e:
+                print(f"\n[ERROR] Task execution failed: {str(e)}\n")
+                raise HTTPException(status_code=500, detail=str(e))
+    except AdmissionRejected as e:
+        headers = {"Retry-After": str(max(1, round(e.retry_after)))} if e.retry_after else None
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=headers)
+    
+    # The cache is shared by every client, so it gets the payload before anything caller-specific
+    response_cache.put(task, payload)
+    return {**payload, "metadata": {**payload["metadata"], "admission": ticket.to_dict()}}
+
+
+async def _execute_once(
+    task: str,
+    client_id: str,
+    lane: str,
+    speculative: bool,
+    idempotency_key: Optional[str] = None
+) -> Tuple[Dict[str, Any], Optional[float], bool]:
+    """
+    Response cache first, then idempotent replay, then a real run
+    Returns (payload, cache age or None, replayed) - shared by /execute, /execute/batch and /jobs
+    """
+    cached = response_cache.get(task)
+    if cached is not None:
+        payload, age = cached
+        payload = {**payload, "metadata": {**payload["metadata"], "cache": {"hit": True, "age_seconds": round(age, 1)}}}
+        return payload, age, False
+    
+    run = lambda: _admit_and_run(task, client_id, lane, speculative)
+    if not idempotency_key:
+        return await run(), None, False
+    try:
+        payload, replayed = await idempotency.run((client_id, idempotency_key), fingerprint(task), run)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return payload, None, replayed
+
+
+@app.post("/execute", response_model=TaskResponse)
+async def execute_task(
+    request: TaskRequest,
+    http_request: Request,
+    response: Response,
+    fields: Optional[str] = None
+):
+    """
+    Main endpoint - this is where the magic happens
+    Takes a natural language task and runs it through our agent pipeline
+    Use ?fields=results,status to only get back the parts you need
+    Clients are identified by a key from CLIENT_API_KEYS (X-API-Key), or else by IP; send X-Priority: batch for bulk work
+    Send an Idempotency-Key header to make retries safe - they reuse the original run
+    """
+    client_id, lane = identify_client(
+        http_request.headers, http_request.client.host if http_request.client else None, admission.api_keys
+    )
+    speculative = SPECULATIVE_PREFETCH if request.speculative is None else request.speculative
+    headers: Dict[str, str] = {}
+    
+    payload, age, replayed = await _execute_once(
+        request.task, client_id, lane, speculative, http_request.headers.get("idempotency-key")
+    )
+    if age is not None:
+        headers["Age"] = str(int(age))
+    if replayed:
+        headers["Idempotent-Replayed"] = "true"
+    
+    # Build the response
+    selected = parse_fields(fields)
+    body = dumps(project_fields(payload, selected))
+    # POST responses aren't reusable by HTTP caches - the ETag just lets clients spot identical results
+    headers["ETag"] = body_etag(body)
+    headers["Cache-Control"] = "no-store"
+    
+    if FAST_SERIALIZATION or selected:
+        # Projected responses don't match TaskResponse anymore, so they always go this way
+        return Response(content=body, media_type="application/json", headers=headers)
     
+    response.headers.update(headers)
+    return TaskResponse(**payload)
+
+
+@app.post("/execute/batch")
+async def execute_batch(request: BatchRequest, http_request: Request, fields: Optional[str] = None):
+    """
+    Runs several tasks concurrently (still through admission control) and streams NDJSON back,
+    one line per task as soon as it finishes: {"index", "status_code", "result"} or {..., "error"}
+    Items that get rate limited come back with status_code 429 and a retry_after - resend just those
+    """
+    if not request.tasks:
+        raise HTTPException(status_code=422, detail="tasks must not be empty")
+    if len(request.tasks) > BATCH_MAX_TASKS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_TASKS} tasks per batch")
+    keys = request.idempotency_keys or []
+    if keys and len(keys) != len(request.tasks):
+        raise HTTPException(status_code=422, detail="idempotency_keys must have one entry per task")
+    
+    client_id, lane = identify_client(
+        http_request.headers, http_request.client.host if http_request.client else None, admission.api_keys
+    )
+    speculative = SPECULATIVE_PREFETCH if request.speculative is None else request.speculative
+    selected = parse_fields(fields)
+    
+    async def run_one(index: int, task: str) -> Dict[str, Any]:
+        key = keys[index] if keys else None
+        try:
+            payload, _, replayed = await _execute_once(task, client_id, lane, speculative, key)
+        except HTTPException as e:
+            item = {"index": index, "status_code": e.status_code, "error": e.detail}
+            retry_after = (e.headers or {}).get("Retry-After")
+            if retry_after:
+                item["retry_after"] = float(retry_after)
+            return item
+        return {"index": index, "status_code": 200, "replayed": replayed, "result": project_fields(payload, selected)}
+    
+    async def lines():
+        pending = [asyncio.ensure_future(run_one(i, task)) for i, task in enumerate(request.tasks)]
+        try:
+            for finished in asyncio.as_completed(pending):
+                yield dumps(await finished) + b"\n"
+        finally:
+            # Client went away - don't keep running work nobody will read
+            for future in pending:
+                future.cancel()
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+# Keeps references to running job tasks so they don't get garbage collected mid-run
+_job_tasks: set = set()
+
+
+async def _run_job(job_id: str, task: str, client_id: str, lane: str, speculative: bool) -> None:
+    try:
+        await run_in_threadpool(jobs.start, job_id)
+        payload, _, _ = await _execute_once(task, client_id, lane, speculative)
+    except HTTPException as e:
+        await run_in_threadpool(jobs.fail, job_id, e.status_code, str(e.detail))
+        return
+    except Exception as e:
+        # Anything else would leave the job "running" forever
+        print(f"\n[ERROR] Job {job_id} failed: {str(e)}\n")
+        await run_in_threadpool(jobs.fail, job_id, 500, str(e))
+        return
+    await run_in_threadpool(jobs.succeed, job_id, payload)
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: TaskRequest, http_request: Request, response: Response):
+    """
+    Queues a task and returns right away - poll GET /jobs/{job_id} for the result
+    Handy when a proxy or client timeout is shorter than a slow task
+    Resending the same Idempotency-Key returns the job that's already there (422 for a different task)
+    """
+    if jobs is None:
+        raise HTTPException(status_code=404, detail="Background jobs are disabled")
+    client_id, lane = identify_client(
+        http_request.headers, http_request.client.host if http_request.client else None, admission.api_keys
+    )
+    speculative = SPECULATIVE_PREFETCH if request.speculative is None else request.speculative
+    
+    try:
+        job, created = await run_in_threadpool(
+            jobs.create, client_id, request.task, http_request.headers.get("idempotency-key")
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if created:
+        runner = asyncio.ensure_future(_run_job(job["job_id"], request.task, client_id, lane, speculative))
+        _job_tasks.add(runner)
+        runner.add_done_callback(_job_tasks.discard)
+    else:
+        response.headers["Idempotent-Replayed"] = "true"
+    
+    response.headers["Location"] = f"/jobs/{job['job_id']}"
+    job.pop("client")
+    return job
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str, http_request: Request, response: Response):
+    """Job status, plus the full response once it's done - only visible to the client that submitted it"""
+    client_id, _ = identify_client(
+        http_request.headers, http_request.client.host if http_request.client else None, admission.api_keys
+    )
+    job = jobs.get(job_id) if jobs is not None else None
+    if job is None or job.pop("client") != client_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] in ("queued", "running"):
+        response.headers["Retry-After"] = "1"
+    return job
+
+
+if __name__ == "__main__":
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", 8000))
     
     print("=" * 60)
     print("AI Operations Assistant - Multi-Agent System")
     print("=" * 60)
-    print(f"Server starting on http://{host}:{port}")
+    print(f"Server starting on http://{host}:{port} ({os.getenv('WORKERS', '1')} worker(s))")
     print(f"\nAvailable tools: {', '.join([tool.name for tool in tools])}")
     print(f"LLM Model: Google {llm_client.model_name}")
     print("\nExample request:")
@@ -184,4 +658,5 @@ if __name__ == "__main__":
     print("=" * 60)
     print()
     
-    uvicorn.run(app, host=host, port=port)
+    # WORKERS > 1 forks that many uvicorn workers sharing one socket (WORKERS=0 = one per core)
+    serve(app, host, port, shared_state=shared_state)
@@ -0,0 +1,52 @@
+"""
+Server module for AI Operations Assistant - HTTP-layer helpers used by main.py
+"""
+from .admin import require_admin
+from .history import HistoryStore, default_history_store
+from .jobs import JobStore, default_job_store
+from .profiling import MemoryProfiler, SamplingProfiler, default_profilers
+from .launcher import Launcher, WorkerLoadMiddleware, in_prefork, serve, worker_stats
+from .shared_state import SharedState
+from .admission import AdmissionController, AdmissionRejected, identify_client
+from .idempotency import (
+    IdempotencyConflict,
+    IdempotencyStore,
+    ResponseCache,
+    body_etag,
+    fingerprint,
+)
+from .serialization import (
+    build_task_payload,
+    dumps,
+    parse_fields,
+    project_fields,
+)
+
+__all__ = [
+    "require_admin",
+    "HistoryStore",
+    "default_history_store",
+    "JobStore",
+    "default_job_store",
+    "MemoryProfiler",
+    "SamplingProfiler",
+    "default_profilers",
+    "Launcher",
+    "WorkerLoadMiddleware",
+    "in_prefork",
+    "serve",
+    "worker_stats",
+    "SharedState",
+    "AdmissionController",
+    "AdmissionRejected",
+    "identify_client",
+    "IdempotencyConflict",
+    "IdempotencyStore",
+    "ResponseCache",
+    "body_etag",
+    "fingerprint",
+    "build_task_payload",
+    "dumps",
+    "parse_fields",
+    "project_fields"
+]
@@ -0,0 +1,24 @@
+"""
+Guard for the /admin endpoints
+With ADMIN_TOKEN set, callers must send it in X-Admin-Token; without it, only localhost gets in
+"""
+import hmac
+import os
+
+from fastapi import HTTPException, Request
+
+LOOPBACK_HOSTS = {"127.0.0.1", "::1"}
+
+
+def require_admin(request: Request) -> None:
+    """FastAPI dependency - raises 403 unless the caller is allowed to see admin data"""
+    token = os.getenv("ADMIN_TOKEN")
+    if token:
+        supplied = request.headers.get("x-admin-token", "")
+        if hmac.compare_digest(supplied.encode("utf-8"), token.encode("utf-8")):
+            return
+        raise HTTPException(status_code=403, detail="Invalid or missing X-Admin-Token")
+
+    host = request.client.host if request.client else None
+    if host not in LOOPBACK_HOSTS:
+        raise HTTPException(status_code=403, detail="Admin endpoints are only available from localhost unless ADMIN_TOKEN is set")
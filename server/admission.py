@@ -0,0 +1,329 @@
+"""
+Admission control - per-client rate/concurrency limits plus a weighted fair queue
+Stops one noisy client from eating all the LLM and upstream quota
+"""
+import asyncio
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Set, Tuple
+
+LANES = ("interactive", "batch")
+
+
+class AdmissionRejected(Exception):
+    """Request turned away - carries the HTTP status and a Retry-After hint"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[float] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Classic token bucket - `rate` tokens per second, up to `burst` saved up"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> Optional[float]:
+        """Takes a token - returns None if allowed, otherwise seconds until one is available"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return None
+        return (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+class _ClientState:
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.active = 0
+        self.last_finish = 0.0  # WFQ virtual finish tag of the client's last request
+
+
+class _Waiter:
+    def __init__(self, client_id: str, lane: str, tag: float, future: asyncio.Future):
+        self.client_id = client_id
+        self.lane = lane
+        self.tag = tag
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class Ticket:
+    """What an admitted request gets back - mostly for reporting"""
+
+    def __init__(self, client_id: str, lane: str, queue_wait: float):
+        self.client_id = client_id
+        self.lane = lane
+        self.queue_wait = queue_wait
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "client": self.client_id,
+            "lane": self.lane,
+            "queue_wait_ms": round(self.queue_wait * 1000, 1)
+        }
+
+
+class AdmissionController:
+    """
+    Everything runs on the event loop, so no locks needed
+    - Per client: token bucket rate limit + max in-flight tasks
+    - Globally: max_concurrency pipelines at once; the rest wait in a queue
+    - Queue: two lanes (interactive/batch) shared by weighted round robin, and
+      within a lane, weighted fair queuing across clients (virtual finish tags)
+    With share() (pre-fork mode) the per-client bucket and in-flight count live in SQLite,
+    so client limits hold across workers; max_concurrency and the queue stay per worker.
+    SQLite is only touched from one background thread: the token is taken there (awaited),
+    in-flight counts are written there in order, and the other workers' counts are read
+    when a request arrives and every poll_interval while requests wait
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        client_rate: float = 0.5,
+        client_burst: float = 10,
+        client_concurrency: int = 2,
+        max_queue: int = 100,
+        queue_timeout: float = 30.0,
+        client_weights: Optional[Dict[str, float]] = None,
+        lane_weights: Optional[Dict[str, int]] = None,
+        api_keys: Optional[Set[str]] = None
+    ):
+        self.max_concurrency = max_concurrency
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.client_concurrency = client_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.client_weights = client_weights or {}
+        self.lane_weights = lane_weights or {"interactive": 3, "batch": 1}
+        # Hashes of the keys we recognize - anything else is keyed by IP (see identify_client)
+        self.api_keys = api_keys or set()
+
+        self.active = 0
+        self.virtual_time = 0.0
+        self.clients: Dict[str, _ClientState] = {}
+        self.waiting: Dict[str, List[_Waiter]] = {lane: [] for lane in LANES}
+        self._lane_credit = {lane: 0 for lane in LANES}
+        self.rejected = 0
+        self.max_clients = 10000
+        self.shared = None
+        self.poll_interval = 0.2
+        self._poller: Optional[asyncio.Task] = None
+        self._shared_io: Optional[ThreadPoolExecutor] = None
+        self._elsewhere: Dict[str, int] = {}  # in-flight counts on other workers, as last read
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        keys = {key.strip() for key in os.getenv("CLIENT_API_KEYS", "").split(",") if key.strip()}
+        weights = {}
+        for item in os.getenv("CLIENT_WEIGHTS", "").split(","):
+            if ":" in item:
+                client, weight = item.rsplit(":", 1)
+                # Only configured keys get a weight - anyone could claim an arbitrary name
+                if client.strip() in keys:
+                    weights[client_key(client.strip())] = float(weight)
+        return cls(
+            max_concurrency=int(os.getenv("MAX_CONCURRENT_TASKS", 8)),
+            client_rate=float(os.getenv("CLIENT_RATE_PER_MIN", 30)) / 60,
+            client_burst=float(os.getenv("CLIENT_BURST", 10)),
+            client_concurrency=int(os.getenv("CLIENT_MAX_CONCURRENCY", 2)),
+            max_queue=int(os.getenv("MAX_QUEUED_TASKS", 100)),
+            queue_timeout=float(os.getenv("QUEUE_TIMEOUT", 30)),
+            client_weights=weights,
+            api_keys={client_key(key) for key in keys},
+            lane_weights={
+                "interactive": int(os.getenv("LANE_WEIGHT_INTERACTIVE", 3)),
+                "batch": int(os.getenv("LANE_WEIGHT_BATCH", 1))
+            }
+        )
+
+    def share(self, shared) -> None:
+        """Moves per-client limits into a SharedState - called in each worker after the fork"""
+        shared.clear_worker()
+        self.shared = shared
+        # One thread, so this worker's count updates reach SQLite in the order they happened
+        self._shared_io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="admission-shared")
+
+    @asynccontextmanager
+    async def slot(self, client_id: str, lane: str = "interactive"):
+        """`async with controller.slot(client, lane) as ticket:` - waits for a turn"""
+        ticket = await self.acquire(client_id, lane)
+        try:
+            yield ticket
+        finally:
+            self.release(client_id)
+
+    async def acquire(self, client_id: str, lane: str) -> Ticket:
+        lane = lane if lane in LANES else "interactive"
+        state = self._client(client_id)
+
+        if self.shared is not None:
+            retry_after, elsewhere = await asyncio.get_running_loop().run_in_executor(
+                self._shared_io, self._shared_admit, client_id
+            )
+            self._elsewhere[client_id] = elsewhere
+        else:
+            retry_after = state.bucket.take(time.monotonic())
+        if retry_after is not None:
+            self.rejected += 1
+            raise AdmissionRejected(429, "Rate limit exceeded for this client", retry_after)
+
+        if sum(len(q) for q in self.waiting.values()) >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(503, "Server is busy, try again shortly", 1.0)
+
+        # WFQ tag - heavier clients (higher weight) advance their virtual clock slower
+        weight = self.client_weights.get(client_id, 1.0)
+        tag = max(self.virtual_time, state.last_finish) + 1.0 / weight
+        state.last_finish = tag
+
+        waiter = _Waiter(client_id, lane, tag, asyncio.get_running_loop().create_future())
+        self.waiting[lane].append(waiter)
+        self._dispatch()
+        if self.shared is not None and not waiter.future.done() and self._poller is None:
+            self._poller = asyncio.ensure_future(self._poll())
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Got the slot just as we gave up - hand it back
+                self.release(client_id)
+            else:
+                waiter.future.cancel()
+                self.waiting[lane].remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.rejected += 1
+            raise AdmissionRejected(503, "Timed out waiting in the queue", 1.0)
+
+        return Ticket(client_id, lane, time.monotonic() - waiter.enqueued_at)
+
+    def release(self, client_id: str) -> None:
+        self.active -= 1
+        self.clients[client_id].active -= 1
+        if self.shared is not None:
+            self._shared_io.submit(self.shared.add_active, client_id, -1)
+        self._dispatch()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queued": {lane: len(q) for lane, q in self.waiting.items()},
+            "rejected": self.rejected,
+            "clients": len(self.clients),
+            "shared_client_limits": self.shared is not None
+        }
+
+    def _client(self, client_id: str) -> _ClientState:
+        state = self.clients.get(client_id)
+        if state is None:
+            if len(self.clients) >= self.max_clients:
+                self._forget_idle_clients()
+            state = self.clients[client_id] = _ClientState(TokenBucket(self.client_rate, self.client_burst))
+        return state
+
+    def _forget_idle_clients(self) -> None:
+        """Drops clients with nothing in flight and a full bucket - they'd start fresh anyway"""
+        now = time.monotonic()
+        busy = {w.client_id for q in self.waiting.values() for w in q}
+        for client_id, state in list(self.clients.items()):
+            refilled = state.bucket.tokens + (now - state.bucket.updated) * state.bucket.rate
+            if state.active == 0 and client_id not in busy and refilled >= state.bucket.burst:
+                del self.clients[client_id]
+                self._elsewhere.pop(client_id, None)
+
+    def _dispatch(self) -> None:
+        """Hands free slots to waiting requests"""
+        while self.active < self.max_concurrency:
+            picked = self._next_waiter()
+            if picked is None:
+                return
+            lane, waiter = picked
+            self.waiting[lane].remove(waiter)
+            self.active += 1
+            self.clients[waiter.client_id].active += 1
+            if self.shared is not None:
+                self._shared_io.submit(self.shared.add_active, waiter.client_id, 1)
+            self.virtual_time = max(self.virtual_time, waiter.tag - 1.0 / self.client_weights.get(waiter.client_id, 1.0))
+            waiter.future.set_result(True)
+
+    async def _poll(self) -> None:
+        """Shared mode - a slot freed on another worker doesn't wake us, so look again now and then"""
+        loop = asyncio.get_running_loop()
+        try:
+            while any(self.waiting.values()):
+                await asyncio.sleep(self.poll_interval)
+                waiting = {w.client_id for q in self.waiting.values() for w in q}
+                self._elsewhere.update(
+                    await loop.run_in_executor(self._shared_io, self.shared.active_elsewhere, waiting)
+                )
+                self._dispatch()
+        finally:
+            self._poller = None
+
+    def _shared_admit(self, client_id: str) -> Tuple[Optional[float], int]:
+        """Runs on the shared-state thread - (retry_after, in-flight on other workers)"""
+        retry_after = self.shared.take_token(client_id, self.client_rate, self.client_burst)
+        if retry_after is not None:
+            return retry_after, 0
+        return None, self.shared.active_elsewhere([client_id])[client_id]
+
+    def _next_waiter(self) -> Optional[Tuple[str, _Waiter]]:
+        """Smooth weighted round robin over lanes, then lowest finish tag within the lane"""
+        def has_room(client_id: str) -> bool:
+            # Other workers' counts are as of the last read - close enough between polls
+            in_flight = self.clients[client_id].active + self._elsewhere.get(client_id, 0)
+            return in_flight < self.client_concurrency
+
+        candidates = {}
+        for lane, queue in self.waiting.items():
+            eligible = [w for w in queue if not w.future.done() and has_room(w.client_id)]
+            if eligible:
+                candidates[lane] = min(eligible, key=lambda w: w.tag)
+
+        if not candidates:
+            return None
+
+        total = sum(self.lane_weights[lane] for lane in candidates)
+        for lane in candidates:
+            self._lane_credit[lane] += self.lane_weights[lane]
+        lane = max(candidates, key=lambda l: self._lane_credit[l])
+        self._lane_credit[lane] -= total
+        return lane, candidates[lane]
+
+
+def client_key(raw: str) -> str:
+    """API keys never show up in logs or metadata - we key clients by a short hash"""
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def identify_client(headers, client_host: Optional[str], api_keys: Optional[Set[str]] = None) -> Tuple[str, str]:
+    """
+    (client id, lane) for a request - a configured key (X-API-Key or X-Client-Id), otherwise IP
+    Unknown keys are ignored, so a new header value per request can't buy a fresh rate limit
+    """
+    client_id = None
+    for header in ("x-api-key", "x-client-id"):
+        value = headers.get(header)
+        if value and client_key(value) in (api_keys or ()):
+            client_id = client_key(value)
+            break
+    if client_id is None:
+        client_id = client_host or "anonymous"
+
+    lane = "batch" if headers.get("x-priority", "").lower() == "batch" else "interactive"
+    return client_id, lane
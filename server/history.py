@@ -0,0 +1,302 @@
+"""
+Execution history - every /execute run appended to a local SQLite store
+Writes are queued and flushed in batches by a background thread, so the request path
+only pays for a queue put. Reads use keyset pagination (id cursor), never OFFSET.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from tools.sqlite_store import SQLiteStore
+
+from .serialization import dumps
+
+
+class HistoryStore(SQLiteStore):
+    """
+    Append-only: rows are inserted, never updated
+    executions - one row per task; steps - one row per StepResult
+    """
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 50,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000
+    ):
+        super().__init__(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self.stats = {"written": 0, "dropped": 0, "batches": 0, "write_errors": 0}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        conn = self._connect()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS executions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL NOT NULL,
+                task TEXT NOT NULL,
+                status TEXT NOT NULL,
+                quality_score INTEGER,
+                total_ms REAL,
+                timings TEXT,
+                plan TEXT,
+                metadata TEXT,
+                error TEXT
+            )"""
+        )
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS steps (
+                execution_id INTEGER NOT NULL REFERENCES executions(id),
+                step_number INTEGER NOT NULL,
+                tool TEXT NOT NULL,
+                description TEXT,
+                parameters TEXT,
+                success INTEGER NOT NULL,
+                stale INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                data TEXT
+            )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_executions_created ON executions(created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_executions_status ON executions(status, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_steps_tool ON steps(tool, execution_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_steps_execution ON steps(execution_id, step_number)")
+
+    def start(self) -> None:
+        """Started from the app's startup hook - each forked worker runs its own writer"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the writer and flushes whatever is still queued"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._flush(self._drain())
+
+    def record(
+        self,
+        task: str,
+        plan=None,
+        step_results=None,
+        final_output=None,
+        timings: Optional[Dict[str, float]] = None,
+        error: Optional[str] = None
+    ) -> None:
+        """Queues one execution - never blocks; if the writer can't keep up we drop and count it"""
+        try:
+            self.pending.put_nowait({
+                "created_at": time.time(),
+                "task": task,
+                "plan": plan,
+                "step_results": list(step_results or []),
+                "status": final_output.status if final_output is not None else "error",
+                # Shallow copy - the response path keeps adding keys to the live dict
+                "metadata": dict(final_output.metadata) if final_output is not None else {},
+                "timings": dict(timings or {}),
+                "error": error
+            })
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def query(
+        self,
+        limit: int = 50,
+        before: Optional[int] = None,
+        status: Optional[str] = None,
+        tool: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Newest first, one page at a time - pass next_cursor back as `before` for the next page"""
+        clauses, params = [], []
+        if before is not None:
+            clauses.append("e.id < ?")
+            params.append(before)
+        if status:
+            clauses.append("e.status = ?")
+            params.append(status)
+        if since is not None:
+            clauses.append("e.created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("e.created_at < ?")
+            params.append(until)
+        if tool:
+            clauses.append("EXISTS (SELECT 1 FROM steps s WHERE s.tool = ? AND s.execution_id = e.id)")
+            params.append(tool)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(
+            f"""SELECT e.id, e.created_at, e.task, e.status, e.quality_score, e.total_ms, e.timings, e.error
+                FROM executions e {where} ORDER BY e.id DESC LIMIT ?""",
+            (*params, limit)
+        ).fetchall()
+
+        items = [
+            {
+                "id": row[0],
+                "created_at": row[1],
+                "task": row[2],
+                "status": row[3],
+                "quality_score": row[4],
+                "total_ms": row[5],
+                "timings_ms": json.loads(row[6]) if row[6] else {},
+                "error": row[7]
+            }
+            for row in rows
+        ]
+        return {"items": items, "next_cursor": items[-1]["id"] if len(items) == limit else None}
+
+    def get(self, execution_id: int) -> Optional[Dict[str, Any]]:
+        """One execution with its plan, metadata and every step"""
+        conn = self._connect()
+        row = conn.execute(
+            """SELECT id, created_at, task, status, quality_score, total_ms, timings, plan, metadata, error
+               FROM executions WHERE id = ?""",
+            (execution_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        steps = conn.execute(
+            """SELECT step_number, tool, description, parameters, success, stale, error, data
+               FROM steps WHERE execution_id = ? ORDER BY step_number""",
+            (execution_id,)
+        ).fetchall()
+        return {
+            "id": row[0],
+            "created_at": row[1],
+            "task": row[2],
+            "status": row[3],
+            "quality_score": row[4],
+            "total_ms": row[5],
+            "timings_ms": json.loads(row[6]) if row[6] else {},
+            "plan": json.loads(row[7]) if row[7] else None,
+            "metadata": json.loads(row[8]) if row[8] else {},
+            "error": row[9],
+            "steps": [
+                {
+                    "step_number": step[0],
+                    "tool": step[1],
+                    "description": step[2],
+                    "parameters": json.loads(step[3]) if step[3] else {},
+                    "success": bool(step[4]),
+                    "stale": bool(step[5]),
+                    "error": step[6],
+                    "data": json.loads(step[7]) if step[7] else None
+                }
+                for step in steps
+            ]
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"queued": self.pending.qsize(), **self.stats}
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            batch = []
+            try:
+                batch.append(self.pending.get(timeout=self.flush_interval))
+            except queue.Empty:
+                continue
+            # Give the batch a moment to fill up, then write it in one transaction
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        batch = []
+        while True:
+            try:
+                batch.append(self.pending.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN")
+            for entry in batch:
+                self._insert(conn, entry)
+            conn.execute("COMMIT")
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            self.stats["write_errors"] += 1
+            print(f"[HISTORY] Failed to write {len(batch)} executions: {e}")
+            return
+        self.stats["written"] += len(batch)
+        self.stats["batches"] += 1
+
+    @staticmethod
+    def _insert(conn, entry: Dict[str, Any]) -> None:
+        metadata = entry["metadata"]
+        plan = entry["plan"]
+        cursor = conn.execute(
+            """INSERT INTO executions
+               (created_at, task, status, quality_score, total_ms, timings, plan, metadata, error)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                entry["created_at"],
+                entry["task"],
+                entry["status"],
+                metadata.get("quality_score"),
+                entry["timings"].get("total"),
+                json.dumps(entry["timings"]),
+                dumps(plan).decode("utf-8") if plan is not None else None,
+                dumps(metadata).decode("utf-8"),
+                entry["error"]
+            )
+        )
+        execution_id = cursor.lastrowid
+        conn.executemany(
+            """INSERT INTO steps
+               (execution_id, step_number, tool, description, parameters, success, stale, error, data)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            [
+                (
+                    execution_id,
+                    result.step.step_number,
+                    result.step.tool_name,
+                    result.step.description,
+                    dumps(result.step.parameters).decode("utf-8"),
+                    int(result.success),
+                    int(result.stale),
+                    result.error,
+                    dumps(result.data).decode("utf-8") if result.data is not None else None
+                )
+                for result in entry["step_results"]
+            ]
+        )
+
+
+def default_history_store() -> Optional[HistoryStore]:
+    """HISTORY_DB_PATH empty turns history off"""
+    path = os.getenv("HISTORY_DB_PATH", ".cache/history.db")
+    if not path:
+        return None
+    return HistoryStore(
+        path,
+        batch_size=int(os.getenv("HISTORY_BATCH_SIZE", 50)),
+        flush_interval=float(os.getenv("HISTORY_FLUSH_INTERVAL", 1.0)),
+        max_queue=int(os.getenv("HISTORY_QUEUE_SIZE", 10000))
+    )
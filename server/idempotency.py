@@ -0,0 +1,183 @@
+"""
+Idempotency keys and full-response caching for /execute
+Retries attach to the run that's already going instead of starting the whole pipeline again
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class IdempotencyConflict(Exception):
+    """Same Idempotency-Key reused with a different request body"""
+
+
+def normalize_task(task: str) -> str:
+    """Tasks that only differ by case/spacing are the same task"""
+    return " ".join(task.casefold().split())
+
+
+def fingerprint(task: str) -> str:
+    return hashlib.sha256(normalize_task(task).encode("utf-8")).hexdigest()
+
+
+class _Entry:
+    def __init__(self, fingerprint: str, task: "asyncio.Task"):
+        self.fingerprint = fingerprint
+        self.task = task
+        self.payload: Optional[Dict[str, Any]] = None
+        self.completed_at: Optional[float] = None
+
+
+class IdempotencyStore:
+    """
+    (client, Idempotency-Key) -> the execution it started
+    While running, retries await the same asyncio task; once done, they get the stored
+    response until it expires. Failed runs are forgotten so a retry can try again.
+    With a SharedState the keys are also claimed in SQLite, so a retry that lands on another
+    worker replays the stored response or polls until the original run finishes
+    """
+
+    def __init__(
+        self,
+        ttl: float = 24 * 3600,
+        max_entries: int = 10000,
+        shared=None,
+        poll_interval: float = 0.25
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = shared
+        self.poll_interval = poll_interval
+        self.entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+
+    async def run(
+        self,
+        key: Tuple[str, str],
+        request_fingerprint: str,
+        factory: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Returns (response payload, replayed?)"""
+        now = time.time()
+        entry = self.entries.get(key)
+        if entry is not None and entry.completed_at is not None and now - entry.completed_at > self.ttl:
+            del self.entries[key]
+            entry = None
+
+        if entry is not None:
+            if entry.fingerprint != request_fingerprint:
+                raise IdempotencyConflict("Idempotency-Key was already used for a different task")
+            if entry.payload is not None:
+                return entry.payload, True
+            # Still running - wait on the original execution (shielded, so our own
+            # disconnect doesn't cancel it for everyone else)
+            payload, _ = await asyncio.shield(entry.task)
+            return payload, True
+
+        # Registered before anything is awaited, so every request for the key on this worker
+        # attaches to this one run. Detached from the request so a client timeout doesn't kill it
+        task = asyncio.ensure_future(self._execute(key, request_fingerprint, factory))
+        entry = self.entries[key] = _Entry(request_fingerprint, task)
+        self._evict()
+
+        def settle(done: "asyncio.Task") -> None:
+            if done.cancelled() or done.exception() is not None:
+                if self.entries.get(key) is entry:
+                    del self.entries[key]
+                return
+            entry.payload = done.result()[0]
+            entry.completed_at = time.time()
+
+        task.add_done_callback(settle)
+        return await asyncio.shield(task)
+
+    async def _execute(
+        self,
+        key: Tuple[str, str],
+        request_fingerprint: str,
+        factory: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Claims the key across workers (if shared), then runs the request - (payload, replayed?)"""
+        # SQLite can wait on the write lock - keep it off the event loop
+        loop = asyncio.get_running_loop()
+        if self.shared is not None:
+            while True:
+                state, payload = await loop.run_in_executor(
+                    None, self.shared.claim, key[0], key[1], request_fingerprint, self.ttl
+                )
+                if state == "conflict":
+                    raise IdempotencyConflict("Idempotency-Key was already used for a different task")
+                if state == "done":
+                    return payload, True
+                if state == "claimed":
+                    break
+                # Another worker is running it - its row goes away if it fails or dies
+                await asyncio.sleep(self.poll_interval)
+
+        try:
+            payload = await factory()
+        except Exception:
+            if self.shared is not None:
+                await loop.run_in_executor(None, self.shared.release, *key)
+            raise
+
+        if self.shared is not None:
+            await loop.run_in_executor(None, self.shared.complete, key[0], key[1], payload)
+        return payload, False
+
+    def _evict(self) -> None:
+        """Oldest finished entries go first - in-flight ones are never dropped"""
+        if len(self.entries) <= self.max_entries:
+            return
+        for key in list(self.entries):
+            if len(self.entries) <= self.max_entries:
+                break
+            if self.entries[key].payload is not None:
+                del self.entries[key]
+
+
+class ResponseCache:
+    """
+    Full /execute responses keyed by normalized task text
+    Only used when RESPONSE_CACHE_TTL > 0 - results are live data, so keep the window short
+    """
+
+    def __init__(self, ttl: float = 0, max_entries: int = 1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get(self, task: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """(payload, age in seconds) if we have a fresh response for this task"""
+        if not self.enabled:
+            return None
+        key = fingerprint(task)
+        entry = self.entries.get(key)
+        if entry is None or time.time() - entry[1] > self.ttl:
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0], time.time() - entry[1]
+
+    def put(self, task: str, payload: Dict[str, Any]) -> None:
+        # Partial/failed runs aren't worth replaying
+        if not self.enabled or payload.get("status") != "success":
+            return
+        self.entries[fingerprint(task)] = (payload, time.time())
+        self.entries.move_to_end(fingerprint(task))
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+def body_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
@@ -0,0 +1,151 @@
+"""
+Background jobs - submit a task, get a job id back right away, poll for the result
+Kept in SQLite so any worker (see launcher.py) can answer GET /jobs/{id}
+"""
+import json
+import os
+import sqlite3
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from tools.sqlite_store import SQLiteStore
+
+from .idempotency import IdempotencyConflict, fingerprint
+from .serialization import dumps
+from .shared_state import process_alive
+
+# What a job left behind by a worker that exited (crash, restart, recycling) is failed with
+_ORPHANED = "Worker exited before the job finished - submit it again"
+
+
+class JobStore(SQLiteStore):
+    """job id -> status (queued/running/succeeded/failed) and the response or error"""
+
+    def __init__(self, path: str, ttl: float = 24 * 3600):
+        super().__init__(path)
+        self.ttl = ttl
+        self._writes = 0
+
+        conn = self._connect()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                client TEXT NOT NULL,
+                idempotency_key TEXT,
+                task TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                status_code INTEGER,
+                result TEXT,
+                error TEXT,
+                worker INTEGER
+            )"""
+        )
+        conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_idempotency ON jobs(client, idempotency_key)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at)")
+
+    def create(self, client: str, task: str, idempotency_key: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+        """
+        (job, created?) - a repeated Idempotency-Key gets the existing job back
+        Raises IdempotencyConflict if that key was used for a different task
+        """
+        conn = self._connect()
+        job_id = uuid.uuid4().hex
+        try:
+            conn.execute(
+                """INSERT INTO jobs (id, client, idempotency_key, task, status, created_at, worker)
+                   VALUES (?, ?, ?, ?, 'queued', ?, ?)""",
+                (job_id, client, idempotency_key, task, time.time(), os.getpid())
+            )
+        except sqlite3.IntegrityError:
+            row = conn.execute(
+                "SELECT id, task FROM jobs WHERE client = ? AND idempotency_key = ?", (client, idempotency_key)
+            ).fetchone()
+            if fingerprint(row[1]) != fingerprint(task):
+                raise IdempotencyConflict("Idempotency-Key was already used for a different task")
+            return self.get(row[0]), False
+
+        self._writes += 1
+        if self._writes % 100 == 0:
+            conn.execute("DELETE FROM jobs WHERE created_at < ?", (time.time() - self.ttl,))
+        return self.get(job_id), True
+
+    def start(self, job_id: str) -> None:
+        self._connect().execute(
+            "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), job_id)
+        )
+
+    def succeed(self, job_id: str, payload: Dict[str, Any]) -> None:
+        self._connect().execute(
+            """UPDATE jobs SET status = 'succeeded', finished_at = ?, status_code = 200, result = ?
+               WHERE id = ?""",
+            (time.time(), dumps(payload).decode("utf-8"), job_id)
+        )
+
+    def fail(self, job_id: str, status_code: int, error: str) -> None:
+        self._connect().execute(
+            "UPDATE jobs SET status = 'failed', finished_at = ?, status_code = ?, error = ? WHERE id = ?",
+            (time.time(), status_code, error, job_id)
+        )
+
+    def fail_orphaned(self) -> int:
+        """
+        Called when a worker starts - fails unfinished jobs whose worker is gone
+        (or was an earlier process with our pid). Returns how many
+        """
+        conn = self._connect()
+        orphaned = [
+            job_id for job_id, worker in conn.execute(
+                "SELECT id, worker FROM jobs WHERE status IN ('queued', 'running')"
+            ).fetchall()
+            if worker is None or worker == os.getpid() or not process_alive(worker)
+        ]
+        for job_id in orphaned:
+            self._fail_if_unfinished(conn, job_id)
+        return len(orphaned)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        query = """SELECT id, client, task, status, created_at, started_at, finished_at, status_code, result, error,
+                   worker FROM jobs WHERE id = ?"""
+        row = conn.execute(query, (job_id,)).fetchone()
+        if row is None:
+            return None
+        if row[3] in ("queued", "running") and (row[10] is None or not process_alive(row[10])):
+            # Its worker died mid-run - nothing is ever going to finish it
+            self._fail_if_unfinished(conn, job_id)
+            row = conn.execute(query, (job_id,)).fetchone()
+        return {
+            "job_id": row[0],
+            "client": row[1],
+            "task": row[2],
+            "status": row[3],
+            "created_at": row[4],
+            "started_at": row[5],
+            "finished_at": row[6],
+            "status_code": row[7],
+            "result": json.loads(row[8]) if row[8] else None,
+            "error": row[9]
+        }
+
+    @staticmethod
+    def _fail_if_unfinished(conn: sqlite3.Connection, job_id: str) -> None:
+        # Status re-checked in the UPDATE, so a job that just finished is left alone
+        conn.execute(
+            """UPDATE jobs SET status = 'failed', finished_at = ?, status_code = 500, error = ?
+               WHERE id = ? AND status IN ('queued', 'running')""",
+            (time.time(), _ORPHANED, job_id)
+        )
+
+
+def default_job_store() -> Optional[JobStore]:
+    """JOBS_DB_PATH empty turns /jobs off"""
+    path = os.getenv("JOBS_DB_PATH", ".cache/jobs.db")
+    if not path:
+        return None
+    return JobStore(path, ttl=float(os.getenv("JOB_TTL", 86400)))
@@ -0,0 +1,310 @@
+"""
+Pre-fork launcher - one uvicorn worker per core behind a single listening socket
+The app (agents, tools, tool indexes, city aliases...) is imported once in the master and
+inherited by every worker through fork. Background threads are only started in each
+worker's startup hook, and the SQLite connections the stores opened at import time are
+closed before forking, so each worker opens its own.
+
+Idempotency keys and per-client limits have to agree across workers, so they go through
+the SQLite SharedState (JOBS_DB_PATH) - without it the launcher refuses to fork. Caches
+(response cache, tool result cache) stay per worker; a miss on another worker just costs a call.
+
+Workers are recycled after WORKER_MAX_REQUESTS requests or WORKER_MAX_AGE seconds,
+and `kill -HUP <master>` restarts them one at a time. Each worker writes its load into a
+small shared-memory board that /admin/workers reads.
+"""
+import os
+import random
+import signal
+import socket
+import time
+from multiprocessing.sharedctypes import RawArray
+from typing import Any, Dict, List, Optional
+
+from tools.sqlite_store import close_all_stores
+
+FIELDS = ("pid", "started_at", "requests", "in_flight", "last_request_at", "generation")
+_PID, _STARTED, _REQUESTS, _IN_FLIGHT, _LAST, _GENERATION = range(len(FIELDS))
+
+# Set in the master before forking; _slot is set in each worker right after the fork
+_board: Optional["WorkerBoard"] = None
+_slot: Optional[int] = None
+
+
+class WorkerBoard:
+    """
+    Shared-memory table of per-worker counters (anonymous mmap, inherited through fork)
+    Each worker only writes its own row, from its event loop thread - so no locks
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.values = RawArray("d", workers * len(FIELDS))
+
+    def reset(self, slot: int, pid: int) -> None:
+        base = slot * len(FIELDS)
+        generation = self.values[base + _GENERATION]
+        for i in range(len(FIELDS)):
+            self.values[base + i] = 0.0
+        self.values[base + _PID] = pid
+        self.values[base + _STARTED] = time.time()
+        self.values[base + _GENERATION] = generation + 1
+
+    def add(self, slot: int, field: int, amount: float) -> None:
+        self.values[slot * len(FIELDS) + field] += amount
+
+    def set(self, slot: int, field: int, value: float) -> None:
+        self.values[slot * len(FIELDS) + field] = value
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        rows = []
+        for slot in range(self.workers):
+            base = slot * len(FIELDS)
+            row = dict(zip(FIELDS, self.values[base:base + len(FIELDS)]))
+            uptime = now - row["started_at"] if row["started_at"] else 0.0
+            rows.append({
+                "slot": slot,
+                "pid": int(row["pid"]),
+                "generation": int(row["generation"]),
+                "uptime_s": round(uptime, 1),
+                "requests": int(row["requests"]),
+                "in_flight": int(row["in_flight"]),
+                "requests_per_s": round(row["requests"] / uptime, 2) if uptime > 0 else 0.0,
+                "idle_s": round(now - row["last_request_at"], 1) if row["last_request_at"] else None
+            })
+        return rows
+
+
+class WorkerLoadMiddleware:
+    """Plain ASGI middleware - counts requests into this worker's row (no-op outside the launcher)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _board is None or _slot is None:
+            await self.app(scope, receive, send)
+            return
+
+        _board.add(_slot, _IN_FLIGHT, 1)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _board.add(_slot, _IN_FLIGHT, -1)
+            _board.add(_slot, _REQUESTS, 1)
+            _board.set(_slot, _LAST, time.time())
+
+
+def in_prefork() -> bool:
+    """True inside a launcher worker"""
+    return _slot is not None
+
+
+def worker_stats() -> Dict[str, Any]:
+    """What /admin/workers returns - works from any worker since the board is shared"""
+    if _board is None:
+        return {"mode": "single", "pid": os.getpid()}
+    return {
+        "mode": "prefork",
+        "master_pid": os.getppid(),
+        "served_by": _slot,
+        "workers": _board.snapshot()
+    }
+
+
+class Launcher:
+    """The master process - binds, forks, watches and recycles workers"""
+
+    def __init__(
+        self,
+        app,
+        host: str,
+        port: int,
+        workers: int,
+        max_requests: int = 0,
+        max_age: float = 0,
+        graceful_timeout: float = 30
+    ):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_requests = max_requests
+        self.max_age = max_age
+        self.graceful_timeout = graceful_timeout
+
+        self.pids: Dict[int, int] = {}  # pid -> slot
+        self.started: Dict[int, float] = {}  # pid -> spawn time (+ jitter for max_age)
+        self.recycle_queue: List[int] = []
+        self.recycling: Optional[int] = None
+        self.stopping = False
+        self.board = WorkerBoard(workers)
+        self.sock: Optional[socket.socket] = None
+
+    @classmethod
+    def from_env(cls, app, host: str, port: int) -> "Launcher":
+        return cls(
+            app,
+            host,
+            port,
+            workers=int(os.getenv("WORKERS", 1)) or os.cpu_count() or 1,
+            max_requests=int(os.getenv("WORKER_MAX_REQUESTS", 0)),
+            max_age=float(os.getenv("WORKER_MAX_AGE", 0)),
+            graceful_timeout=float(os.getenv("WORKER_GRACEFUL_TIMEOUT", 30))
+        )
+
+    def run(self) -> None:
+        global _board
+        _board = self.board
+        self.sock = self._bind()
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_reload)
+
+        print(f"[LAUNCHER] Master {os.getpid()} serving on http://{self.host}:{self.port} with {self.workers} workers")
+        close_all_stores()
+        for slot in range(self.workers):
+            self._spawn(slot)
+
+        while not self.stopping:
+            self._reap()
+            self._recycle_old_workers()
+            time.sleep(0.5)
+
+        self._shutdown()
+
+    def _bind(self) -> socket.socket:
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _spawn(self, slot: int) -> None:
+        # Replacements too - nothing in the master should have reopened one, but be sure
+        close_all_stores()
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(slot)
+            os._exit(0)
+
+        self.board.reset(slot, pid)
+        self.pids[pid] = slot
+        # Jitter so workers don't all hit max_age (and restart) in the same second
+        self.started[pid] = time.time() + random.uniform(0, self.max_age * 0.1)
+        print(f"[LAUNCHER] Started worker {pid} (slot {slot})")
+
+    def _run_worker(self, slot: int) -> None:
+        import uvicorn
+
+        global _slot
+        _slot = slot
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(sig, signal.SIG_DFL)
+
+        limit = None
+        if self.max_requests:
+            limit = self.max_requests + random.randint(0, max(1, self.max_requests // 10))
+        config = uvicorn.Config(
+            self.app,
+            limit_max_requests=limit,
+            timeout_graceful_shutdown=self.graceful_timeout
+        )
+        # uvicorn installs its own SIGTERM/SIGINT handlers and drains in-flight requests
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def _reap(self) -> None:
+        """Collects exited workers and starts replacements"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+
+            slot = self.pids.pop(pid, None)
+            self.started.pop(pid, None)
+            if slot is None:
+                continue
+            if self.recycling == pid:
+                self.recycling = None
+            if not self.stopping:
+                print(f"[LAUNCHER] Worker {pid} exited (status {status}), replacing it")
+                self._spawn(slot)
+
+    def _recycle_old_workers(self) -> None:
+        """Restarts workers one at a time - past max_age, or everyone after a SIGHUP"""
+        if self.recycling is not None:
+            return
+
+        if self.max_age:
+            now = time.time()
+            for pid, started in self.started.items():
+                if now - started > self.max_age and pid not in self.recycle_queue:
+                    self.recycle_queue.append(pid)
+
+        while self.recycle_queue:
+            pid = self.recycle_queue.pop(0)
+            if pid in self.pids:
+                self.recycling = pid
+                print(f"[LAUNCHER] Recycling worker {pid}")
+                os.kill(pid, signal.SIGTERM)
+                return
+
+    def _shutdown(self) -> None:
+        print(f"[LAUNCHER] Stopping {len(self.pids)} workers")
+        for pid in list(self.pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline = time.time() + self.graceful_timeout + 5
+        while self.pids and time.time() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                self.pids.pop(pid, None)
+            else:
+                time.sleep(0.1)
+
+        for pid in list(self.pids):
+            # Didn't finish in time
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.sock.close()
+
+    def _handle_stop(self, signum, frame) -> None:
+        self.stopping = True
+
+    def _handle_reload(self, signum, frame) -> None:
+        """SIGHUP - rolling restart of every worker"""
+        self.recycle_queue.extend(pid for pid in self.pids if pid not in self.recycle_queue)
+
+
+def serve(app, host: str, port: int, shared_state=None) -> None:
+    """
+    Entry point used by main.py - needs fork, so anything else falls back to one process
+    Several workers need shared_state, or idempotency keys and client limits would be per worker
+    """
+    launcher = Launcher.from_env(app, host, port)
+    if launcher.workers <= 1 or not hasattr(os, "fork"):
+        import uvicorn
+
+        uvicorn.run(app, host=host, port=port)
+        return
+    if shared_state is None:
+        raise SystemExit(
+            "[LAUNCHER] WORKERS > 1 needs JOBS_DB_PATH - idempotency keys and per-client limits "
+            "are shared between workers through it"
+        )
+    launcher.run()
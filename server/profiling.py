@@ -0,0 +1,283 @@
+"""
+Built-in profiling for the /admin/profile endpoints
+- SamplingProfiler: a background thread grabs every thread's stack every few milliseconds,
+  so nothing is instrumented and the overhead stays around a percent. Results come back as
+  collapsed stacks (feed them to flamegraph.pl / speedscope) or as top functions.
+- MemoryProfiler: tracemalloc snapshots, diffed by allocation site
+In pre-fork mode every worker has its own profilers - responses say which pid answered
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Repo root - frames under it are "ours" and get short, relative names
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Where a thread sits when it's waiting rather than burning CPU
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("socket.py", "accept"),
+}
+
+# Which part of the app a sample belongs to - the innermost of our packages on the stack
+COMPONENTS = ("llm", "tools", "agents", "server")
+
+
+def _short_path(filename: str) -> str:
+    if filename.startswith(APP_ROOT + os.sep):
+        return os.path.relpath(filename, APP_ROOT)
+    return os.path.basename(filename)
+
+
+class SamplingProfiler:
+    """Statistical CPU profiler - one collapsed stack per sample, counted"""
+
+    def __init__(self, interval: float = 0.01, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self._labels: Dict[Any, Tuple[str, str]] = {}  # code object -> (label, short path)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: Optional[float] = None, duration: Optional[float] = None) -> None:
+        """Starts a fresh profile - stops by itself after `duration` seconds if given"""
+        if self.running:
+            raise RuntimeError("CPU profiler is already running")
+        if interval:
+            self.interval = interval
+        with self._lock:
+            self.stacks.clear()
+            self.samples = 0
+            self.idle_samples = 0
+        self.started_at = time.time()
+        self.stopped_at = None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(duration,), name="cpu-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def collapsed(self, include_idle: bool = False) -> str:
+        """Brendan Gregg's collapsed format - `frame;frame;frame count` per line, root first"""
+        with self._lock:
+            stacks = list(self.stacks.items())
+        lines = [
+            f"{stack} {count}"
+            for (stack, idle), count in sorted(stacks, key=lambda item: item[1], reverse=True)
+            if include_idle or not idle
+        ]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def summary(self, limit: int = 30, include_idle: bool = False) -> Dict[str, Any]:
+        """Top functions by self and total samples, plus how the busy samples split across the app"""
+        with self._lock:
+            stacks = list(self.stacks.items())
+            samples, idle_samples = self.samples, self.idle_samples
+
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        components: Counter = Counter()
+        busy = 0
+        for (stack, idle), count in stacks:
+            if idle and not include_idle:
+                continue
+            busy += count
+            frames = stack.split(";")
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                total_counts[frame] += count
+            components[self._component(frames)] += count
+
+        def top(counter: Counter) -> List[Dict[str, Any]]:
+            return [
+                {"function": frame, "samples": count, "percent": round(100 * count / busy, 1) if busy else 0.0}
+                for frame, count in counter.most_common(limit)
+            ]
+
+        elapsed = (self.stopped_at or time.time()) - self.started_at if self.started_at else 0.0
+        return {
+            "pid": os.getpid(),
+            "running": self.running,
+            "interval_ms": round(self.interval * 1000, 2),
+            "duration_s": round(elapsed, 1),
+            "samples": samples,
+            "idle_samples": idle_samples,
+            "by_component": dict(components.most_common()),
+            "top_self": top(self_counts),
+            "top_total": top(total_counts)
+        }
+
+    def _loop(self, duration: Optional[float]) -> None:
+        own = threading.get_ident()
+        deadline = time.monotonic() + duration if duration else None
+        while not self._stop.wait(self.interval):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id == own:
+                        continue
+                    stack, idle = self._collapse(frame)
+                    self.stacks[(stack, idle)] += 1
+                    self.samples += 1
+                    if idle:
+                        self.idle_samples += 1
+            del frames
+        self.stopped_at = time.time()
+
+    def _collapse(self, frame) -> Tuple[str, bool]:
+        labels = []
+        leaf = None
+        depth = 0
+        while frame is not None and depth < self.max_depth:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                path = _short_path(code.co_filename)
+                label = self._labels[code] = (f"{code.co_name} ({path}:{code.co_firstlineno})", path)
+            if leaf is None:
+                leaf = (os.path.basename(label[1]), code.co_name)
+            labels.append(label[0])
+            frame = frame.f_back
+            depth += 1
+        labels.reverse()
+        return ";".join(labels), leaf in _IDLE_LEAVES
+
+    @staticmethod
+    def _component(frames: List[str]) -> str:
+        # A tool called by the executor counts as "tools", not "agents"
+        for frame in reversed(frames):
+            path = frame.rsplit("(", 1)[-1]
+            top_dir = path.split(os.sep, 1)[0]
+            if top_dir in COMPONENTS:
+                return top_dir
+            if path.startswith("main.py"):
+                return "main"
+        return "other"
+
+
+class MemoryProfiler:
+    """tracemalloc on demand - snapshots are kept (a few at a time) so any two can be diffed"""
+
+    def __init__(self, frames: int = 10, max_snapshots: int = 5):
+        self.frames = frames
+        self.max_snapshots = max_snapshots
+        self.snapshots: "OrderedDict[int, Tuple[float, tracemalloc.Snapshot]]" = OrderedDict()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Starts tracing on first use, then records a snapshot"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<unknown>"),
+            ))
+            snapshot_id = self._next_id
+            self._next_id += 1
+            self.snapshots[snapshot_id] = (time.time(), snapshot)
+            while len(self.snapshots) > self.max_snapshots:
+                self.snapshots.popitem(last=False)
+
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "pid": os.getpid(),
+            "snapshot_id": snapshot_id,
+            "traced_mb": round(current / 1e6, 2),
+            "peak_mb": round(peak / 1e6, 2),
+            "snapshots": list(self.snapshots)
+        }
+
+    def diff(
+        self,
+        base: Optional[int] = None,
+        limit: int = 25,
+        group_by: str = "lineno",
+        app_only: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Takes a new snapshot and compares it to `base` (default: the previous one)
+        group_by is lineno, filename or traceback; app_only keeps allocations made from our code
+        """
+        if group_by not in ("lineno", "filename", "traceback"):
+            raise ValueError("group_by must be lineno, filename or traceback")
+        with self._lock:
+            if base is None:
+                base = next(reversed(self.snapshots), None)
+            entry = self.snapshots.get(base) if base is not None else None
+        if entry is None:
+            raise KeyError("No such snapshot - take one with POST /admin/profile/memory/snapshot first")
+
+        taken_at, old = entry
+        current = self.snapshot()
+        new = self.snapshots[current["snapshot_id"]][1]
+        if app_only:
+            keep = (tracemalloc.Filter(True, os.path.join(APP_ROOT, "*"), all_frames=True),)
+            old, new = old.filter_traces(keep), new.filter_traces(keep)
+
+        stats = new.compare_to(old, group_by)
+        return {
+            **current,
+            "base": base,
+            "seconds_since_base": round(time.time() - taken_at, 1),
+            "size_diff_mb": round(sum(stat.size_diff for stat in stats) / 1e6, 3),
+            "top": [
+                {
+                    "site": self._site(stat, group_by),
+                    "size_diff_kb": round(stat.size_diff / 1024, 1),
+                    "size_kb": round(stat.size / 1024, 1),
+                    "count_diff": stat.count_diff,
+                    "count": stat.count
+                }
+                for stat in stats[:limit]
+            ]
+        }
+
+    @staticmethod
+    def _site(stat, group_by: str) -> Any:
+        if group_by == "filename":
+            return _short_path(stat.traceback[0].filename)
+        sites = [f"{_short_path(frame.filename)}:{frame.lineno}" for frame in stat.traceback]
+        return sites if group_by == "traceback" else sites[0]
+
+    def stop(self) -> Dict[str, Any]:
+        """Stops tracing (it slows allocations down a lot) and drops the snapshots"""
+        with self._lock:
+            was_tracing = tracemalloc.is_tracing()
+            tracemalloc.stop()
+            self.snapshots.clear()
+        return {"pid": os.getpid(), "stopped": was_tracing}
+
+
+def default_profilers() -> Tuple[SamplingProfiler, MemoryProfiler]:
+    return (
+        SamplingProfiler(interval=float(os.getenv("PROFILE_INTERVAL_MS", 10)) / 1000),
+        MemoryProfiler(
+            frames=int(os.getenv("PROFILE_MEMORY_FRAMES", 10)),
+            max_snapshots=int(os.getenv("PROFILE_MAX_SNAPSHOTS", 5))
+        )
+    )
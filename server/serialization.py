@@ -0,0 +1,87 @@
+"""
+Fast response serialization - skips the second pydantic pass on /execute
+Builds the response dict once and encodes it straight to bytes
+"""
+import json
+from typing import Any, Dict, Iterable, Optional
+
+try:
+    import orjson  # optional - noticeably faster on big GitHub/news payloads
+except ImportError:
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """Fallback for things the stdlib encoder doesn't know about"""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(payload: Any) -> bytes:
+    """Encode to compact JSON bytes - uses orjson when it's installed"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        payload, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def build_task_payload(plan, final_output) -> Dict[str, Any]:
+    """
+    Builds the /execute response body in one go
+    Same shape as TaskResponse, but without copying through another model
+    """
+    return {
+        "task_summary": final_output.task_summary,
+        "status": final_output.status,
+        "results": final_output.results,
+        "metadata": final_output.metadata,
+        "execution_plan": {
+            "steps": [
+                {
+                    "step_number": step.step_number,
+                    "tool": step.tool_name,
+                    "description": step.description,
+                    "parameters": step.parameters
+                }
+                for step in plan.steps
+            ],
+            "expected_output": plan.expected_output
+        }
+    }
+
+
+def parse_fields(fields: Optional[str]) -> Optional[list]:
+    """Turns '?fields=results,status' into a list - None means everything"""
+    if not fields:
+        return None
+    parsed = [f.strip() for f in fields.split(",") if f.strip()]
+    return parsed or None
+
+
+def project_fields(payload: Dict[str, Any], fields: Optional[Iterable[str]]) -> Dict[str, Any]:
+    """
+    Keeps only the requested fields
+    Dotted paths work too, e.g. 'metadata.quality_score'
+    """
+    if not fields:
+        return payload
+
+    projected: Dict[str, Any] = {}
+    for field in fields:
+        path = field.split(".")
+        value: Any = payload
+        for key in path:
+            if not isinstance(value, dict) or key not in value:
+                break
+            value = value[key]
+        else:
+            # Rebuild the nested structure down to the selected value
+            target = projected
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            target[path[-1]] = value
+    return projected
@@ -0,0 +1,181 @@
+"""
+Per-request state every worker has to agree on, kept in the same SQLite file as the jobs
+- Idempotency keys: a retry that lands on another worker replays (or waits for) the original run
+- Per-client token buckets and in-flight counts, so client limits hold across all workers
+Rows are tagged with the worker pid; rows of workers that died are ignored and cleaned up
+"""
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from tools.sqlite_store import SQLiteStore
+
+from .serialization import dumps
+
+
+def process_alive(pid: int) -> bool:
+    """Whether a worker pid is still around (ours always is)"""
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SharedState(SQLiteStore):
+    """
+    Every method is a short transaction, but one that can wait on the SQLite write lock -
+    callers on the event loop run them in a thread
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._writes = 0
+
+        conn = self._connect()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS idempotency (
+                client TEXT NOT NULL,
+                key TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT,
+                owner INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                completed_at REAL,
+                PRIMARY KEY (client, key)
+            )"""
+        )
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS client_buckets (
+                client TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            )"""
+        )
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS client_slots (
+                client TEXT NOT NULL,
+                worker INTEGER NOT NULL,
+                active INTEGER NOT NULL,
+                PRIMARY KEY (client, worker)
+            )"""
+        )
+
+    def claim(self, client: str, key: str, fingerprint: str, ttl: float) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        ("claimed", None) - we run it; ("done", payload) - replay; ("running", None) - another
+        worker is on it; ("conflict", None) - the key was used for a different task
+        A running row owned by a dead worker (or an earlier process with our pid) is taken over
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT fingerprint, status, payload, owner, completed_at FROM idempotency WHERE client = ? AND key = ?",
+                (client, key)
+            ).fetchone()
+            if row is not None:
+                expired = row[1] == "done" and now - row[4] > ttl
+                # Our own runs are found in memory before we get here, so a row with our pid is stale
+                orphaned = row[1] == "running" and (row[3] == os.getpid() or not process_alive(row[3]))
+                if expired or orphaned:
+                    conn.execute("DELETE FROM idempotency WHERE client = ? AND key = ?", (client, key))
+                    row = None
+
+            if row is None:
+                conn.execute(
+                    """INSERT INTO idempotency (client, key, fingerprint, status, owner, created_at)
+                       VALUES (?, ?, ?, 'running', ?, ?)""",
+                    (client, key, fingerprint, os.getpid(), now)
+                )
+                result = ("claimed", None)
+            elif row[0] != fingerprint:
+                result = ("conflict", None)
+            elif row[1] == "done":
+                result = ("done", json.loads(row[2]))
+            else:
+                result = ("running", None)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._writes += 1
+        if self._writes % 100 == 0:
+            conn.execute("DELETE FROM idempotency WHERE status = 'done' AND completed_at < ?", (now - ttl,))
+        return result
+
+    def complete(self, client: str, key: str, payload: Dict[str, Any]) -> None:
+        self._connect().execute(
+            "UPDATE idempotency SET status = 'done', payload = ?, completed_at = ? WHERE client = ? AND key = ?",
+            (dumps(payload).decode("utf-8"), time.time(), client, key)
+        )
+
+    def release(self, client: str, key: str) -> None:
+        """The run failed - forget the key so a retry can try again"""
+        self._connect().execute(
+            "DELETE FROM idempotency WHERE client = ? AND key = ? AND owner = ?", (client, key, os.getpid())
+        )
+
+    def take_token(self, client: str, rate: float, burst: float) -> Optional[float]:
+        """Shared TokenBucket.take - None if allowed, otherwise seconds until a token is available"""
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM client_buckets WHERE client = ?", (client,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+            retry_after = None
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / rate if rate > 0 else 60.0
+            conn.execute(
+                "INSERT OR REPLACE INTO client_buckets (client, tokens, updated) VALUES (?, ?, ?)",
+                (client, tokens, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return retry_after
+
+    def active_elsewhere(self, clients: Iterable[str]) -> Dict[str, int]:
+        """Each client's in-flight tasks on the other live workers (this worker counts its own)"""
+        clients = list(clients)
+        if not clients:
+            return {}
+        conn = self._connect()
+        marks = ",".join("?" * len(clients))
+        totals = {client: 0 for client in clients}
+        for client, worker, count in conn.execute(
+            f"SELECT client, worker, active FROM client_slots WHERE client IN ({marks}) AND active > 0 AND worker != ?",
+            (*clients, os.getpid())
+        ).fetchall():
+            if process_alive(worker):
+                totals[client] += count
+            else:
+                conn.execute("DELETE FROM client_slots WHERE client = ? AND worker = ?", (client, worker))
+        return totals
+
+    def add_active(self, client: str, delta: int) -> None:
+        # Only this worker ever writes its own row, so two statements are safe
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR IGNORE INTO client_slots (client, worker, active) VALUES (?, ?, 0)", (client, os.getpid())
+        )
+        conn.execute(
+            "UPDATE client_slots SET active = MAX(0, active + ?) WHERE client = ? AND worker = ?",
+            (delta, client, os.getpid())
+        )
+
+    def clear_worker(self) -> None:
+        """Called when a worker starts - drops counts left behind by an earlier process with the same pid"""
+        self._connect().execute("DELETE FROM client_slots WHERE worker = ?", (os.getpid(),))
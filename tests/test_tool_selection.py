@@ -0,0 +1,43 @@
+"""
+Planner tool selection - a tool must not disappear just because the task doesn't use its words
+"""
+import pytest
+
+from agents.planner import PlannerAgent
+from agents.tool_index import ToolIndex
+from tools import GitHubTool, NewsTool, WeatherTool
+
+TASK = "popular rust packages and Berlin forecast"
+
+
+@pytest.fixture
+def tools(monkeypatch):
+    for name in ("GITHUB_INDEX_PATH", "GEOCODE_CACHE_PATH", "VALIDATOR_STORE_PATH"):
+        monkeypatch.setenv(name, "")
+    monkeypatch.setenv("OPENWEATHER_API_KEY", "test")
+    monkeypatch.setenv("NEWS_API_KEY", "test")
+    return [GitHubTool(), WeatherTool(), NewsTool()]
+
+
+def test_top_pads_with_unmatched_tools(tools):
+    index = ToolIndex(tools)
+    # "rust packages" shares no word with github_search's document
+    assert [name for name, _ in index.search(TASK)] == ["get_weather"]
+
+    top = index.top(TASK, 2)
+    assert top[0] == "get_weather"
+    assert len(top) == 2 and "github_search" in top
+
+
+def test_every_tool_offered_when_they_fit(tools, monkeypatch):
+    monkeypatch.setenv("PLANNER_TOP_K_TOOLS", "5")
+    planner = PlannerAgent(None, tools)
+    assert planner._select_tools(TASK) is None
+
+
+def test_selection_keeps_k_tools(tools, monkeypatch):
+    monkeypatch.setenv("PLANNER_TOP_K_TOOLS", "2")
+    planner = PlannerAgent(None, tools)
+    selected = planner._select_tools(TASK)
+    assert selected[0] == "get_weather"
+    assert len(selected) == 2
@@ -5,5 +5,32 @@ from .base import BaseTool
 from .github_tool import GitHubTool
 from .weather_tool import WeatherTool
 from .news_tool import NewsTool
+from .http_cache import ValidatorStore, default_validator_store
+from .geocode import CityIndex, default_city_index
+from .records import WeatherInfo, Repository, Article
+from .result_cache import CachePolicy, ResultCache
+from .schema import CompiledSchema, InvalidParameters
+from .key_pool import KeyPool, KeysExhausted
+from .repo_index import RepoIndex, default_repo_index
 
-__all__ = ["BaseTool", "GitHubTool", "WeatherTool", "NewsTool"]
+__all__ = [
+    "BaseTool",
+    "GitHubTool",
+    "WeatherTool",
+    "NewsTool",
+    "ValidatorStore",
+    "default_validator_store",
+    "CityIndex",
+    "default_city_index",
+    "WeatherInfo",
+    "Repository",
+    "Article",
+    "CachePolicy",
+    "ResultCache",
+    "CompiledSchema",
+    "InvalidParameters",
+    "KeyPool",
+    "KeysExhausted",
+    "RepoIndex",
+    "default_repo_index"
+]
@@ -1,13 +1,51 @@
 """
 Base tool interface for all API integrations
 """
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import requests
+
+from .http_cache import ValidatorStore
+from .key_pool import KeyPool
+from .latency import LatencyTracker, hedged, hedging_enabled
+from .result_cache import CachePolicy
+from .schema import CompiledSchema
 
 
 class BaseTool(ABC):
     """Abstract base class for all tools"""
     
+    # Key of the list in `data` that `limit` controls (e.g. "repositories")
+    # Lets the plan optimizer merge calls that only differ by limit and slice the result back
+    result_list_key: Optional[str] = None
+    
+    # Set by tools whose upstream returns ETag/Last-Modified (see _conditional_fetch)
+    validator_store: Optional[ValidatorStore] = None
+    
+    # Query params holding credentials - never part of cache keys
+    secret_params: Tuple[str, ...] = ()
+    
+    # Set by tools that authenticate - _http_get puts the best available key into every call
+    key_pool: Optional[KeyPool] = None
+    
+    # Shape of `data` on success - shown to the planner so steps can reference earlier results
+    output_description: str = ""
+    
+    # Extra words users say when they mean this tool - feeds the planner's tool index
+    keywords: Tuple[str, ...] = ()
+    
+    # How long the executor may reuse/serve stale results (None = never cache)
+    cache_policy: Optional[CachePolicy] = None
+    
+    # Upstream calls per hour the popularity prefetcher may spend keeping results warm
+    prefetch_budget: int = 0
+    
+    # Size of the tool's own thread pool in the executor, and how many calls may wait for it
+    pool_size: int = 4
+    pool_queue: int = 16
+    
     @property
     @abstractmethod
     def name(self) -> str:
@@ -36,6 +74,17 @@ class BaseTool(ABC):
         """
         pass
     
+    def canonicalize(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Maps equivalent parameter values onto one form - only used for call/cache keys,
+        never sent upstream. Tools with aliases (like city names) override this.
+        """
+        return parameters
+    
+    def cacheable(self, parameters: Dict[str, Any]) -> bool:
+        """Whether a call's result can be reused by the executor's result cache"""
+        return self.cache_policy is not None
+    
     def to_schema(self) -> Dict[str, Any]:
         """Convert tool to schema format for LLM"""
         return {
@@ -43,3 +92,120 @@ class BaseTool(ABC):
             "description": self.description,
             "parameters": self.parameters
         }
+    
+    @property
+    def parameter_schema(self) -> CompiledSchema:
+        """`parameters` compiled into a validator/coercer - built once, on first use"""
+        schema = getattr(self, "_parameter_schema", None)
+        if schema is None:
+            schema = self._parameter_schema = CompiledSchema(self.name, self.parameters)
+        return schema
+    
+    @property
+    def latency(self) -> LatencyTracker:
+        """Rolling latency for this tool - created on first use (tools don't call super().__init__)"""
+        tracker = getattr(self, "_latency", None)
+        if tracker is None:
+            tracker = self._latency = LatencyTracker.from_env()
+        return tracker
+    
+    def _http_get(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None
+    ) -> requests.Response:
+        """
+        Every upstream GET goes through here - the timeout follows the tool's recent latency,
+        and with HEDGE_REQUESTS=true a slow request gets a backup sent after the p95 delay
+        With a key pool, the call uses the key with the most quota left and moves on to the
+        next key if that one turns out to be rate limited or revoked
+        """
+        pool = self.key_pool
+        if pool is None:
+            return self._timed_get(url, params, headers, timeout)
+        
+        attempts = max(1, len(pool))
+        for attempt in range(attempts):
+            key = pool.acquire()
+            keyed_params, keyed_headers = pool.apply(key, params, headers)
+            response = self._timed_get(url, keyed_params, keyed_headers, timeout)
+            if not pool.record(key, response) or attempt == attempts - 1:
+                return response
+    
+    def _timed_get(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, str]],
+        timeout: Optional[float]
+    ) -> requests.Response:
+        tracker = self.latency
+        timeout = timeout or tracker.timeout()
+        
+        def call():
+            started = time.monotonic()
+            try:
+                response = requests.get(url, params=params, headers=headers, timeout=timeout)
+            except requests.exceptions.Timeout:
+                tracker.record(timeout, timed_out=True)
+                raise
+            tracker.record(time.monotonic() - started)
+            return response
+        
+        delay = tracker.hedge_delay() if hedging_enabled() else None
+        if delay is None or delay >= timeout:
+            return call()
+        return hedged(call, delay, tracker)
+    
+    def _conditional_fetch(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        parse: Optional[Callable[[Any], Any]] = None,
+        keep_headers: Tuple[str, ...] = (),
+        timeout: Optional[float] = None
+    ) -> Tuple[Any, Dict[str, str]]:
+        """
+        GET that revalidates against the validator store
+        Sends If-None-Match/If-Modified-Since when we have them; on a 304 we hand back
+        the stored parsed body. Raises like requests does on HTTP errors.
+        Also returns the response headers named in keep_headers (e.g. Link for pagination) -
+        those are stored too, so a 304 still has them
+        """
+        parse = parse or (lambda body: body)
+        store = self.validator_store
+        key = store.make_key(url, params, exclude=self.secret_params) if store else None
+        cached = store.get(key) if store else None
+        
+        request_headers = dict(headers or {})
+        if cached:
+            if cached["etag"]:
+                request_headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                request_headers["If-Modified-Since"] = cached["last_modified"]
+        
+        response = self._http_get(url, params=params, headers=request_headers, timeout=timeout)
+        
+        if response.status_code == 304 and cached:
+            store.touch(key)
+            # Fresh headers (like rate limit counters) win over the stored ones
+            kept = {**cached["headers"], **self._pick_headers(response, keep_headers)}
+            return cached["body"], kept
+        
+        response.raise_for_status()
+        parsed = parse(response.json())
+        kept = self._pick_headers(response, keep_headers)
+        
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if store and (etag or last_modified):
+            store.put(key, etag, last_modified, parsed, kept)
+        
+        return parsed, kept
+    
+    @staticmethod
+    def _pick_headers(response, names: Tuple[str, ...]) -> Dict[str, str]:
+        return {name: response.headers[name] for name in names if name in response.headers}
@@ -0,0 +1,60 @@
+"""
+Rotating Bloom filter - a bounded "have we seen this?" set
+Used by NewsTool to skip articles we already returned, without keeping every URL around
+"""
+import hashlib
+import math
+import threading
+
+
+class BloomFilter:
+    """Plain Bloom filter over a bytearray - no false negatives, tunable false positives"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        # Double hashing - two 64-bit halves of one digest give us all k positions
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RotatingBloomFilter:
+    """
+    Two generations of Bloom filters
+    When the current one fills up, the older one is dropped - so memory stays fixed
+    and we forget the oldest items first instead of drowning in false positives
+    """
+
+    def __init__(self, capacity: int = 50000, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.current = BloomFilter(capacity, error_rate)
+        self.previous = None
+        self._lock = threading.Lock()
+
+    def add(self, item: str) -> None:
+        with self._lock:
+            if self.current.count >= self.capacity:
+                self.previous = self.current
+                self.current = BloomFilter(self.capacity, self.error_rate)
+            self.current.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        with self._lock:
+            return item in self.current or (self.previous is not None and item in self.previous)
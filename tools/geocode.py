@@ -0,0 +1,161 @@
+"""
+City resolution for WeatherTool
+Maps the many ways people write a city ("NYC", "new york", "New York City") onto one
+canonical form, and remembers OpenWeatherMap's city IDs/coordinates between runs
+"""
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .sqlite_store import SQLiteStore
+
+
+# Common aliases -> OpenWeatherMap query. Keys are normalized (see normalize_city)
+CITY_ALIASES = {
+    "nyc": "New York,US",
+    "ny": "New York,US",
+    "new york": "New York,US",
+    "new york city": "New York,US",
+    "new york ny": "New York,US",
+    "new york us": "New York,US",
+    "manhattan": "New York,US",
+    "la": "Los Angeles,US",
+    "los angeles": "Los Angeles,US",
+    "sf": "San Francisco,US",
+    "san fran": "San Francisco,US",
+    "san francisco": "San Francisco,US",
+    "dc": "Washington,US",
+    "washington dc": "Washington,US",
+    "london": "London,GB",
+    "london uk": "London,GB",
+    "paris": "Paris,FR",
+    "bombay": "Mumbai,IN",
+    "mumbai": "Mumbai,IN",
+    "new delhi": "New Delhi,IN",
+    "delhi": "Delhi,IN",
+    "bangalore": "Bengaluru,IN",
+    "bengaluru": "Bengaluru,IN",
+    "calcutta": "Kolkata,IN",
+    "kolkata": "Kolkata,IN",
+    "madras": "Chennai,IN",
+    "chennai": "Chennai,IN",
+    "tokyo": "Tokyo,JP",
+    "peking": "Beijing,CN",
+    "beijing": "Beijing,CN",
+    "saigon": "Ho Chi Minh City,VN",
+    "ho chi minh city": "Ho Chi Minh City,VN",
+}
+
+
+def normalize_city(name: str) -> str:
+    """'  São Paulo, BR ' -> 'sao paulo br' - accents, punctuation, case and spacing dropped"""
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(ch for ch in name if not unicodedata.combining(ch))
+    name = re.sub(r"[^\w\s]", " ", name.casefold())
+    return " ".join(name.split())
+
+
+class CityIndex(SQLiteStore):
+    """
+    Alias table + persistent geocode cache
+    resolve() turns free text into a stable key; once we've seen OpenWeatherMap's answer
+    for a key, later lookups go straight to the city ID
+    """
+
+    def __init__(self, path: str, max_age: float = 30 * 24 * 3600, max_memory: int = 2000):
+        super().__init__(path)
+        self.max_age = max_age
+        self.max_memory = max_memory
+        self.aliases = dict(CITY_ALIASES)
+        # LRU in front of SQLite - key -> (location, resolved_at), same expiry as the table.
+        # Keys come from whatever the LLM wrote, so it has to stay bounded
+        self._memory: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Extra aliases can come from a JSON file: {"big apple": "New York,US"}
+        extra = os.getenv("CITY_ALIASES_PATH")
+        if extra and os.path.exists(extra):
+            with open(extra, encoding="utf-8") as f:
+                self.aliases.update({normalize_city(k): v for k, v in json.load(f).items()})
+
+        self._connect().execute(
+            """CREATE TABLE IF NOT EXISTS locations (
+                key TEXT PRIMARY KEY,
+                location TEXT NOT NULL,
+                resolved_at REAL NOT NULL
+            )"""
+        )
+
+    def canonical_query(self, city: str) -> str:
+        """What we'd send as q= for this city if we don't have an ID yet"""
+        return self.aliases.get(normalize_city(city), city.strip())
+
+    def key_for(self, city: str) -> str:
+        """Stable key - every spelling of the same city ends up on the same key"""
+        return normalize_city(self.canonical_query(city))
+
+    def resolve(self, city: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """Returns (key, cached location or None)"""
+        key = self.key_for(city)
+        return key, self.lookup(key)
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[1] <= self.max_age:
+                    self._memory.move_to_end(key)
+                    return entry[0]
+                del self._memory[key]
+
+        row = self._connect().execute(
+            "SELECT location, resolved_at FROM locations WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or now - row[1] > self.max_age:
+            return None
+
+        location = json.loads(row[0])
+        self._keep(key, location, row[1])
+        return location
+
+    def remember(self, key: str, location: Dict[str, Any]) -> None:
+        """Stores the resolved location under the key (and under its canonical name too)"""
+        keys = {key, normalize_city(f"{location['name']},{location['country']}")}
+        encoded = json.dumps(location)
+        now = time.time()
+        conn = self._connect()
+        for k in keys:
+            self._keep(k, location, now)
+        conn.executemany(
+            "INSERT OR REPLACE INTO locations (key, location, resolved_at) VALUES (?, ?, ?)",
+            [(k, encoded, now) for k in keys]
+        )
+
+    def _keep(self, key: str, location: Dict[str, Any], resolved_at: float) -> None:
+        with self._lock:
+            self._memory[key] = (location, resolved_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory:
+                self._memory.popitem(last=False)
+
+
+_default_index: Optional[CityIndex] = None
+_default_lock = threading.Lock()
+
+
+def default_city_index() -> Optional[CityIndex]:
+    """Shared city index - set GEOCODE_CACHE_PATH to empty to turn it off"""
+    global _default_index
+    path = os.getenv("GEOCODE_CACHE_PATH", ".cache/geocode.db")
+    if not path:
+        return None
+    with _default_lock:
+        if _default_index is None:
+            _default_index = CityIndex(path, max_memory=int(os.getenv("GEOCODE_MEMORY_ENTRIES", 2000)))
+        return _default_index
@@ -2,22 +2,63 @@
 GitHub API Tool for repository search and information retrieval
 """
 import os
+import re
 import requests
-from typing import Any, Dict, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
 from .base import BaseTool
+from .http_cache import default_validator_store
+from .key_pool import KeyPool
+from .records import Repository
+from .repo_index import default_repo_index
+from .result_cache import CachePolicy
+
+# GitHub search never returns more than 1000 results, 100 per page
+MAX_SEARCH_RESULTS = 1000
+PAGE_SIZE = 100
+
+_LINK_PATTERN = re.compile(r'<([^>]+)>;\s*rel="(\w+)"')
 
 
 class GitHubTool(BaseTool):
     """Tool for interacting with GitHub API"""
     
+    result_list_key = "repositories"
+    
+    output_description = "{total_count, repositories: [" + Repository.describe() + "]}"
+    keywords = ("github", "repo", "repository", "project", "library", "framework", "code", "open source", "stars")
+    
+    # Search rankings change slowly; ETag revalidation still keeps fresh calls cheap
+    cache_policy = CachePolicy(max_age=300, stale_while_revalidate=1800, stale_if_error=24 * 3600)
+    prefetch_budget = 30  # search API allows 10/min unauthenticated, 30/min with a token
+    
     def __init__(self):
         self.base_url = "https://api.github.com"
-        self.token = os.getenv("GITHUB_TOKEN")
         self.headers = {
             "Accept": "application/vnd.github.v3+json"
         }
-        if self.token:
-            self.headers["Authorization"] = f"token {self.token}"
+        
+        # GITHUB_TOKENS=a,b,c - each token has its own rate limit, read from the response headers
+        # With no tokens (or all of them exhausted) we still search unauthenticated
+        self.key_pool = KeyPool.from_env(
+            self.name,
+            "GITHUB_TOKENS",
+            "GITHUB_TOKEN",
+            header="Authorization",
+            header_format="token {key}",
+            allow_anonymous=True
+        )
+        
+        # 304s are free against the rate limit, so remember ETags between runs
+        self.validator_store = default_validator_store()
+        
+        # Every result we fetch is indexed locally; repeat searches are answered from there
+        self.repo_index = default_repo_index()
+        
+        # How many result pages we fetch at once for big limits
+        self.page_concurrency = int(os.getenv("GITHUB_PAGE_CONCURRENCY", 3))
     
     @property
     def name(self) -> str:
@@ -44,7 +85,9 @@ class GitHubTool(BaseTool):
                 },
                 "limit": {
                     "type": "integer",
-                    "description": "Number of results to return (1-10)",
+                    "description": "Number of results to return (1-1000, more than 100 is fetched page by page)",
+                    "minimum": 1,
+                    "maximum": MAX_SEARCH_RESULTS,
                     "default": 5
                 }
             },
@@ -63,52 +106,211 @@ class GitHubTool(BaseTool):
         Returns:
             Dictionary with success status and repository data
         """
+        # The executor needs the whole list, so it's built here - streaming callers
+        # (the NDJSON endpoint, reports) should use iter_repositories instead
+        total_count = 0
+        repositories = []
         try:
-            # Validate limit
-            limit = max(1, min(10, limit))
-            
-            # Make API request
-            url = f"{self.base_url}/search/repositories"
-            params = {
-                "q": query,
-                "sort": sort,
-                "order": "desc",
-                "per_page": limit
-            }
-            
-            response = requests.get(url, headers=self.headers, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            # Extract relevant information
-            repositories = []
-            for repo in data.get("items", []):
-                repositories.append({
-                    "name": repo["name"],
-                    "full_name": repo["full_name"],
-                    "description": repo["description"],
-                    "stars": repo["stargazers_count"],
-                    "forks": repo["forks_count"],
-                    "language": repo["language"],
-                    "url": repo["html_url"],
-                    "updated_at": repo["updated_at"]
-                })
-            
-            return {
-                "success": True,
-                "data": {
-                    "total_count": data.get("total_count", 0),
-                    "repositories": repositories
-                }
-            }
+            for page in self.search_pages(query, sort, limit):
+                total_count = page.get("total_count", total_count)
+                repositories.extend(page["repositories"])
         except requests.exceptions.RequestException as e:
-            return {
-                "success": False,
-                "error": f"GitHub API request failed: {str(e)}"
-            }
+            if not repositories:
+                return {
+                    "success": False,
+                    "error": f"GitHub API request failed: {str(e)}"
+                }
+            # A later page failed (usually the rate limit) - the pages we have are still good
+            print(f"[GITHUB] Returning {len(repositories)} of {limit} results, a later page failed: {e}")
         except Exception as e:
             return {
                 "success": False,
                 "error": f"Unexpected error: {str(e)}"
             }
+        
+        data = {
+            "total_count": total_count,
+            "repositories": repositories
+        }
+        if len(repositories) < min(limit, total_count, MAX_SEARCH_RESULTS):
+            # Cut short by the rate limit - fewer results than asked for, though more exist
+            data["incomplete_results"] = True
+        return {"success": True, "data": data}
+    
+    def iter_repositories(self, query: str, sort: str = "stars", limit: int = 100) -> Iterator[Repository]:
+        """
+        Streams repositories one at a time - for reporting tasks and streaming clients
+        Only a few pages are ever held in memory at once
+        """
+        for page in self.search_pages(query, sort, limit):
+            yield from page["repositories"]
+    
+    def search_pages(self, query: str, sort: str = "stars", limit: int = 5) -> Iterator[Dict[str, Any]]:
+        """
+        Yields result pages in order, trimmed so the total never goes past limit
+        Served from the local index when it can answer; otherwise fetched live and indexed
+        """
+        limit = max(1, min(MAX_SEARCH_RESULTS, limit))
+        if self.repo_index is None:
+            yield from self._search_live(query, sort, limit)
+            return
+        
+        local = self.repo_index.search(query, sort, limit)
+        if local is not None:
+            print(f"[GITHUB] Served '{query}' ({sort}) from local index")
+            yield {
+                "total_count": local["total_count"],
+                "repositories": [Repository.from_dict(repo) for repo in local["repositories"]]
+            }
+            return
+        
+        # Indexed page by page, so streaming a big search never holds the whole result
+        total_count = 0
+        indexing, fetch_id = self._index_call(self.repo_index.begin, query, sort)
+        finished = False
+        try:
+            for page in self._search_live(query, sort, limit):
+                total_count = page.get("total_count", total_count)
+                if indexing:
+                    indexing, _ = self._index_call(self.repo_index.add, fetch_id, page["repositories"])
+                yield page
+            # Only reached when every page arrived - a partial fetch never replaces the indexed answer
+            if indexing:
+                finished, _ = self._index_call(self.repo_index.finish, fetch_id, total_count)
+        finally:
+            if fetch_id is not None and not finished:
+                self._index_call(self.repo_index.discard, fetch_id)
+    
+    @staticmethod
+    def _index_call(method, *args) -> Tuple[bool, Any]:
+        """(succeeded?, result) - the index is an optimization, a failure there never fails the search"""
+        try:
+            return True, method(*args)
+        except Exception as e:
+            print(f"[GITHUB] Could not index results: {e}")
+            return False, None
+    
+    def _search_live(self, query: str, sort: str, limit: int) -> Iterator[Dict[str, Any]]:
+        """
+        The first page tells us (via the Link header) how many pages exist; the rest
+        are fetched a few at a time in parallel, bounded by the remaining rate limit
+        """
+        per_page = min(PAGE_SIZE, limit)
+        wanted_pages = -(-limit // per_page)
+        
+        first, headers = self._fetch_page(query, sort, per_page, 1)
+        remaining = limit
+        yield self._trim_page(first, remaining)
+        remaining -= len(first["repositories"])
+        
+        links = self._parse_links(headers.get("Link", ""))
+        if remaining <= 0 or "next" not in links:
+            return
+        
+        last_page = min(wanted_pages, self._page_number(links.get("last")) or wanted_pages)
+        quota = self._remaining_quota(headers)
+        if quota is not None and quota < last_page - 1:
+            # Every page is a request - asking for more than the quota left only buys 403s
+            print(f"[GITHUB] {quota} requests left, fetching {quota + 1} of {last_page} pages")
+            last_page = 1 + quota
+        workers = self._page_workers(headers)
+        if workers == 0 or last_page < 2:
+            print("[GITHUB] Rate limit exhausted, returning the first page only")
+            return
+        pages = iter(range(2, last_page + 1))
+        
+        # Sliding window - keep `workers` pages in flight and hand them out in order
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque(
+                pool.submit(self._fetch_page, query, sort, per_page, page)
+                for _, page in zip(range(workers), pages)
+            )
+            try:
+                while pending and remaining > 0:
+                    data, _ = pending.popleft().result()
+                    next_page = next(pages, None)
+                    if next_page is not None:
+                        pending.append(pool.submit(self._fetch_page, query, sort, per_page, next_page))
+                    
+                    if not data["repositories"]:
+                        break
+                    yield self._trim_page(data, remaining)
+                    remaining -= len(data["repositories"])
+            finally:
+                for future in pending:
+                    future.cancel()
+    
+    def _fetch_page(self, query: str, sort: str, per_page: int, page: int) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """One page of search results (as Repository records) plus the headers we need for paging"""
+        params = {
+            "q": query,
+            "sort": sort,
+            "order": "desc",
+            "per_page": per_page
+        }
+        if page > 1:
+            params["page"] = page
+        
+        data, headers = self._conditional_fetch(
+            f"{self.base_url}/search/repositories",
+            params=params,
+            headers=self.headers,
+            parse=self._parse_search,
+            keep_headers=("Link", "X-RateLimit-Remaining")
+        )
+        repositories = [Repository.from_dict(repo) for repo in data["repositories"]]
+        return {**data, "repositories": repositories}, headers
+    
+    def _page_workers(self, headers: Dict[str, str]) -> int:
+        """Parallel page fetches allowed right now - never more than the rate limit has left"""
+        quota = self._remaining_quota(headers)
+        return self.page_concurrency if quota is None else min(self.page_concurrency, quota)
+    
+    @staticmethod
+    def _remaining_quota(headers: Dict[str, str]) -> Optional[int]:
+        remaining = headers.get("X-RateLimit-Remaining")
+        if remaining is None or not remaining.isdigit():
+            return None
+        return int(remaining)
+    
+    @staticmethod
+    def _trim_page(page: Dict[str, Any], remaining: int) -> Dict[str, Any]:
+        if len(page["repositories"]) <= remaining:
+            return page
+        return {**page, "repositories": page["repositories"][:remaining]}
+    
+    @staticmethod
+    def _parse_links(header: str) -> Dict[str, str]:
+        """Link: <url>; rel="next", <url>; rel="last" -> {"next": url, "last": url}"""
+        return {rel: url for url, rel in _LINK_PATTERN.findall(header)}
+    
+    @staticmethod
+    def _page_number(url: Optional[str]) -> Optional[int]:
+        if not url:
+            return None
+        page = parse_qs(urlparse(url).query).get("page")
+        return int(page[0]) if page and page[0].isdigit() else None
+    
+    def _parse_search(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Pulls out the fields we care about - the result is what gets stored with the ETag,
+        so it stays plain JSON; _fetch_page turns it into records
+        """
+        repositories = []
+        for repo in data.get("items", []):
+            repositories.append({
+                "name": repo["name"],
+                "full_name": repo["full_name"],
+                "owner": (repo.get("owner") or {}).get("login"),
+                "description": repo["description"],
+                "stars": repo["stargazers_count"],
+                "forks": repo["forks_count"],
+                "language": repo["language"],
+                "url": repo["html_url"],
+                "updated_at": repo["updated_at"]
+            })
+        
+        return {
+            "total_count": data.get("total_count", 0),
+            "repositories": repositories
+        }
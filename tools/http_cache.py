@@ -0,0 +1,115 @@
+"""
+Conditional request support - persistent ETag/Last-Modified store for tools
+A 304 from GitHub doesn't count against the rate limit, so repeat searches are nearly free
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from .sqlite_store import SQLiteStore
+
+
+class ValidatorStore(SQLiteStore):
+    """
+    SQLite-backed store of (validator, parsed body) per URL + params
+    We keep the parsed body, not the raw one, so a 304 skips re-parsing too
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000):
+        super().__init__(path)
+        self.max_entries = max_entries
+        self._writes = 0
+
+        conn = self._connect()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS validators (
+                key TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                headers TEXT
+            )"""
+        )
+        # Stores created before we kept headers don't have the column yet
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(validators)")}
+        if "headers" not in columns:
+            conn.execute("ALTER TABLE validators ADD COLUMN headers TEXT")
+
+    @staticmethod
+    def make_key(url: str, params: Optional[Dict[str, Any]] = None, exclude: Iterable[str] = ()) -> str:
+        """Stable key for a request - credentials are left out so rotating keys still hit"""
+        params = {k: v for k, v in (params or {}).items() if k not in exclude}
+        raw = url + "?" + json.dumps(params, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            "SELECT etag, last_modified, body, stored_at, headers FROM validators WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "etag": row[0],
+            "last_modified": row[1],
+            "body": json.loads(row[2]),
+            "stored_at": row[3],
+            "headers": json.loads(row[4]) if row[4] else {}
+        }
+
+    def put(
+        self,
+        key: str,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        body: Any,
+        headers: Optional[Dict[str, str]] = None
+    ) -> None:
+        """Stores the parsed body plus any response headers the caller wants back on a 304"""
+        conn = self._connect()
+        conn.execute(
+            """INSERT OR REPLACE INTO validators (key, etag, last_modified, body, stored_at, headers)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (key, etag, last_modified, json.dumps(body, default=str), time.time(),
+             json.dumps(headers) if headers else None)
+        )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._prune(conn)
+
+    def touch(self, key: str) -> None:
+        """Marks an entry as just revalidated"""
+        self._connect().execute(
+            "UPDATE validators SET stored_at = ? WHERE key = ?", (time.time(), key)
+        )
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        """Keeps the store bounded - drops the least recently validated entries"""
+        conn.execute(
+            """DELETE FROM validators WHERE key IN (
+                SELECT key FROM validators ORDER BY stored_at DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_entries,)
+        )
+
+
+_default_store: Optional[ValidatorStore] = None
+_default_lock = threading.Lock()
+
+
+def default_validator_store() -> Optional[ValidatorStore]:
+    """Shared store for all tools - set VALIDATOR_STORE_PATH to empty to turn it off"""
+    global _default_store
+    path = os.getenv("VALIDATOR_STORE_PATH", ".cache/validators.db")
+    if not path:
+        return None
+    with _default_lock:
+        if _default_store is None:
+            _default_store = ValidatorStore(
+                path, max_entries=int(os.getenv("VALIDATOR_STORE_MAX_ENTRIES", 5000))
+            )
+        return _default_store
@@ -0,0 +1,229 @@
+"""
+API key pools - several credentials per upstream, so throughput isn't capped by one key's quota
+Every call takes the key with the most quota left (from rate limit headers when the API sends
+them, local per-window counters otherwise). Rate limited keys sit out until their quota resets,
+rejected ones (401) are dropped from rotation for good.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+
+class KeysExhausted(requests.exceptions.RequestException):
+    """Every key in the pool is rate limited or revoked - tools report it like any failed request"""
+
+
+class _Key:
+    __slots__ = (
+        "secret", "label", "calls", "rate_limited", "header_limit", "header_remaining",
+        "reset_at", "cooldown_until", "revoked", "window_start", "window_used", "last_used"
+    )
+
+    def __init__(self, secret: str):
+        self.secret = secret
+        self.label = f"...{secret[-4:]}" if len(secret) > 8 else "..."
+        self.calls = 0
+        self.rate_limited = 0
+        self.header_limit: Optional[int] = None
+        self.header_remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None
+        self.cooldown_until = 0.0
+        self.revoked = False
+        self.window_start = time.time()
+        self.window_used = 0
+        self.last_used = 0.0
+
+
+class KeyPool:
+    """
+    Credentials for one tool - acquire() before a call, record() with the response after
+    `quota` is (calls, window seconds) for APIs that don't send rate limit headers
+    The key goes into query param `param`, or header `header` formatted with `header_format`
+    """
+
+    def __init__(
+        self,
+        name: str,
+        keys: List[str],
+        param: Optional[str] = None,
+        header: Optional[str] = None,
+        header_format: str = "{key}",
+        quota: Optional[Tuple[int, float]] = None,
+        cooldown: float = 60.0,
+        allow_anonymous: bool = False
+    ):
+        self.name = name
+        self.keys = [_Key(secret) for secret in dict.fromkeys(keys)]  # dedupe, keep order
+        self.param = param
+        self.header = header
+        self.header_format = header_format
+        self.quota = quota
+        self.cooldown = cooldown
+        self.allow_anonymous = allow_anonymous  # e.g. GitHub still answers (slowly) without a token
+        self.anonymous_calls = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, name: str, list_var: str, single_var: str, **kwargs) -> "KeyPool":
+        """
+        Keys from `list_var` (comma separated) plus `single_var`, so existing .env files keep working
+        KEY_QUOTAS=get_weather:60/60,get_news:100/86400 overrides the tool's default quota
+        """
+        keys = [key.strip() for key in os.getenv(list_var, "").split(",") if key.strip()]
+        single = os.getenv(single_var, "").strip()
+        if single:
+            keys.append(single)
+
+        for item in os.getenv("KEY_QUOTAS", "").split(","):
+            tool, _, value = item.partition(":")
+            calls, _, window = value.partition("/")
+            if tool.strip() == name and calls.strip().isdigit():
+                kwargs["quota"] = (int(calls), float(window or 60))
+        kwargs.setdefault("cooldown", float(os.getenv("KEY_COOLDOWN", 60)))
+        return cls(name, keys, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def acquire(self) -> Optional[_Key]:
+        """
+        Key with the most quota left (least recently used on ties) - None means go unauthenticated
+        Raises KeysExhausted when nothing is usable and anonymous calls aren't allowed
+        """
+        now = time.time()
+        with self._lock:
+            best, best_rank = None, None
+            for key in self.keys:
+                if key.revoked or key.cooldown_until > now:
+                    continue
+                remaining = self._remaining(key, now)
+                if remaining <= 0:
+                    continue
+                rank = (remaining, -key.last_used)
+                if best_rank is None or rank > best_rank:
+                    best, best_rank = key, rank
+
+            if best is None:
+                if self.allow_anonymous:
+                    self.anonymous_calls += 1
+                    return None
+                raise KeysExhausted(f"all {len(self.keys)} {self.name} API keys are rate limited or revoked")
+
+            # Count it now so concurrent calls spread across keys instead of piling onto one
+            best.calls += 1
+            best.window_used += 1
+            best.last_used = now
+            if best.header_remaining is not None:
+                best.header_remaining -= 1
+            return best
+
+    def apply(
+        self,
+        key: Optional[_Key],
+        params: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, str]]
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, str]]]:
+        """Copies of params/headers with the key put in"""
+        if key is None:
+            return params, headers
+        if self.param:
+            params = {**(params or {}), self.param: key.secret}
+        if self.header:
+            headers = {**(headers or {}), self.header: self.header_format.format(key=key.secret)}
+        return params, headers
+
+    def record(self, key: Optional[_Key], response: requests.Response) -> bool:
+        """
+        Updates the key from the response - True means the key was rejected or rate limited,
+        so the same call is worth retrying with another key
+        """
+        if key is None:
+            return False
+        now = time.time()
+        headers = response.headers
+        status = response.status_code
+
+        with self._lock:
+            remaining = _int_header(headers, "X-RateLimit-Remaining")
+            if remaining is not None:
+                key.header_remaining = remaining
+                key.header_limit = _int_header(headers, "X-RateLimit-Limit") or key.header_limit
+                reset = _int_header(headers, "X-RateLimit-Reset")
+                key.reset_at = float(reset) if reset else None
+
+            if status == 401:
+                key.revoked = True
+                print(f"[KEYS] {self.name} key {key.label} was rejected (401), removed from rotation")
+                return True
+
+            rate_limited = status == 429 or (status == 403 and key.header_remaining == 0)
+            if not rate_limited:
+                return False
+
+            key.rate_limited += 1
+            retry_after = _int_header(headers, "Retry-After")
+            if retry_after is not None:
+                key.cooldown_until = now + retry_after
+            elif key.reset_at and key.reset_at > now:
+                key.cooldown_until = key.reset_at
+            elif self.quota:
+                # Sit out the rest of the local window
+                key.window_used = self.quota[0]
+                key.cooldown_until = key.window_start + self.quota[1]
+            else:
+                key.cooldown_until = now + self.cooldown
+            print(f"[KEYS] {self.name} key {key.label} is rate limited for {key.cooldown_until - now:.0f}s")
+            return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-key usage for /admin/keys - keys are only shown by their last 4 characters"""
+        now = time.time()
+        with self._lock:
+            keys = []
+            for key in self.keys:
+                remaining = self._remaining(key, now)
+                keys.append({
+                    "key": key.label,
+                    "calls": key.calls,
+                    "rate_limited": key.rate_limited,
+                    "remaining": None if remaining == float("inf") else remaining,
+                    "limit": key.header_limit or (self.quota[0] if self.quota else None),
+                    "resets_in_s": round(key.reset_at - now, 1) if key.reset_at and key.reset_at > now else None,
+                    "state": (
+                        "revoked" if key.revoked
+                        else "cooling_down" if key.cooldown_until > now
+                        else "exhausted" if remaining <= 0
+                        else "active"
+                    )
+                })
+            return {
+                "keys": keys,
+                "active": sum(1 for key in keys if key["state"] == "active"),
+                "anonymous_calls": self.anonymous_calls
+            }
+
+    def _remaining(self, key: _Key, now: float) -> float:
+        """Best guess at the key's remaining quota - unknown counts as unlimited"""
+        if key.header_remaining is not None:
+            if key.reset_at is None or now < key.reset_at:
+                return key.header_remaining
+            # Reset time passed - the API will hand out a full quota again
+            key.header_remaining = None
+        if self.quota:
+            calls, window = self.quota
+            if now - key.window_start >= window:
+                key.window_start = now
+                key.window_used = 0
+            return calls - key.window_used
+        return float("inf")
+
+
+def _int_header(headers, name: str) -> Optional[int]:
+    value = headers.get(name)
+    try:
+        return int(float(value)) if value is not None else None
+    except ValueError:
+        return None
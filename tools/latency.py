@@ -0,0 +1,151 @@
+"""
+Rolling latency tracking per tool - adaptive timeouts and hedged requests
+OpenWeatherMap usually answers in ~100 ms while GitHub search can take several seconds,
+so one hard-coded timeout was wrong for everyone
+"""
+import os
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Optional
+
+_hedge_pool: Optional[ThreadPoolExecutor] = None
+_hedge_pool_lock = threading.Lock()
+
+
+def hedging_enabled() -> bool:
+    return os.getenv("HEDGE_REQUESTS", "false").lower() == "true"
+
+
+class LatencyTracker:
+    """
+    Last `window` response times for one tool (seconds)
+    Timeout = p99 x multiplier, clamped to [min_timeout, max_timeout]; until we have
+    min_samples we stick with the old fixed default
+    """
+
+    def __init__(
+        self,
+        window: int = 200,
+        min_samples: int = 20,
+        default_timeout: float = 10.0,
+        min_timeout: float = 1.0,
+        max_timeout: float = 30.0,
+        multiplier: float = 3.0,
+        max_hedge_ratio: float = 0.1
+    ):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.multiplier = multiplier
+        self.max_hedge_ratio = max_hedge_ratio
+        self.stats = {"requests": 0, "timeouts": 0, "hedged": 0, "hedge_wins": 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "LatencyTracker":
+        return cls(
+            window=int(os.getenv("LATENCY_WINDOW", 200)),
+            default_timeout=float(os.getenv("TOOL_TIMEOUT_DEFAULT", 10)),
+            min_timeout=float(os.getenv("TOOL_TIMEOUT_MIN", 1)),
+            max_timeout=float(os.getenv("TOOL_TIMEOUT_MAX", 30)),
+            multiplier=float(os.getenv("TOOL_TIMEOUT_MULTIPLIER", 3)),
+            max_hedge_ratio=float(os.getenv("HEDGE_MAX_RATIO", 0.1))
+        )
+
+    def record(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.samples.append(seconds)
+            self.stats["requests"] += 1
+            if timed_out:
+                # Counts as a (lower bound) sample, so timeouts that are too tight widen themselves
+                self.stats["timeouts"] += 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def timeout(self) -> float:
+        p99 = self.percentile(99)
+        if p99 is None:
+            return self.default_timeout
+        return min(self.max_timeout, max(self.min_timeout, p99 * self.multiplier))
+
+    def hedge_delay(self) -> Optional[float]:
+        """p95 - past this a request is slow enough that a second one is worth sending"""
+        return self.percentile(95)
+
+    def take_hedge(self) -> bool:
+        """Caps hedges at max_hedge_ratio of requests so a slow upstream doesn't get double the load"""
+        with self._lock:
+            if self.stats["hedged"] + 1 > self.max_hedge_ratio * self.stats["requests"]:
+                return False
+            self.stats["hedged"] += 1
+            return True
+
+    def hedge_won(self) -> None:
+        with self._lock:
+            self.stats["hedge_wins"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50, p95, p99 = self.percentile(50), self.percentile(95), self.percentile(99)
+        with self._lock:
+            stats = dict(self.stats)
+            samples = len(self.samples)
+        return {
+            "samples": samples,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "p99_ms": round(p99 * 1000, 1) if p99 is not None else None,
+            "timeout_s": round(self.timeout(), 2),
+            **stats
+        }
+
+
+def hedged(call: Callable[[], Any], delay: float, tracker: LatencyTracker) -> Any:
+    """
+    Runs call(); if it hasn't answered after `delay` seconds, starts a second identical
+    call and returns whichever succeeds first. Only for idempotent requests (GETs).
+    """
+    pool = _pool()
+    first = pool.submit(call)
+    try:
+        return first.result(timeout=delay)
+    except FutureTimeout:
+        pass
+
+    if not tracker.take_hedge():
+        return first.result()
+
+    second = pool.submit(call)
+    done, _ = wait([first, second], return_when=FIRST_COMPLETED)
+    winner = next((f for f in done if f.exception() is None), None)
+    if winner is None:
+        # First one back failed - the other might still make it
+        loser = next(iter(done))
+        other = second if loser is first else first
+        if other.exception() is not None:
+            raise loser.exception()
+        winner = other
+
+    if winner is second:
+        tracker.hedge_won()
+    return winner.result()
+
+
+def _pool() -> ThreadPoolExecutor:
+    """Shared by all tools, created on first use"""
+    global _hedge_pool
+    with _hedge_pool_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(
+                max_workers=int(os.getenv("HEDGE_POOL_SIZE", 16)), thread_name_prefix="hedge"
+            )
+        return _hedge_pool
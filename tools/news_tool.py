@@ -2,19 +2,47 @@
 News API Tool for fetching latest news articles
 """
 import os
+import re
+import threading
 import requests
+from collections import OrderedDict
 from typing import Any, Dict, Optional
 from .base import BaseTool
+from .bloom import RotatingBloomFilter
+from .key_pool import KeyPool
+from .records import Article
+from .result_cache import CachePolicy
 
 
 class NewsTool(BaseTool):
     """Tool for fetching news articles"""
     
+    result_list_key = "articles"
+    
+    secret_params = ("apiKey",)
+    
+    output_description = "{total_results, articles: [" + Article.describe() + "]}"
+    keywords = ("news", "headlines", "articles", "latest", "breaking", "stories", "press", "updates")
+    
+    cache_policy = CachePolicy(max_age=120, stale_while_revalidate=900, stale_if_error=6 * 3600)
+    prefetch_budget = 2  # free tier is only 100 requests/day
+    pool_size = 2
+    
     def __init__(self):
-        self.api_key = os.getenv("NEWS_API_KEY")
-        if not self.api_key:
+        # NEWS_API_KEYS=a,b - counted locally against the free tier's 100 requests/day per key
+        self.key_pool = KeyPool.from_env(
+            self.name, "NEWS_API_KEYS", "NEWS_API_KEY", param="apiKey", quota=(100, 86400)
+        )
+        if not len(self.key_pool):
             raise ValueError("NEWS_API_KEY environment variable is required")
         self.base_url = "https://newsapi.org/v2"
+        
+        # Incremental mode state: newest publishedAt per query, plus a bounded set
+        # of articles we've already handed out (by URL and by normalized title)
+        self.last_published: "OrderedDict[str, str]" = OrderedDict()
+        self.max_tracked_queries = int(os.getenv("NEWS_TRACKED_QUERIES", 1000))
+        self.seen = RotatingBloomFilter(capacity=int(os.getenv("NEWS_SEEN_CAPACITY", 50000)))
+        self._lock = threading.Lock()
     
     @property
     def name(self) -> str:
@@ -41,12 +69,29 @@ class NewsTool(BaseTool):
                 "limit": {
                     "type": "integer",
                     "description": "Number of articles to return (1-10)",
+                    "minimum": 1,
+                    "maximum": 10,
                     "default": 5
+                },
+                "incremental": {
+                    "type": "boolean",
+                    "description": "Only return articles that weren't returned by earlier calls for this query (for polling)",
+                    "default": False
                 }
             }
         }
     
-    def execute(self, query: Optional[str] = None, category: Optional[str] = None, limit: int = 5) -> Dict[str, Any]:
+    def cacheable(self, parameters: Dict[str, Any]) -> bool:
+        # Incremental calls return "what's new since last time" - replaying one would be wrong
+        return not parameters.get("incremental")
+    
+    def execute(
+        self,
+        query: Optional[str] = None,
+        category: Optional[str] = None,
+        limit: int = 5,
+        incremental: bool = False
+    ) -> Dict[str, Any]:
         """
         Get news articles
         
@@ -54,6 +99,8 @@ class NewsTool(BaseTool):
             query: Search query (optional)
             category: News category (optional)
             limit: Number of articles
+            incremental: Only fetch articles newer than the last call for this query,
+                and skip anything already returned by any incremental call
             
         Returns:
             Dictionary with success status and news data
@@ -67,7 +114,6 @@ class NewsTool(BaseTool):
                 url = f"{self.base_url}/everything"
                 params = {
                     "q": query,
-                    "apiKey": self.api_key,
                     "pageSize": limit,
                     "sortBy": "publishedAt",
                     "language": "en"
@@ -76,7 +122,6 @@ class NewsTool(BaseTool):
                 url = f"{self.base_url}/top-headlines"
                 params = {
                     "category": category,
-                    "apiKey": self.api_key,
                     "pageSize": limit,
                     "language": "en"
                 }
@@ -84,35 +129,58 @@ class NewsTool(BaseTool):
                 # Default to top headlines
                 url = f"{self.base_url}/top-headlines"
                 params = {
-                    "apiKey": self.api_key,
                     "pageSize": limit,
                     "language": "en",
                     "country": "us"
                 }
             
-            response = requests.get(url, params=params, timeout=10)
+            state_key = f"{(query or '').casefold()}|{category or ''}"
+            since = self._get_since(state_key) if incremental else None
+            if since and query:
+                params["from"] = since  # only /everything supports this, headlines get filtered below
+            
+            response = self._http_get(url, params=params)
             response.raise_for_status()
             
             data = response.json()
             
             # Extract relevant information
             articles = []
+            batch_seen = set()
+            duplicates = 0
             for article in data.get("articles", []):
-                articles.append({
-                    "title": article["title"],
-                    "description": article.get("description", ""),
-                    "source": article["source"]["name"],
-                    "author": article.get("author", "Unknown"),
-                    "published_at": article["publishedAt"],
-                    "url": article["url"]
-                })
+                keys = self._dedupe_keys(article)
+                if batch_seen.intersection(keys) or (incremental and any(key in self.seen for key in keys)):
+                    duplicates += 1
+                    continue
+                if since and article["publishedAt"] < since:
+                    continue
+                batch_seen.update(keys)
+                articles.append(Article(
+                    title=article["title"],
+                    description=article.get("description", ""),
+                    source=article["source"]["name"],
+                    author=article.get("author", "Unknown"),
+                    published_at=article["publishedAt"],
+                    url=article["url"]
+                ))
+            
+            result = {
+                "total_results": data.get("totalResults", 0),
+                "articles": articles
+            }
+            
+            if incremental:
+                for key in batch_seen:
+                    self.seen.add(key)
+                if articles:
+                    self._set_since(state_key, max(a.published_at for a in articles))
+                result["since"] = since
+                result["duplicates_skipped"] = duplicates
             
             return {
                 "success": True,
-                "data": {
-                    "total_results": data.get("totalResults", 0),
-                    "articles": articles
-                }
+                "data": result
             }
         except requests.exceptions.RequestException as e:
             return {
@@ -124,3 +192,30 @@ class NewsTool(BaseTool):
                 "success": False,
                 "error": f"Unexpected error: {str(e)}"
             }
+    
+    def _get_since(self, state_key: str) -> Optional[str]:
+        with self._lock:
+            since = self.last_published.get(state_key)
+            if since:
+                self.last_published.move_to_end(state_key)
+            return since
+    
+    def _set_since(self, state_key: str, published_at: str) -> None:
+        """Remembers the newest article per query - oldest queries are forgotten first"""
+        with self._lock:
+            current = self.last_published.get(state_key)
+            if current is None or published_at > current:
+                self.last_published[state_key] = published_at
+            self.last_published.move_to_end(state_key)
+            while len(self.last_published) > self.max_tracked_queries:
+                self.last_published.popitem(last=False)
+    
+    @staticmethod
+    def _dedupe_keys(article: Dict[str, Any]) -> set:
+        """The same story shows up under different URLs, so we match on title too"""
+        keys = {"url:" + (article.get("url") or "")}
+        title = re.sub(r"[^\w\s]", "", (article.get("title") or "").casefold())
+        title = " ".join(title.split())
+        if title:
+            keys.add("title:" + title)
+        return keys
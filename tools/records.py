@@ -0,0 +1,60 @@
+"""
+Typed result records returned by the tools
+Slotted dataclasses - no per-instance __dict__, built once by the tool and only turned
+into JSON at the edge (orjson serializes dataclasses natively)
+"""
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Optional
+
+
+class _Record:
+    """Shared helpers - kept out of the dataclasses so they stay slotted"""
+    __slots__ = ()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]):
+        return cls(**{f.name: data.get(f.name) for f in fields(cls)})
+
+    @classmethod
+    def describe(cls) -> str:
+        """Field list for the planner prompt, e.g. '{city, country, ...}'"""
+        return "{" + ", ".join(f.name for f in fields(cls)) + "}"
+
+
+@dataclass(slots=True)
+class WeatherInfo(_Record):
+    city: str
+    country: str
+    temperature: float
+    feels_like: float
+    humidity: int
+    pressure: int
+    conditions: str
+    wind_speed: float
+    units: str
+
+
+@dataclass(slots=True)
+class Repository(_Record):
+    name: str
+    full_name: str
+    owner: Optional[str]
+    description: Optional[str]
+    stars: int
+    forks: int
+    language: Optional[str]
+    url: str
+    updated_at: str
+
+
+@dataclass(slots=True)
+class Article(_Record):
+    title: str
+    description: Optional[str]
+    source: str
+    author: Optional[str]
+    published_at: str
+    url: str
@@ -0,0 +1,375 @@
+"""
+Local GitHub repository index - every search result GitHubTool sees lands in SQLite (FTS5)
+A query that was fetched live recently enough is answered from here instead of spending
+GitHub's search quota (30/min with a token, 10 without)
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .sqlite_store import SQLiteStore
+
+SORT_COLUMNS = {"stars": "stars", "forks": "forks", "updated": "updated_at"}
+
+_QUALIFIER = re.compile(r"(\w+):(\S+)")
+_WORD = re.compile(r"\w+")
+
+# A fetch that hasn't finished in this long never will - its staged rows get pruned
+_ABANDONED_FETCH = 3600.0
+
+
+def normalize_query(query: str) -> str:
+    """'  Machine   Learning ' and 'machine learning' are the same query"""
+    return " ".join(query.casefold().split())
+
+
+class RepoIndex(SQLiteStore):
+    """
+    repos - one row per repository (latest stats we've seen), mirrored into repos_fts
+    query_results - which repos a live query returned, per sort
+    queries - when each (query, sort) was last fetched live, how many results and the total
+    fetches / fetch_results - a live fetch in progress, swapped into query_results by finish()
+    """
+
+    def __init__(
+        self,
+        path: str,
+        refresh: Optional[Dict[str, float]] = None,
+        max_repos: int = 50000
+    ):
+        super().__init__(path)
+        # How long a live fetch keeps a query answerable locally, per sort - "updated" moves fastest
+        self.refresh = {"stars": 3600.0, "forks": 3600.0, "updated": 300.0, **(refresh or {})}
+        self.max_repos = max_repos
+        self.stats = {"hits": 0, "misses": 0, "indexed": 0}
+        self._stats_lock = threading.Lock()  # request threads share one index
+        self._writes = 0
+
+        conn = self._connect()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS repos (
+                id INTEGER PRIMARY KEY,
+                full_name TEXT NOT NULL UNIQUE,
+                name TEXT NOT NULL,
+                owner TEXT,
+                description TEXT,
+                stars INTEGER NOT NULL,
+                forks INTEGER NOT NULL,
+                language TEXT,
+                url TEXT NOT NULL,
+                updated_at TEXT,
+                indexed_at REAL NOT NULL
+            )"""
+        )
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS query_results (
+                query_key TEXT NOT NULL,
+                sort TEXT NOT NULL,
+                repo_id INTEGER NOT NULL,
+                PRIMARY KEY (query_key, sort, repo_id)
+            )"""
+        )
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS queries (
+                query_key TEXT NOT NULL,
+                sort TEXT NOT NULL,
+                fetched INTEGER NOT NULL,
+                total_count INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (query_key, sort)
+            )"""
+        )
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS fetches (
+                id TEXT PRIMARY KEY,
+                query_key TEXT NOT NULL,
+                sort TEXT NOT NULL,
+                started_at REAL NOT NULL
+            )"""
+        )
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS fetch_results (
+                fetch_id TEXT NOT NULL,
+                repo_id INTEGER NOT NULL,
+                PRIMARY KEY (fetch_id, repo_id)
+            )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_repos_indexed ON repos(indexed_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_query_results_repo ON query_results(repo_id)")
+        try:
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS repos_fts USING fts5(name, full_name, description, language)"
+            )
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5 - we can still replay exact queries from query_results
+            self.fts = False
+
+    def search(self, query: str, sort: str = "stars", limit: int = 5) -> Optional[Dict[str, Any]]:
+        """
+        {"total_count", "repositories": [dicts]} if the index can answer, None to go live
+        Answerable when the same query was fetched live within the sort's refresh window and
+        either with this sort and at least `limit` results, or completely (every match indexed)
+        """
+        key = normalize_query(query)
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT sort, fetched, total_count, fetched_at FROM queries WHERE query_key = ?", (key,)
+        ).fetchall()
+
+        window = self.refresh.get(sort, 0.0)
+        now = time.time()
+        answer = None
+        for fetched_sort, fetched, total_count, fetched_at in rows:
+            if now - fetched_at > window:
+                continue
+            complete = fetched >= total_count
+            if complete or (fetched_sort == sort and fetched >= min(limit, total_count)):
+                answer = (fetched_sort, total_count, fetched_at, complete)
+                break
+        if answer is None or sort not in SORT_COLUMNS:
+            self._count("misses")
+            return None
+
+        fetched_sort, total, fetched_at, complete = answer
+        self._count("hits")
+        if total == 0:
+            # GitHub found nothing - don't let local text matches from other queries say otherwise
+            return {"total_count": 0, "repositories": []}
+
+        # What the live API returned for this query. Only a complete answer is widened with local
+        # text matches (repos that showed up since), and only ones refreshed since that fetch,
+        # so a partial top-N never gets mixed with repos GitHub didn't rank, or with old stats
+        where = "id IN (SELECT repo_id FROM query_results WHERE query_key = ? AND sort = ?)"
+        params: List[Any] = [key, fetched_sort]
+        match, language = self._fts_query(query) if complete else (None, None)
+        if match:
+            where = (
+                f"({where} OR (id IN (SELECT rowid FROM repos_fts WHERE repos_fts MATCH ?) AND indexed_at >= ?))"
+            )
+            params += [match, fetched_at]
+            if language:
+                where += " AND language = ? COLLATE NOCASE"
+                params.append(language)
+
+        rows = conn.execute(
+            f"""SELECT name, full_name, owner, description, stars, forks, language, url, updated_at
+                FROM repos WHERE {where} ORDER BY {SORT_COLUMNS[sort]} DESC LIMIT ?""",
+            (*params, limit)
+        ).fetchall()
+        return {
+            "total_count": max(total, len(rows)),
+            "repositories": [
+                {
+                    "name": row[0],
+                    "full_name": row[1],
+                    "owner": row[2],
+                    "description": row[3],
+                    "stars": row[4],
+                    "forks": row[5],
+                    "language": row[6],
+                    "url": row[7],
+                    "updated_at": row[8]
+                }
+                for row in rows
+            ]
+        }
+
+    def begin(self, query: str, sort: str) -> str:
+        """
+        Starts indexing a live fetch page by page, returns its fetch id
+        The previous answer for the query stays in place until finish(), so a fetch that's
+        abandoned halfway (rate limit, error) neither leaves a half-filled answer nor loses the old one
+        """
+        fetch_id = uuid.uuid4().hex
+        self._connect().execute(
+            "INSERT INTO fetches (id, query_key, sort, started_at) VALUES (?, ?, ?, ?)",
+            (fetch_id, normalize_query(query), sort, time.time())
+        )
+        return fetch_id
+
+    def add(self, fetch_id: str, repositories: Iterable[Any]) -> None:
+        """Indexes one page of a fetch started with begin()"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN")
+            ids = [self._upsert(conn, repo, now) for repo in repositories]
+            conn.executemany(
+                "INSERT OR IGNORE INTO fetch_results (fetch_id, repo_id) VALUES (?, ?)",
+                [(fetch_id, repo_id) for repo_id in ids]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._count("indexed", len(ids))
+
+    def finish(self, fetch_id: str, total_count: int) -> None:
+        """Every page arrived - the fetch replaces the query's previous answer (`total_count` matches)"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT query_key, sort FROM fetches WHERE id = ?", (fetch_id,)).fetchone()
+            if row is not None:
+                key, sort = row
+                conn.execute("DELETE FROM query_results WHERE query_key = ? AND sort = ?", (key, sort))
+                fetched = conn.execute(
+                    """INSERT OR IGNORE INTO query_results (query_key, sort, repo_id)
+                       SELECT ?, ?, repo_id FROM fetch_results WHERE fetch_id = ?""",
+                    (key, sort, fetch_id)
+                ).rowcount
+                conn.execute(
+                    """INSERT OR REPLACE INTO queries (query_key, sort, fetched, total_count, fetched_at)
+                       VALUES (?, ?, ?, ?, ?)""",
+                    (key, sort, fetched, total_count, time.time())
+                )
+            self._drop_fetch(conn, fetch_id)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._prune(conn)
+
+    def discard(self, fetch_id: str) -> None:
+        """Forgets a fetch that won't be finished - the query keeps its previous answer"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN")
+            self._drop_fetch(conn, fetch_id)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def snapshot(self) -> Dict[str, Any]:
+        conn = self._connect()
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {
+            **stats,
+            "repos": conn.execute("SELECT COUNT(*) FROM repos").fetchone()[0],
+            "queries": conn.execute("SELECT COUNT(*) FROM queries").fetchone()[0],
+            "fts": self.fts
+        }
+
+    def _count(self, stat: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[stat] += amount
+
+    def _upsert(self, conn: sqlite3.Connection, repo: Any, now: float) -> int:
+        data = repo if isinstance(repo, dict) else repo.to_dict()
+        row = conn.execute("SELECT id FROM repos WHERE full_name = ?", (data["full_name"],)).fetchone()
+        values = (
+            data["name"], data.get("owner"), data.get("description"), data["stars"] or 0,
+            data["forks"] or 0, data.get("language"), data["url"], data.get("updated_at"), now
+        )
+        if row is None:
+            repo_id = conn.execute(
+                """INSERT INTO repos
+                   (name, owner, description, stars, forks, language, url, updated_at, indexed_at, full_name)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (*values, data["full_name"])
+            ).lastrowid
+        else:
+            repo_id = row[0]
+            conn.execute(
+                """UPDATE repos SET name = ?, owner = ?, description = ?, stars = ?, forks = ?,
+                   language = ?, url = ?, updated_at = ?, indexed_at = ? WHERE id = ?""",
+                (*values, repo_id)
+            )
+            if self.fts:
+                conn.execute("DELETE FROM repos_fts WHERE rowid = ?", (repo_id,))
+
+        if self.fts:
+            conn.execute(
+                "INSERT INTO repos_fts (rowid, name, full_name, description, language) VALUES (?, ?, ?, ?, ?)",
+                (repo_id, data["name"], data["full_name"], data.get("description") or "", data.get("language") or "")
+            )
+        return repo_id
+
+    @staticmethod
+    def _drop_fetch(conn: sqlite3.Connection, fetch_id: str) -> None:
+        conn.execute("DELETE FROM fetch_results WHERE fetch_id = ?", (fetch_id,))
+        conn.execute("DELETE FROM fetches WHERE id = ?", (fetch_id,))
+
+    def _fts_query(self, query: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Plain words become an FTS AND query; language:X becomes a filter
+        Any other qualifier (stars:>100, user:x...) means we only trust the replayed results
+        """
+        language = None
+        for name, value in _QUALIFIER.findall(query):
+            if name.lower() != "language":
+                return None, None
+            language = value
+        if not self.fts:
+            return None, language
+
+        words = _WORD.findall(_QUALIFIER.sub(" ", query))
+        if not words:
+            return None, language
+        return " ".join(f'"{word}"' for word in words), language
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        """
+        Keeps the index bounded - drops the repos we haven't seen in the longest time
+        A query that loses any of its results is forgotten too, otherwise it would still look
+        complete and get answered with a shortened list. Fetches abandoned long ago go as well
+        """
+        stale = [
+            row[0] for row in conn.execute(
+                "SELECT id FROM repos ORDER BY indexed_at DESC LIMIT -1 OFFSET ?", (self.max_repos,)
+            )
+        ]
+        abandoned = [
+            row[0] for row in conn.execute(
+                "SELECT id FROM fetches WHERE started_at < ?", (time.time() - _ABANDONED_FETCH,)
+            )
+        ]
+        if not stale and not abandoned:
+            return
+        try:
+            conn.execute("BEGIN")
+            for fetch_id in abandoned:
+                self._drop_fetch(conn, fetch_id)
+            for start in range(0, len(stale), 500):
+                chunk = stale[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                affected = conn.execute(
+                    f"SELECT DISTINCT query_key, sort FROM query_results WHERE repo_id IN ({marks})", chunk
+                ).fetchall()
+                conn.executemany("DELETE FROM queries WHERE query_key = ? AND sort = ?", affected)
+                conn.executemany("DELETE FROM query_results WHERE query_key = ? AND sort = ?", affected)
+                conn.execute(f"DELETE FROM repos WHERE id IN ({marks})", chunk)
+                conn.execute(f"DELETE FROM fetch_results WHERE repo_id IN ({marks})", chunk)
+                if self.fts:
+                    conn.execute(f"DELETE FROM repos_fts WHERE rowid IN ({marks})", chunk)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def default_repo_index() -> Optional[RepoIndex]:
+    """
+    GITHUB_INDEX_PATH empty turns the index off
+    GITHUB_INDEX_REFRESH=stars:3600,forks:3600,updated:300 sets the per-sort refresh windows (seconds)
+    """
+    path = os.getenv("GITHUB_INDEX_PATH", ".cache/github_index.db")
+    if not path:
+        return None
+
+    refresh = {}
+    for item in os.getenv("GITHUB_INDEX_REFRESH", "").split(","):
+        sort, _, seconds = item.partition(":")
+        if sort.strip() in SORT_COLUMNS and seconds.strip():
+            refresh[sort.strip()] = float(seconds)
+    return RepoIndex(path, refresh=refresh, max_repos=int(os.getenv("GITHUB_INDEX_MAX_REPOS", 50000)))
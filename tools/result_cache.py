@@ -0,0 +1,133 @@
+"""
+In-memory tool result cache with stale-while-revalidate / stale-if-error
+When an upstream is slow or down we'd rather hand back data from a few minutes ago
+(clearly marked as stale) than make the user wait through timeouts and retries
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """
+    Per-tool freshness rules, all in seconds (same idea as the HTTP Cache-Control extensions)
+    - max_age: served as-is, no upstream call
+    - stale_while_revalidate: past max_age, still served right away while we refresh in the background
+    - stale_if_error: past that, only served if the upstream call fails
+    """
+    max_age: float = 60
+    stale_while_revalidate: float = 300
+    stale_if_error: float = 3600
+
+
+@dataclass
+class CachedResult:
+    data: Any
+    age: float
+    state: str  # "fresh", "stale" or "expired" (only good as an error fallback)
+
+
+class _Entry:
+    __slots__ = ("data", "stored_at", "limit", "prefetched")
+
+    def __init__(self, data: Any, stored_at: float, limit: Optional[int], prefetched: bool):
+        self.data = data
+        self.stored_at = stored_at
+        self.limit = limit
+        self.prefetched = prefetched  # put there by the background prefetcher, not used by a request yet
+
+
+class ResultCache:
+    """
+    (call key) -> last successful tool result
+    Keys come from the executor (canonical params, limit left out for list tools), so the
+    entry remembers the limit it was fetched with and only serves requests that fit in it
+    """
+
+    def __init__(self, max_entries: int = 2000):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self.stats = {
+            "fresh": 0, "stale": 0, "stale_if_error": 0, "misses": 0, "refreshes": 0,
+            "prefetched": 0, "prefetch_used": 0
+        }
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        key: Hashable,
+        policy: CachePolicy,
+        limit: Optional[int] = None,
+        list_key: Optional[str] = None
+    ) -> Optional[CachedResult]:
+        """Latest usable result for a call, or None if there's nothing we could ever serve"""
+        now = time.time()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None or not self._covers(entry, limit, list_key):
+                self.stats["misses"] += 1
+                return None
+
+            age = now - entry.stored_at
+            if age > policy.max_age + max(policy.stale_while_revalidate, policy.stale_if_error):
+                del self.entries[key]
+                self.stats["misses"] += 1
+                return None
+
+            self.entries.move_to_end(key)
+            if age <= policy.max_age:
+                state = "fresh"
+            elif age <= policy.max_age + policy.stale_while_revalidate:
+                state = "stale"
+            else:
+                state = "expired"
+            if state != "expired":
+                self.stats[state] += 1
+                if entry.prefetched:
+                    entry.prefetched = False
+                    self.stats["prefetch_used"] += 1
+            return CachedResult(entry.data, age, state)
+
+    def put(self, key: Hashable, data: Any, limit: Optional[int] = None, prefetched: bool = False) -> None:
+        with self._lock:
+            self.entries[key] = _Entry(data, time.time(), limit, prefetched)
+            if prefetched:
+                self.stats["prefetched"] += 1
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get_limit(self, key: Hashable) -> Optional[int]:
+        """Limit a key's entry was stored with - doesn't count as a hit"""
+        with self._lock:
+            entry = self.entries.get(key)
+            return entry.limit if entry is not None else None
+
+    def age(self, key: Hashable) -> Optional[float]:
+        """Seconds since a key was stored - doesn't count as a hit"""
+        with self._lock:
+            entry = self.entries.get(key)
+            return time.time() - entry.stored_at if entry is not None else None
+
+    def record(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] = self.stats.get(stat, 0) + 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self.entries), **self.stats}
+
+    @staticmethod
+    def _covers(entry: _Entry, limit: Optional[int], list_key: Optional[str]) -> bool:
+        """Can an entry fetched with entry.limit answer a request for `limit` items?"""
+        if entry.limit is None or not isinstance(limit, int) or limit <= entry.limit:
+            return True
+        if isinstance(entry.data, dict) and entry.data.get("incomplete_results"):
+            # Cut short upstream - more results exist than the ones we hold
+            return False
+        # Upstream had fewer results than we asked for - asking for more won't change that
+        items = entry.data.get(list_key) if list_key and isinstance(entry.data, dict) else None
+        return isinstance(items, list) and len(items) < entry.limit
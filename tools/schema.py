@@ -0,0 +1,181 @@
+"""
+Compiled parameter schemas - each tool's JSON schema is turned into per-parameter coercer
+functions once, then every step is checked and repaired against it before any network call
+Covers the subset our tool schemas use: string/integer/number/boolean, enum, minimum/maximum,
+default and required
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_TRUE = {"true", "yes", "1", "on"}
+_FALSE = {"false", "no", "0", "off"}
+
+
+class InvalidParameters(ValueError):
+    """A step's parameters can't be repaired - `problems` lists every reason"""
+
+    def __init__(self, tool_name: str, problems: List[str]):
+        super().__init__(f"{tool_name}: {'; '.join(problems)}")
+        self.problems = problems
+
+
+class _Unfixable(Exception):
+    pass
+
+
+def _coerce_string(value: Any) -> str:
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise _Unfixable(f"expected a string, got {type(value).__name__}")
+
+
+def _coerce_integer(value: Any) -> int:
+    if isinstance(value, bool):
+        raise _Unfixable("expected an integer, got a boolean")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            number = float(value.strip())
+        except ValueError:
+            raise _Unfixable(f"expected an integer, got {value!r}")
+        if number.is_integer():
+            return int(number)
+    raise _Unfixable(f"expected an integer, got {value!r}")
+
+
+def _coerce_number(value: Any) -> float:
+    if isinstance(value, bool):
+        raise _Unfixable("expected a number, got a boolean")
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(str(value).strip())
+    except ValueError:
+        raise _Unfixable(f"expected a number, got {value!r}")
+
+
+def _coerce_boolean(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in _TRUE:
+            return True
+        if text in _FALSE:
+            return False
+    raise _Unfixable(f"expected true/false, got {value!r}")
+
+
+_COERCERS: Dict[str, Callable[[Any], Any]] = {
+    "string": _coerce_string,
+    "integer": _coerce_integer,
+    "number": _coerce_number,
+    "boolean": _coerce_boolean
+}
+
+
+class _Property:
+    """One compiled parameter - type coercer, enum lookup and bounds, all resolved up front"""
+
+    __slots__ = ("name", "coerce", "enum", "minimum", "maximum", "has_default", "default", "required")
+
+    def __init__(self, name: str, spec: Dict[str, Any], required: bool):
+        self.name = name
+        self.coerce = _COERCERS.get(spec.get("type"), lambda value: value)
+        # Case-insensitive enum lookup - "Stars" and "STARS" both mean "stars"
+        self.enum = {str(option).lower(): option for option in spec["enum"]} if spec.get("enum") else None
+        self.minimum = spec.get("minimum")
+        self.maximum = spec.get("maximum")
+        self.has_default = "default" in spec
+        self.default = spec.get("default")
+        self.required = required
+
+    def apply(self, value: Any, repairs: List[str]) -> Any:
+        original = value
+        value = self.coerce(value)
+
+        if self.enum is not None:
+            match = self.enum.get(str(value).lower())
+            if match is None:
+                raise _Unfixable(f"{original!r} isn't one of {list(self.enum.values())}")
+            value = match
+
+        if self.minimum is not None and value < self.minimum:
+            value = self.minimum
+        if self.maximum is not None and value > self.maximum:
+            value = self.maximum
+
+        if value != original and not (isinstance(original, str) and value == original.strip()):
+            repairs.append(f"{self.name}: {original!r} -> {value!r}")
+        return value
+
+
+class CompiledSchema:
+    """
+    Validator/coercer for one tool's `parameters` schema
+    Unknown keys are dropped, fixable values are coerced (and reported as repairs),
+    bad optional values fall back to their default (or are dropped), bad required ones are errors
+    """
+
+    def __init__(self, tool_name: str, schema: Dict[str, Any]):
+        self.tool_name = tool_name
+        required = set(schema.get("required", ()))
+        self.properties = [
+            _Property(name, spec, name in required)
+            for name, spec in schema.get("properties", {}).items()
+        ]
+        self.names = {prop.name for prop in self.properties}
+
+    def apply(
+        self,
+        parameters: Dict[str, Any],
+        skip: Optional[Callable[[Any], bool]] = None
+    ) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        (clean parameters, repairs made) - raises InvalidParameters if it can't be fixed
+        Values where skip(value) is true (e.g. unresolved step references) are passed through as-is
+        """
+        clean: Dict[str, Any] = {}
+        repairs: List[str] = []
+        problems: List[str] = []
+
+        for name in parameters:
+            if name not in self.names:
+                repairs.append(f"{name}: dropped (not a parameter of {self.tool_name})")
+
+        for prop in self.properties:
+            value = parameters.get(prop.name)
+            if isinstance(value, str) and not value.strip():
+                value = None
+
+            if value is None:
+                if prop.has_default:
+                    clean[prop.name] = prop.default
+                elif prop.required:
+                    problems.append(f"{prop.name} is required")
+                continue
+
+            if skip is not None and skip(value):
+                clean[prop.name] = value
+                continue
+
+            try:
+                clean[prop.name] = prop.apply(value, repairs)
+            except _Unfixable as e:
+                if prop.required:
+                    problems.append(f"{prop.name}: {e}")
+                elif prop.has_default:
+                    clean[prop.name] = prop.default
+                    repairs.append(f"{prop.name}: {e}, used default {prop.default!r}")
+                else:
+                    repairs.append(f"{prop.name}: {e}, dropped")
+
+        if problems:
+            raise InvalidParameters(self.tool_name, problems)
+        return clean, repairs
@@ -0,0 +1,50 @@
+"""
+Small base for the SQLite-backed stores our tools keep on disk
+Handles the one-connection-per-thread (and per-process) bookkeeping
+"""
+import os
+import sqlite3
+import threading
+import weakref
+
+# Every store that exists, so the pre-fork launcher can close them all before forking
+_stores: "weakref.WeakSet[SQLiteStore]" = weakref.WeakSet()
+
+
+class SQLiteStore:
+    """Subclasses call _connect() whenever they need a connection"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        _stores.add(self)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _connect(self) -> sqlite3.Connection:
+        """One connection per thread (and per process, in case we got forked)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def close(self) -> None:
+        """Closes the calling thread's connection - the next _connect() opens a fresh one"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def close_all_stores() -> None:
+    """
+    Closes this thread's connection on every store - the launcher calls it in the master
+    before forking, so no worker inherits a SQLite handle opened at import time
+    """
+    for store in list(_stores):
+        store.close()
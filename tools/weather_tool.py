@@ -1,20 +1,39 @@
 """
 Weather tool - uses OpenWeatherMap API to get current weather
 """
-import os
 import requests
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 from .base import BaseTool
+from .geocode import default_city_index
+from .key_pool import KeyPool
+from .records import WeatherInfo
+from .result_cache import CachePolicy
 
 
 class WeatherTool(BaseTool):
     """Gets weather data for any city"""
     
+    secret_params = ("appid",)
+    
+    output_description = WeatherInfo.describe()
+    keywords = ("weather", "temperature", "forecast", "rain", "sunny", "humidity", "wind", "climate", "city")
+    
+    # Weather barely moves in a few minutes - fine to serve slightly old readings
+    cache_policy = CachePolicy(max_age=120, stale_while_revalidate=600, stale_if_error=3600)
+    prefetch_budget = 30  # free tier is ~1000 calls/day
+    
     def __init__(self):
-        self.api_key = os.getenv("OPENWEATHER_API_KEY")
-        if not self.api_key:
+        # OPENWEATHER_API_KEYS=a,b - no rate limit headers, so usage is counted locally (free tier: 60/min)
+        self.key_pool = KeyPool.from_env(
+            self.name, "OPENWEATHER_API_KEYS", "OPENWEATHER_API_KEY", param="appid", quota=(60, 60)
+        )
+        if not len(self.key_pool):
             raise ValueError("OPENWEATHER_API_KEY environment variable is required")
         self.base_url = "https://api.openweathermap.org/data/2.5"
+        self.geo_url = "https://api.openweathermap.org/geo/1.0/direct"
+        
+        # Aliases + remembered city IDs, so "NYC" and "New York City" are the same lookup
+        self.city_index = default_city_index()
     
     @property
     def name(self) -> str:
@@ -43,33 +62,63 @@ class WeatherTool(BaseTool):
             "required": ["city"]
         }
     
+    def canonicalize(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Every spelling of a city maps to the same key (its OpenWeatherMap ID once we know it)"""
+        city = parameters.get("city")
+        if not self.city_index or not isinstance(city, str):
+            return parameters
+        
+        key, location = self.city_index.resolve(city)
+        return {**parameters, "city": f"id:{location['id']}" if location else key}
+    
     def execute(self, city: str, units: str = "metric") -> Dict[str, Any]:
         """Calls the OpenWeatherMap API and returns weather data"""
         try:
-            url = f"{self.base_url}/weather"
             params = {
-                "q": city,
-                "appid": self.api_key,
                 "units": units
             }
             
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
+            key, location = self.city_index.resolve(city) if self.city_index else (None, None)
+            if location:
+                # Stable ID - no ambiguity, no 404s
+                params["id"] = location["id"]
+            else:
+                params["q"] = self.city_index.canonical_query(city) if self.city_index else city
+            
+            try:
+                data = self._fetch(params)
+            except requests.exceptions.HTTPError as e:
+                # Ambiguous or oddly written names 404 on q= - ask the geocoder before giving up
+                if e.response is None or e.response.status_code != 404 or "q" not in params:
+                    raise
+                coords = self._geocode(params["q"])
+                if coords is None:
+                    raise
+                params.pop("q")
+                params.update(coords)
+                data = self._fetch(params)
             
-            data = response.json()
+            if self.city_index and not location:
+                self.city_index.remember(key, {
+                    "id": data["id"],
+                    "name": data["name"],
+                    "country": data["sys"]["country"],
+                    "lat": data["coord"]["lat"],
+                    "lon": data["coord"]["lon"]
+                })
             
             # Pull out the useful info from the API response
-            weather_info = {
-                "city": data["name"],
-                "country": data["sys"]["country"],
-                "temperature": data["main"]["temp"],
-                "feels_like": data["main"]["feels_like"],
-                "humidity": data["main"]["humidity"],
-                "pressure": data["main"]["pressure"],
-                "conditions": data["weather"][0]["description"],
-                "wind_speed": data["wind"]["speed"],
-                "units": "°C" if units == "metric" else "°F"
-            }
+            weather_info = WeatherInfo(
+                city=data["name"],
+                country=data["sys"]["country"],
+                temperature=data["main"]["temp"],
+                feels_like=data["main"]["feels_like"],
+                humidity=data["main"]["humidity"],
+                pressure=data["main"]["pressure"],
+                conditions=data["weather"][0]["description"],
+                wind_speed=data["wind"]["speed"],
+                units="°C" if units == "metric" else "°F"
+            )
             
             return {
                 "success": True,
@@ -95,4 +144,17 @@ class WeatherTool(BaseTool):
                 "success": False,
                 "error": f"Unexpected error: {str(e)}"
             }
-
+    
+    def _fetch(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        response = self._http_get(f"{self.base_url}/weather", params=params)
+        response.raise_for_status()
+        return response.json()
+    
+    def _geocode(self, query: str) -> Optional[Dict[str, float]]:
+        """OpenWeatherMap's geocoder is more forgiving than q= on the weather endpoint"""
+        response = self._http_get(self.geo_url, params={"q": query, "limit": 1})
+        response.raise_for_status()
+        matches = response.json()
+        if not matches:
+            return None
+        return {"lat": matches[0]["lat"], "lon": matches[0]["lon"]}